@@ -83,3 +83,111 @@ LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 
 OPENWEATHER_API_KEY = os.getenv('OPENWEATHER_API_KEY', '')
+
+# Concurrent weather fetches used by the update_weather command
+WEATHER_FETCH_WORKERS = int(os.getenv('WEATHER_FETCH_WORKERS', '8'))
+
+# Refreshes within the same slot overwrite one WeatherRecord per farm and source
+WEATHER_OBSERVATION_SLOT_MINUTES = int(os.getenv('WEATHER_OBSERVATION_SLOT_MINUTES', '60'))
+
+# Farms sharing a geohash prefix of this length (5 = ~5 km cells) share one weather fetch
+WEATHER_CLUSTER_PRECISION = int(os.getenv('WEATHER_CLUSTER_PRECISION', '5'))
+
+# Per-farm refresh cadence used by update_weather and run_weather_scheduler.
+# Stage intervals (minutes) override RefreshPolicy.STAGE_INTERVAL_MINUTES.
+WEATHER_REFRESH = {
+    'DEFAULT_INTERVAL_MINUTES': 180,
+    'MIN_INTERVAL_MINUTES': 30,
+    'MAX_INTERVAL_MINUTES': 720,
+    'STAGE_INTERVAL_MINUTES': {},
+}
+
+# Nominatim answers cached in the database (TTLs in seconds); reverse lookups
+# are keyed by coordinates rounded to REVERSE_PRECISION decimal places
+GEOCODE_CACHE = {
+    'TTL': 30 * 86400,
+    'NEGATIVE_TTL': 86400,
+    'REVERSE_PRECISION': 3,
+    'LOCAL_MAX_ENTRIES': 1024,
+}
+
+# Public location weather pages run their upstream calls concurrently on a
+# shared pool of FANOUT_WORKERS threads and render whatever has finished
+# after LOCATION_WEATHER_DEADLINE_SECONDS
+FANOUT_WORKERS = 16
+LOCATION_WEATHER_DEADLINE_SECONDS = 4.0
+
+# Farm climate normals use the observed 12-month rainfall once this many days
+# have weather; before that annual rainfall is estimated from mean conditions
+CLIMATE_NORMALS_MIN_DAYS = 90
+
+# Grid of precomputed climate analysis written by build_climate_grid
+CLIMATE_GRID = {
+    'PATH': BASE_DIR / 'climate_grid',
+    'RESOLUTION': 0.05,
+}
+
+# profile_startup fails when django.setup() plus the URLconf takes longer than
+# this in a fresh interpreter; NumPy and pandas are imported lazily to stay under it
+STARTUP_BUDGET_MS = 750
+
+# Registry of trained yield models written by train_yield_model; the version
+# named in its ACTIVE file is served, and the heuristic covers everything else
+YIELD_MODELS = {
+    'PATH': BASE_DIR / 'yield_models',
+}
+
+# Coordinates further than this from every gazetteer place are not resolved offline
+REVERSE_GEOCODE_MAX_DISTANCE_KM = 150
+
+# Farms within this distance of a reported pest outbreak are alerted
+PEST_ALERT_RADIUS_KM = 10
+
+# Token buckets shared by all processes through the database.
+# LIMITS maps upstream -> {window: (requests, period in seconds)}.
+API_QUOTA = {
+    'ENABLED': True,
+    'LIMITS': {
+        'openweathermap': {
+            'minute': (int(os.getenv('OPENWEATHER_LIMIT_PER_MINUTE', '60')), 60),
+            'day': (int(os.getenv('OPENWEATHER_LIMIT_PER_DAY', '1000')), 86400),
+        },
+        'nominatim': {'second': (1, 1)},
+    },
+    # Share of each bucket that background refreshes may not use
+    'RESERVE_FRACTION': 0.2,
+    # Seconds a caller waits for a token before giving up
+    'MAX_WAIT': {'interactive': 2.0, 'background': 30.0},
+}
+
+# Weather API response cache shared by farms in the same grid cell
+WEATHER_CACHE = {
+    'BACKEND': os.getenv('WEATHER_CACHE_BACKEND', 'locmem'),  # locmem, file or django
+    'LOCATION': os.getenv('WEATHER_CACHE_LOCATION', str(BASE_DIR / 'weather_cache')),  # directory or CACHES alias
+    'GRID_DEGREES': float(os.getenv('WEATHER_CACHE_GRID_DEGREES', '0.01')),  # ~1.1 km
+    'MAX_ENTRIES': 2048,
+    'TTL': {
+        'current': 600,
+        'forecast': 3600,
+        'extended': 1800,
+    },
+    'STALE_TTL': 21600,  # expired entries kept as a fallback while OpenWeatherMap is down
+}
+
+# Pooled HTTP client shared by weather, geocoding and SMS calls
+HTTP_CLIENT = {
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 10,
+    'MAX_RETRIES': 2,
+    'BACKOFF_BASE': 0.5,  # seconds, doubled per attempt with full jitter
+    'BACKOFF_MAX': 8.0,
+    'POOL_MAXSIZE': 20,  # keep-alive connections per host
+}
+
+# Circuit breaker for each OpenWeatherMap endpoint
+CIRCUIT_BREAKER = {
+    'FAILURE_THRESHOLD': 3,  # consecutive failures before the circuit opens
+    'RECOVERY_TIMEOUT': 30,  # seconds before a half-open probe is allowed
+    'TIMEOUT': (3.05, 5),  # connect/read timeout for weather calls
+    'RETRIES': 1,
+}
@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Farmer, Farm, Crop, WeatherRecord, YieldPrediction, Alert
+from .models import (
+    Farmer, Farm, Crop, WeatherRecord, ForecastRecord, YieldPrediction, Alert, ApiQuotaBucket,
+    GeocodeCacheEntry, FarmClimateNormals, CropWeatherStats,
+)
 
 
 @admin.register(Farmer)
@@ -29,6 +32,26 @@ class WeatherRecordAdmin(admin.ModelAdmin):
     list_filter = ['date']
 
 
+@admin.register(FarmClimateNormals)
+class FarmClimateNormalsAdmin(admin.ModelAdmin):
+    list_display = ['farm', 'climate_type', 'annual_rainfall', 'rainfall_source', 'temperature_mean', 'days_observed', 'rainfall_days', 'updated_at']
+    search_fields = ['farm__name']
+    list_filter = ['climate_code', 'rainfall_source']
+
+
+@admin.register(CropWeatherStats)
+class CropWeatherStatsAdmin(admin.ModelAdmin):
+    list_display = ['crop', 'observation_count', 'temperature_mean', 'humidity_mean', 'rainfall_total', 'updated_at']
+    search_fields = ['crop__farm__name']
+
+
+@admin.register(ForecastRecord)
+class ForecastRecordAdmin(admin.ModelAdmin):
+    list_display = ['farm', 'source', 'valid_time', 'temperature', 'humidity', 'rainfall', 'run_time']
+    search_fields = ['farm__name']
+    list_filter = ['source', 'valid_time']
+
+
 @admin.register(YieldPrediction)
 class YieldPredictionAdmin(admin.ModelAdmin):
     list_display = ['crop', 'predicted_yield', 'actual_yield', 'prediction_date']
@@ -41,3 +64,16 @@ class AlertAdmin(admin.ModelAdmin):
     list_display = ['title', 'farm', 'alert_type', 'severity', 'is_read', 'created_at']
     search_fields = ['title', 'message', 'farm__name']
     list_filter = ['alert_type', 'severity', 'is_read', 'created_at']
+
+
+@admin.register(ApiQuotaBucket)
+class ApiQuotaBucketAdmin(admin.ModelAdmin):
+    list_display = ['name', 'tokens', 'capacity', 'refill_rate']
+    search_fields = ['name']
+
+
+@admin.register(GeocodeCacheEntry)
+class GeocodeCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'key', 'is_negative', 'expires_at', 'created_at']
+    search_fields = ['key']
+    list_filter = ['kind', 'is_negative']
@@ -49,35 +49,35 @@ class FarmAnalytics:
     
     @staticmethod
     def get_weather_trends(farm, days=30):
-        """Analyze weather trends"""
-        from .models import WeatherRecord
+        """Analyze weather trends from the daily rollups"""
+        from .weather_rollups import WeatherRollupService
         
         start_date = timezone.now().date() - timedelta(days=days)
-        records = WeatherRecord.objects.filter(
-            farm=farm,
-            date__gte=start_date
-        ).order_by('date')
+        summaries = list(WeatherRollupService.daily_rows(farm, start_date))
         
-        if not records.exists():
+        if not summaries:
             return None
         
-        temps = [float(r.temperature) for r in records]
-        humidity = [float(r.humidity) for r in records]
-        rainfall = [float(r.rainfall) for r in records]
+        window = WeatherRollupService.combine([
+            (s.observation_count, s.temperature_mean, s.temperature_variance, s.temperature_min,
+             s.temperature_max, s.humidity_mean, s.rainfall_total)
+            for s in summaries
+        ])
+        temps = [s.temperature_mean for s in summaries]
         
         trends = {
-            'avg_temperature': sum(temps) / len(temps) if temps else 0,
-            'max_temperature': max(temps) if temps else 0,
-            'min_temperature': min(temps) if temps else 0,
-            'avg_humidity': sum(humidity) / len(humidity) if humidity else 0,
-            'total_rainfall': sum(rainfall),
-            'rainy_days': len([r for r in rainfall if r > 0]),
-            'records_count': records.count(),
+            'avg_temperature': window['avg_temperature'],
+            'max_temperature': window['max_temperature'],
+            'min_temperature': window['min_temperature'],
+            'avg_humidity': window['avg_humidity'],
+            'total_rainfall': window['total_rainfall'],
+            'rainy_days': len([s for s in summaries if s.rainfall_total > 0]),
+            'records_count': window['count'],
             'temperature_trend': 'stable',  # Can be 'rising', 'falling', 'stable'
             'rainfall_trend': 'normal'  # Can be 'drought', 'normal', 'heavy'
         }
         
-        # Determine temperature trend
+        # Determine temperature trend (first week vs last week of daily means)
         if len(temps) >= 7:
             recent_avg = sum(temps[-7:]) / 7
             older_avg = sum(temps[:7]) / 7
@@ -136,21 +136,18 @@ class FarmAnalytics:
     @staticmethod
     def get_irrigation_recommendation(farm, crop):
         """Calculate irrigation needs based on weather and crop type"""
-        from .models import WeatherRecord
+        from .weather_rollups import WeatherRollupService
         
         # Get recent weather (last 7 days)
         week_ago = timezone.now().date() - timedelta(days=7)
-        recent_weather = WeatherRecord.objects.filter(
-            farm=farm,
-            date__gte=week_ago
-        )
+        recent_weather = WeatherRollupService.window_stats(farm, week_ago)
         
-        if not recent_weather.exists():
+        if not recent_weather:
             return None
         
-        total_rainfall = sum([float(w.rainfall) for w in recent_weather])
-        avg_temp = sum([float(w.temperature) for w in recent_weather]) / recent_weather.count()
-        avg_humidity = sum([float(w.humidity) for w in recent_weather]) / recent_weather.count()
+        total_rainfall = recent_weather['total_rainfall']
+        avg_temp = recent_weather['avg_temperature']
+        avg_humidity = recent_weather['avg_humidity']
         
         # Crop water requirements (mm/day)
         water_needs = {
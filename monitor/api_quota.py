@@ -0,0 +1,200 @@
+"""
+Database-backed token buckets that keep every process inside upstream rate limits
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import Greatest, Least
+from django.db.models.lookups import GreaterThanOrEqual
+from .metrics import metrics
+
+
+_priority = contextvars.ContextVar('api_quota_priority', default='interactive')
+
+
+class _Denied(Exception):
+    """Raised inside the acquire transaction to roll back buckets already charged"""
+
+    def __init__(self, wait):
+        self.wait = wait
+
+
+class ApiQuota:
+    """
+    Per-upstream token buckets stored in ApiQuotaBucket rows
+
+    A token is taken with a single conditional UPDATE that refills the bucket
+    for the elapsed time and subtracts the cost only if enough tokens are
+    available, so concurrent web workers and cron processes never oversubscribe
+    it. Background callers must leave RESERVE_FRACTION of each bucket untouched
+    so interactive page loads still get through while a batch refresh is
+    draining the quota.
+    """
+
+    INTERACTIVE = 'interactive'
+    BACKGROUND = 'background'
+
+    # upstream -> {window: (capacity, period in seconds)}
+    DEFAULT_LIMITS = {
+        'openweathermap': {'minute': (60, 60), 'day': (1000, 86400)},
+        'nominatim': {'second': (1, 1)},
+    }
+    DEFAULT_MAX_WAIT = {INTERACTIVE: 2.0, BACKGROUND: 30.0}
+
+    _ensured = set()
+
+    @staticmethod
+    def _config():
+        return getattr(settings, 'API_QUOTA', {})
+
+    @staticmethod
+    @contextmanager
+    def priority(level):
+        """Run the enclosed calls (or decorated function) at the given priority"""
+        token = _priority.set(level)
+        try:
+            yield
+        finally:
+            _priority.reset(token)
+
+    @staticmethod
+    def current_priority():
+        return _priority.get()
+
+    @staticmethod
+    def bind_priority(func):
+        """Wrap func so it runs at the caller's priority, e.g. when submitted to a thread pool"""
+        level = _priority.get()
+
+        def run(*args, **kwargs):
+            with ApiQuota.priority(level):
+                return func(*args, **kwargs)
+        return run
+
+    @staticmethod
+    def limits(upstream):
+        """[(bucket name, capacity, refill rate per second)] for an upstream"""
+        limits = ApiQuota._config().get('LIMITS', ApiQuota.DEFAULT_LIMITS).get(upstream, {})
+        return [
+            (f'{upstream}.{window}', float(capacity), float(capacity) / period)
+            for window, (capacity, period) in sorted(limits.items())
+        ]
+
+    @staticmethod
+    def _ensure_buckets(buckets):
+        """Create missing bucket rows and apply changed limits, once per process"""
+        from .models import ApiQuotaBucket
+
+        for name, capacity, rate in buckets:
+            if (name, capacity, rate) in ApiQuota._ensured:
+                continue
+            bucket, created = ApiQuotaBucket.objects.get_or_create(
+                name=name,
+                defaults={'capacity': capacity, 'refill_rate': rate, 'tokens': capacity, 'refilled_at': time.time()}
+            )
+            if not created and (bucket.capacity != capacity or bucket.refill_rate != rate):
+                ApiQuotaBucket.objects.filter(name=name).update(
+                    capacity=capacity, refill_rate=rate, tokens=Least(F('tokens'), Value(capacity))
+                )
+            ApiQuota._ensured.add((name, capacity, rate))
+
+    @staticmethod
+    def _available(now):
+        """SQL expression for the bucket's tokens after refilling up to `now`"""
+        elapsed = Greatest(Value(now, output_field=FloatField()) - F('refilled_at'), Value(0.0))
+        return Least(F('capacity'), F('tokens') + elapsed * F('refill_rate'))
+
+    @staticmethod
+    def try_acquire(upstream, cost=1, priority=None):
+        """
+        Take `cost` tokens from every bucket of an upstream, or none at all
+
+        Returns:
+            (granted, seconds to wait before a retry could succeed)
+        """
+        from .models import ApiQuotaBucket
+
+        buckets = ApiQuota.limits(upstream)
+        if not buckets:
+            return True, 0.0
+        ApiQuota._ensure_buckets(buckets)
+
+        priority = priority or _priority.get()
+        fraction = ApiQuota._config().get('RESERVE_FRACTION', 0.2) if priority == ApiQuota.BACKGROUND else 0
+        now = time.time()
+        available = ApiQuota._available(now)
+
+        try:
+            with transaction.atomic():
+                for name, capacity, rate in buckets:
+                    needed = cost + min(capacity * fraction, capacity - cost)
+                    taken = ApiQuotaBucket.objects.filter(
+                        GreaterThanOrEqual(available, needed), name=name
+                    ).update(tokens=available - cost, refilled_at=Value(now, output_field=FloatField()))
+                    if not taken:
+                        tokens = ApiQuotaBucket.objects.filter(name=name).values_list(available, flat=True).first()
+                        raise _Denied((needed - (tokens or 0)) / rate)
+        except _Denied as denied:
+            return False, max(0.0, denied.wait)
+        return True, 0.0
+
+    @staticmethod
+    def acquire(upstream, cost=1, max_wait=None):
+        """
+        Block until the upstream's quota allows another call, up to max_wait seconds
+
+        Interactive callers wait briefly; background callers wait longer, which
+        paces batch refreshes to the refill rate instead of failing them.
+        Returns True if the call may proceed. Quota storage errors fail open.
+        """
+        config = ApiQuota._config()
+        if not config.get('ENABLED', True):
+            return True
+
+        priority = _priority.get()
+        if max_wait is None:
+            max_wait = dict(ApiQuota.DEFAULT_MAX_WAIT, **config.get('MAX_WAIT', {})).get(priority, 0)
+
+        started = time.monotonic()
+        while True:
+            try:
+                granted, wait = ApiQuota.try_acquire(upstream, cost, priority)
+            except Exception as e:
+                print(f"API quota error for {upstream}: {e}")
+                return True
+
+            waited = time.monotonic() - started
+            if granted:
+                metrics.observe('api_quota_wait_seconds', waited, upstream=upstream)
+                metrics.increment('api_quota_requests_total', upstream=upstream, priority=priority, result='granted')
+                return True
+            if waited + wait > max_wait:
+                metrics.increment('api_quota_requests_total', upstream=upstream, priority=priority, result='denied')
+                return False
+            time.sleep(max(wait, 0.05))
+
+    @staticmethod
+    def status():
+        """Tokens currently available in every bucket"""
+        from .models import ApiQuotaBucket
+
+        now = time.time()
+        return {
+            bucket.name: {
+                'remaining': round(min(bucket.capacity, bucket.tokens + max(0.0, now - bucket.refilled_at) * bucket.refill_rate), 2),
+                'capacity': bucket.capacity,
+            }
+            for bucket in ApiQuotaBucket.objects.order_by('name')
+        }
+
+    @staticmethod
+    def collect(registry):
+        """Metrics collector publishing the remaining budget of each bucket"""
+        for name, bucket in ApiQuota.status().items():
+            registry.set_gauge('api_quota_remaining', bucket['remaining'], bucket=name)
+
+
+metrics.register_collector(ApiQuota.collect)
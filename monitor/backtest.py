@@ -0,0 +1,176 @@
+"""
+Replay recorded yield predictions against the harvests that followed
+"""
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from django.db import connections
+from .prediction_service import YieldPredictionService
+
+
+class BacktestService:
+    """
+    Score predictors on every YieldPrediction that has an actual_yield
+
+    Each sample is rebuilt as it stood on its prediction date: the weather
+    statistics from planting to that day (one grouped query over the daily
+    summaries) and the growth stage the crop had reached. Samples are then
+    split into chunks and predicted in a process pool. Workers get plain
+    arrays and never touch the database, so one backtest over the full history
+    costs one scan plus vectorized arithmetic spread over every core.
+
+    Predictors:
+        heuristic      YieldPredictionService.predict_arrays
+        model          the active trained yield model (heuristic fallback included)
+        model:VERSION  a specific version from the registry
+        recorded       the predicted_yield that was stored at the time
+    """
+
+    PREDICTORS = ('heuristic', 'model', 'recorded')
+    CHUNK_SIZE = 20000
+
+    @staticmethod
+    def load_samples(since=None, until=None, crop_types=None):
+        """
+        Samples as of each prediction date
+
+        Returns:
+            dict with lists crop_types, stages and counties, arrays crop_ids,
+            areas, actual, recorded, and stats (batch_weather_stats arrays)
+        """
+        import numpy as np
+        from .models import YieldPrediction
+
+        predictions = YieldPrediction.objects.filter(actual_yield__isnull=False, crop__area_planted__gt=0)
+        if since:
+            predictions = predictions.filter(prediction_date__gte=since)
+        if until:
+            predictions = predictions.filter(prediction_date__lte=until)
+        if crop_types:
+            predictions = predictions.filter(crop__crop_type__in=crop_types)
+        rows = list(
+            predictions.values_list(
+                'id', 'crop_id', 'crop__crop_type', 'crop__planting_date', 'prediction_date',
+                'crop__area_planted', 'actual_yield', 'predicted_yield', 'crop__farm__farmer__county'
+            ).order_by('id')
+        )
+        return {
+            'crop_ids': np.array([row[1] for row in rows], dtype=np.int64),
+            'crop_types': [row[2] for row in rows],
+            'stages': [YieldPredictionService.stage_for_days(row[2], (row[4] - row[3]).days) for row in rows],
+            'areas': np.array([float(row[5]) for row in rows]),
+            'actual': np.array([float(row[6]) for row in rows]),
+            'recorded': np.array([float(row[7]) for row in rows]),
+            'counties': [row[8] or 'Unknown' for row in rows],
+            'stats': YieldPredictionService.prediction_weather_stats([row[0] for row in rows]),
+        }
+
+    @staticmethod
+    def resolve_model(predictor):
+        """(registry path, version) for a model predictor; raises FileNotFoundError or ValueError"""
+        from .yield_model import YieldModel
+
+        path = YieldModel.default_path()
+        version = predictor.partition(':')[2] or YieldModel.active_version(path)
+        if version is None:
+            raise FileNotFoundError('no yield model is active')
+        # Fail here rather than in every worker
+        YieldModel.load(version, path)
+        return path, version
+
+    @staticmethod
+    def _chunk(samples, start, stop):
+        return {
+            'crop_types': samples['crop_types'][start:stop],
+            'stages': samples['stages'][start:stop],
+            'areas': samples['areas'][start:stop],
+            'recorded': samples['recorded'][start:stop],
+            'stats': {name: values[start:stop] for name, values in samples['stats'].items()},
+        }
+
+    @staticmethod
+    def predict_chunk(predictor, model_source, chunk):
+        """Predicted yields for one chunk; runs in a worker process"""
+        if predictor == 'recorded':
+            return chunk['recorded']
+        heuristic = YieldPredictionService.predict_arrays(
+            chunk['crop_types'], chunk['stages'], chunk['areas'], chunk['stats']
+        )
+        if predictor == 'heuristic':
+            return heuristic['predicted_yield']
+        model = _worker_model(*model_source)
+        predicted, _, _ = model.predict(
+            chunk['crop_types'], chunk['stages'], chunk['areas'], chunk['stats'], heuristic
+        )
+        return predicted
+
+    @staticmethod
+    def run(predictor, samples, workers=1, chunk_size=None, model_source=None):
+        """
+        Predict every sample with one predictor
+
+        Returns:
+            (predicted array aligned with samples, seconds spent predicting)
+        """
+        import numpy as np
+
+        chunk_size = chunk_size or BacktestService.CHUNK_SIZE
+        total = len(samples['actual'])
+        chunks = [
+            BacktestService._chunk(samples, start, start + chunk_size)
+            for start in range(0, total, chunk_size)
+        ]
+        started = time.perf_counter()
+        if workers <= 1 or len(chunks) <= 1:
+            results = [BacktestService.predict_chunk(predictor, model_source, chunk) for chunk in chunks]
+        else:
+            # Forked workers must not share the parent's database connections
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as executor:
+                results = list(executor.map(
+                    BacktestService.predict_chunk, repeat(predictor), repeat(model_source), chunks
+                ))
+        predicted = np.concatenate(results) if results else np.zeros(0)
+        return predicted, time.perf_counter() - started
+
+    @staticmethod
+    def errors(predicted, actual):
+        """n, MAE, MAPE (over positive actual yields) and bias (mean predicted minus actual)"""
+        import numpy as np
+
+        if not len(actual):
+            return {'n': 0, 'mae': None, 'mape': None, 'bias': None}
+        difference = predicted - actual
+        positive = actual > 0
+        return {
+            'n': int(len(actual)),
+            'mae': float(np.mean(np.abs(difference))),
+            'mape': float(np.mean(np.abs(difference[positive]) / actual[positive]) * 100) if positive.any() else None,
+            'bias': float(np.mean(difference)),
+        }
+
+    @staticmethod
+    def grouped_errors(predicted, actual, keys):
+        """errors() per distinct key, keys aligned with the samples"""
+        import numpy as np
+
+        indexes = defaultdict(list)
+        for i, key in enumerate(keys):
+            indexes[key].append(i)
+        return {
+            key: BacktestService.errors(predicted[np.array(rows)], actual[np.array(rows)])
+            for key, rows in sorted(indexes.items())
+        }
+
+
+_worker_models = {}
+
+
+def _worker_model(path, version):
+    """A worker's memory-mapped copy of a model version, loaded once per process"""
+    from .yield_model import YieldModel
+
+    if (path, version) not in _worker_models:
+        _worker_models[path, version] = YieldModel.load(version, path)
+    return _worker_models[path, version]
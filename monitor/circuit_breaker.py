@@ -0,0 +1,112 @@
+"""
+Circuit breakers for upstream APIs
+"""
+import threading
+import time
+from django.conf import settings
+from .metrics import metrics
+
+
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker
+
+    closed    - requests flow normally, consecutive failures are counted
+    open      - requests are refused until recovery_timeout has passed
+    half_open - a single probe request is let through; success closes the
+                circuit, failure opens it again
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(self, name, failure_threshold=3, recovery_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    def _publish(self):
+        metrics.set_gauge('circuit_breaker_state', self.STATE_VALUES[self.state], breaker=self.name)
+
+    def _transition(self, state):
+        if state != self.state:
+            self.state = state
+            metrics.increment('circuit_breaker_transitions_total', breaker=self.name, state=state)
+            self._publish()
+
+    def allow_request(self):
+        """Return True if a call may go to the network right now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self._transition(self.HALF_OPEN)
+            if self.state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            metrics.increment('circuit_breaker_rejections_total', breaker=self.name)
+            return False
+
+    def cancel_request(self):
+        """Hand back a permission from allow_request() that was not used for a call"""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_in_flight = False
+            self._transition(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self._transition(self.OPEN)
+
+    def status(self):
+        return {
+            'state': self.state,
+            'failures': self.failures,
+            'seconds_until_probe': (
+                max(0, round(self.recovery_timeout - (time.monotonic() - self.opened_at), 1))
+                if self.state == self.OPEN else 0
+            ),
+        }
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    """Return the process-wide breaker for an endpoint, configured from CIRCUIT_BREAKER"""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                config = getattr(settings, 'CIRCUIT_BREAKER', {})
+                breaker = CircuitBreaker(
+                    name,
+                    failure_threshold=config.get('FAILURE_THRESHOLD', 3),
+                    recovery_timeout=config.get('RECOVERY_TIMEOUT', 30),
+                )
+                _breakers[name] = breaker
+    return breaker
+
+
+def breaker_statuses():
+    """State of every breaker created in this process"""
+    return {name: breaker.status() for name, breaker in sorted(_breakers.items())}
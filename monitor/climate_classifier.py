@@ -7,6 +7,26 @@ from decimal import Decimal
 class ClimateClassifier:
     """Classify climate zones and provide agricultural recommendations"""
     
+    # climate code -> (climate type, description, agricultural suitability)
+    CLIMATES = {
+        'BW': ('Desert (Arid)', 'Very dry climate with minimal rainfall. Extreme temperatures.', 'poor'),
+        'BS': ('Semi-Arid (Steppe)', 'Dry climate with limited rainfall. Suitable for drought-resistant crops.', 'limited'),
+        'Af': ('Tropical Rainforest', 'Hot and wet year-round. High rainfall and humidity.', 'excellent'),
+        'Aw': ('Tropical Savanna', 'Warm with distinct wet and dry seasons.', 'good'),
+        'C': ('Temperate', 'Moderate temperatures with adequate rainfall.', 'excellent'),
+        'H': ('Highland', 'Cool temperatures, suitable for specific crops like tea and coffee.', 'good'),
+        'Cfa': ('Subtropical', 'Warm summers, mild winters, good rainfall distribution.', 'excellent'),
+    }
+    
+    # (annual rainfall below, water status); anything wetter is the last entry
+    WATER_STATUS = [
+        (400, 'Critical - Irrigation Essential for Survival'),
+        (600, 'Very Low - Irrigation Required'),
+        (800, 'Low - Supplemental Irrigation Needed'),
+        (1200, 'Adequate - Seasonal Irrigation May Be Needed'),
+        (None, 'Abundant - Good Natural Water Supply'),
+    ]
+    
     @staticmethod
     def classify_climate(temperature, rainfall_annual, humidity=None):
         """
@@ -18,50 +38,31 @@ class ClimateClassifier:
         
         # Desert/Arid Climate
         if rainfall < 250:
-            climate_type = 'Desert (Arid)'
             climate_code = 'BW'
-            description = 'Very dry climate with minimal rainfall. Extreme temperatures.'
-            suitability = 'poor'
             
         # Semi-Arid/Steppe
         elif rainfall < 500:
-            climate_type = 'Semi-Arid (Steppe)'
             climate_code = 'BS'
-            description = 'Dry climate with limited rainfall. Suitable for drought-resistant crops.'
-            suitability = 'limited'
             
         # Tropical
         elif temp > 18 and rainfall > 1500:
-            climate_type = 'Tropical Rainforest'
             climate_code = 'Af'
-            description = 'Hot and wet year-round. High rainfall and humidity.'
-            suitability = 'excellent'
             
         elif temp > 18 and rainfall > 750:
-            climate_type = 'Tropical Savanna'
             climate_code = 'Aw'
-            description = 'Warm with distinct wet and dry seasons.'
-            suitability = 'good'
             
         # Temperate
         elif 10 < temp <= 18 and rainfall > 500:
-            climate_type = 'Temperate'
             climate_code = 'C'
-            description = 'Moderate temperatures with adequate rainfall.'
-            suitability = 'excellent'
             
         # Highland/Mountain
         elif temp < 10 and rainfall > 500:
-            climate_type = 'Highland'
             climate_code = 'H'
-            description = 'Cool temperatures, suitable for specific crops like tea and coffee.'
-            suitability = 'good'
             
         else:
-            climate_type = 'Subtropical'
             climate_code = 'Cfa'
-            description = 'Warm summers, mild winters, good rainfall distribution.'
-            suitability = 'excellent'
+        
+        climate_type, description, suitability = ClimateClassifier.CLIMATES[climate_code]
         
         return {
             'climate_type': climate_type,
@@ -169,24 +170,19 @@ class ClimateClassifier:
             }
     
     @staticmethod
-    def analyze_location_climate(latitude, longitude, weather_data):
+    def estimate_annual_rainfall(latitude, temperature, humidity, current_rainfall=0):
         """
-        Comprehensive climate analysis for a location
-        """
-        # Get temperature and humidity
-        temperature = float(weather_data.get('temperature', 20))
-        humidity = float(weather_data.get('humidity', 60))
+        Estimate annual rainfall (mm) from latitude and current conditions
         
-        # Estimate annual rainfall based on location and current conditions
-        # Use latitude and current weather to make better estimates
+        Kenya-specific rainfall estimation based on regions:
+        Coastal/Lake regions (Kisumu, Mombasa): 1000-1800mm
+        Highland regions (Kericho, Nairobi): 900-1500mm
+        Arid/Semi-arid (Mandera, Turkana): 200-500mm
+        Rift Valley: 600-1000mm
+        """
         lat = abs(float(latitude))
-        current_rainfall = float(weather_data.get('rainfall', 0))
-        
-        # Kenya-specific rainfall estimation based on regions
-        # Coastal/Lake regions (Kisumu, Mombasa): 1000-1800mm
-        # Highland regions (Kericho, Nairobi): 900-1500mm  
-        # Arid/Semi-arid (Mandera, Turkana): 200-500mm
-        # Rift Valley: 600-1000mm
+        temperature = float(temperature)
+        humidity = float(humidity)
         
         # Use latitude to help estimate climate zone
         if lat < 23.5:  # Tropical zone
@@ -216,9 +212,114 @@ class ClimateClassifier:
             estimated_annual_rainfall = 400 + (humidity * 6)
         
         # Adjust based on current rainfall if significant
-        if current_rainfall > 5:
+        if float(current_rainfall) > 5:
             estimated_annual_rainfall = max(estimated_annual_rainfall, 900)
         
+        return estimated_annual_rainfall
+    
+    @staticmethod
+    def water_status(rainfall_annual):
+        """Water management status for an annual rainfall"""
+        rainfall = float(rainfall_annual)
+        for limit, status in ClimateClassifier.WATER_STATUS:
+            if limit is None or rainfall < limit:
+                return status
+    
+    @staticmethod
+    def classify_climate_batch(latitude, temperature, humidity, rainfall=0):
+        """
+        Vectorized analyze_location_climate for many points at once
+        
+        Takes array-likes (or scalars, broadcast) of latitude, temperature,
+        humidity and current rainfall and applies the same rules as
+        estimate_annual_rainfall, classify_climate and water_status, giving
+        identical results point for point.
+        
+        Returns:
+            dict of NumPy arrays: estimated_rainfall, climate_code,
+            climate_type, suitability, is_desert and water_status
+        """
+        import numpy as np
+        
+        lat, temp, hum, current = np.broadcast_arrays(
+            np.abs(np.asarray(latitude, dtype=float)),
+            np.asarray(temperature, dtype=float),
+            np.asarray(humidity, dtype=float),
+            np.asarray(rainfall, dtype=float),
+        )
+        
+        # Estimate annual rainfall; np.select takes the first matching branch like the elif chain
+        tropical = lat < 23.5
+        temperate = lat < 50
+        estimated = np.select(
+            [
+                tropical & (hum > 70) & (temp > 22),
+                tropical & (temp < 18) & (hum > 60),
+                tropical & (hum < 40) & (temp > 28),
+                tropical & (hum < 50) & (temp > 25),
+                tropical,
+                temperate & (temp < 15),
+                temperate,
+            ],
+            [
+                1200 + (hum - 70) * 20,
+                1100 + (hum - 60) * 15,
+                250 + (hum * 5),
+                400 + (hum * 8),
+                800 + (hum * 10),
+                700 + (hum * 8),
+                600 + (hum * 10),
+            ],
+            default=400 + (hum * 6),
+        )
+        estimated = np.where(current > 5, np.maximum(estimated, 900), estimated)
+        
+        # Classify climate
+        codes = list(ClimateClassifier.CLIMATES)
+        climate_index = np.select(
+            [
+                estimated < 250,
+                estimated < 500,
+                (temp > 18) & (estimated > 1500),
+                (temp > 18) & (estimated > 750),
+                (10 < temp) & (temp <= 18) & (estimated > 500),
+                (temp < 10) & (estimated > 500),
+            ],
+            [codes.index(code) for code in ('BW', 'BS', 'Af', 'Aw', 'C', 'H')],
+            default=codes.index('Cfa'),
+        )
+        
+        # Water management status
+        limits = [limit for limit, _ in ClimateClassifier.WATER_STATUS if limit is not None]
+        water_index = np.select(
+            [estimated < limit for limit in limits], range(len(limits)), default=len(limits)
+        )
+        
+        climates = [ClimateClassifier.CLIMATES[code] for code in codes]
+        return {
+            'estimated_rainfall': estimated,
+            'climate_code': np.array(codes)[climate_index],
+            'climate_type': np.array([climate[0] for climate in climates])[climate_index],
+            'suitability': np.array([climate[2] for climate in climates])[climate_index],
+            'is_desert': np.isin(climate_index, [codes.index('BW'), codes.index('BS')]),
+            'water_status': np.array([status for _, status in ClimateClassifier.WATER_STATUS])[water_index],
+        }
+    
+    @staticmethod
+    def climate_profile(latitude, temperature, humidity, current_rainfall=0):
+        """
+        Climate, crops, water status and climate-level recommendations for
+        given conditions; everything in analyze_location_climate except the
+        advice tied to the current temperature and humidity
+        """
+        temperature = float(temperature)
+        humidity = float(humidity)
+        
+        # Estimate annual rainfall based on location and current conditions
+        estimated_annual_rainfall = ClimateClassifier.estimate_annual_rainfall(
+            latitude, temperature, humidity, current_rainfall
+        )
+        
         # Classify climate
         climate = ClimateClassifier.classify_climate(
             temperature, 
@@ -238,6 +339,7 @@ class ClimateClassifier:
         recommendations = []
         
         # Location-specific insights
+        lat = abs(float(latitude))
         location_insight = ""
         if lat < 23.5:  # Tropical/Subtropical regions
             if humidity > 70 and temperature > 22:
@@ -286,48 +388,65 @@ class ClimateClassifier:
                 recommendations.append("• Plant early to maximize rainfall")
             elif climate['rainfall'] < 800:
                 recommendations.append("• Supplemental irrigation needed during dry season")
-            
-            # Temperature-based recommendations
-            if temperature > 30:
-                recommendations.append("• Provide shade for sensitive crops")
-                recommendations.append("• Increase watering frequency")
-                recommendations.append("• Mulch to keep soil cool")
-            elif temperature < 15:
-                recommendations.append("• Consider cold-hardy varieties")
-                recommendations.append("• Use mulching for temperature regulation")
-                recommendations.append("• Protect crops from frost")
-            
-            # Humidity-based recommendations
-            if humidity > 75:
-                recommendations.append("• Watch for fungal diseases in high humidity")
-                recommendations.append("• Ensure good air circulation")
-            elif humidity < 40:
-                recommendations.append("• Increase irrigation frequency")
-                recommendations.append("• Use mulch to retain soil moisture")
         
         # Water management advice
-        if climate['rainfall'] < 400:
-            water_status = 'Critical - Irrigation Essential for Survival'
-        elif climate['rainfall'] < 600:
-            water_status = 'Very Low - Irrigation Required'
-        elif climate['rainfall'] < 800:
-            water_status = 'Low - Supplemental Irrigation Needed'
-        elif climate['rainfall'] < 1200:
-            water_status = 'Adequate - Seasonal Irrigation May Be Needed'
-        else:
-            water_status = 'Abundant - Good Natural Water Supply'
+        water_status = ClimateClassifier.water_status(climate['rainfall'])
         
         return {
             'climate': climate,
             'suitable_crops': crops,
             'recommendations': recommendations,
             'water_status': water_status,
-            'agricultural_potential': climate['suitability'],
-            'location': {
-                'latitude': latitude,
-                'longitude': longitude
-            }
+            'agricultural_potential': climate['suitability']
+        }
+    
+    @staticmethod
+    def condition_recommendations(temperature, humidity):
+        """Advice for the current temperature and humidity (not given for desert climates)"""
+        temperature = float(temperature)
+        humidity = float(humidity)
+        recommendations = []
+        
+        # Temperature-based recommendations
+        if temperature > 30:
+            recommendations.append("• Provide shade for sensitive crops")
+            recommendations.append("• Increase watering frequency")
+            recommendations.append("• Mulch to keep soil cool")
+        elif temperature < 15:
+            recommendations.append("• Consider cold-hardy varieties")
+            recommendations.append("• Use mulching for temperature regulation")
+            recommendations.append("• Protect crops from frost")
+        
+        # Humidity-based recommendations
+        if humidity > 75:
+            recommendations.append("• Watch for fungal diseases in high humidity")
+            recommendations.append("• Ensure good air circulation")
+        elif humidity < 40:
+            recommendations.append("• Increase irrigation frequency")
+            recommendations.append("• Use mulch to retain soil moisture")
+        
+        return recommendations
+    
+    @staticmethod
+    def analyze_location_climate(latitude, longitude, weather_data):
+        """
+        Comprehensive climate analysis for a location
+        """
+        # Get temperature and humidity
+        temperature = float(weather_data.get('temperature', 20))
+        humidity = float(weather_data.get('humidity', 60))
+        
+        analysis = ClimateClassifier.climate_profile(
+            latitude, temperature, humidity, weather_data.get('rainfall', 0)
+        )
+        if not analysis['climate']['is_desert']:
+            analysis['recommendations'] += ClimateClassifier.condition_recommendations(temperature, humidity)
+        
+        analysis['location'] = {
+            'latitude': latitude,
+            'longitude': longitude
         }
+        return analysis
     
     @staticmethod
     def get_climate_zone_by_coordinates(latitude):
@@ -0,0 +1,164 @@
+"""
+Precomputed climate analysis over a fixed latitude/longitude grid covering Kenya
+"""
+import json
+import os
+import threading
+from django.conf import settings
+from .climate_classifier import ClimateClassifier
+from .metrics import metrics
+
+
+class ClimateGrid:
+    """
+    Climate analysis looked up by grid cell instead of computed per request
+
+    build_climate_grid stores an int16 array with one entry per cell: an index
+    into a table of distinct analysis payloads, or -1 where no gazetteer place
+    is near enough to know the typical conditions. The array is opened as a
+    read-only memory map, so every worker process shares the same pages, and
+    cells with the same typical conditions share a single payload.
+    """
+
+    GRID_FILE = 'climate_grid.npy'
+    PAYLOAD_FILE = 'climate_payloads.json'
+    FORMAT_VERSION = 1
+    DEFAULT_RESOLUTION = 0.05  # degrees, ~5.5 km
+
+    def __init__(self, cells, payloads, bounds, resolution):
+        self.cells = cells
+        self.payloads = payloads
+        self.bounds = tuple(bounds)
+        self.resolution = float(resolution)
+
+    @staticmethod
+    def _config():
+        return getattr(settings, 'CLIMATE_GRID', {})
+
+    @staticmethod
+    def default_path():
+        return str(ClimateGrid._config().get('PATH', os.path.join(settings.BASE_DIR, 'climate_grid')))
+
+    @staticmethod
+    def shape(bounds, resolution):
+        """(rows, columns) of a grid over bounds at this resolution"""
+        min_lat, max_lat, min_lon, max_lon = bounds
+        return (
+            int(round((max_lat - min_lat) / resolution + 0.5)),
+            int(round((max_lon - min_lon) / resolution + 0.5)),
+        )
+
+    @classmethod
+    def load(cls, path=None):
+        import numpy as np
+
+        path = path or cls.default_path()
+        with open(os.path.join(path, cls.PAYLOAD_FILE), encoding='utf-8') as f:
+            table = json.load(f)
+        if table.get('version') != cls.FORMAT_VERSION:
+            raise ValueError(f"climate grid format {table.get('version')} is not {cls.FORMAT_VERSION}")
+        # A plain ndarray view of the memory map skips np.memmap's per-access overhead
+        cells = np.asarray(np.load(os.path.join(path, cls.GRID_FILE), mmap_mode='r'))
+        return cls(cells, table['payloads'], table['bounds'], table['resolution'])
+
+    def save(self, path):
+        """Write the grid and payload table, replacing any previous build atomically per file"""
+        import numpy as np
+
+        os.makedirs(path, exist_ok=True)
+        grid_path = os.path.join(path, self.GRID_FILE)
+        with open(grid_path + '.tmp', 'wb') as f:
+            np.save(f, self.cells)
+        payload_path = os.path.join(path, self.PAYLOAD_FILE)
+        with open(payload_path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': self.FORMAT_VERSION,
+                'bounds': list(self.bounds),
+                'resolution': self.resolution,
+                'payloads': self.payloads,
+            }, f, ensure_ascii=False, separators=(',', ':'))
+        # get_climate_grid() reloads when the payload table changes, so it is replaced last
+        os.replace(grid_path + '.tmp', grid_path)
+        os.replace(payload_path + '.tmp', payload_path)
+
+    def cell(self, latitude, longitude):
+        """(row, column) of the cell holding the point, or None outside the grid"""
+        min_lat, _, min_lon, _ = self.bounds
+        row = int((float(latitude) - min_lat) // self.resolution)
+        column = int((float(longitude) - min_lon) // self.resolution)
+        rows, columns = self.cells.shape
+        if 0 <= row < rows and 0 <= column < columns:
+            return row, column
+        return None
+
+    def lookup(self, latitude, longitude):
+        """Precomputed analysis for typical conditions at the point, or None"""
+        cell = self.cell(latitude, longitude)
+        if cell is None:
+            return None
+        index = self.cells.item(cell)
+        return self.payloads[index] if index >= 0 else None
+
+    @staticmethod
+    def analyze_location_climate(latitude, longitude, weather_data):
+        """
+        ClimateClassifier.analyze_location_climate answered from the grid
+
+        The climate, crops and water status come from the cell's typical
+        conditions; only the advice for the current temperature and humidity
+        is computed from the live weather. Points outside the grid, or any
+        process without a built grid, fall back to the full analysis.
+        """
+        grid = get_climate_grid()
+        payload = grid.lookup(latitude, longitude) if grid else None
+        if payload is None:
+            metrics.increment('climate_grid_misses_total')
+            return ClimateClassifier.analyze_location_climate(latitude, longitude, weather_data)
+
+        analysis = dict(payload, recommendations=list(payload['recommendations']))
+        if not analysis['climate']['is_desert']:
+            analysis['recommendations'] += ClimateClassifier.condition_recommendations(
+                weather_data.get('temperature', 20), weather_data.get('humidity', 60)
+            )
+        analysis['location'] = {
+            'latitude': latitude,
+            'longitude': longitude
+        }
+        return analysis
+
+
+_climate_grid = None
+_climate_grid_built = False  # mtime of the payload table the grid was loaded from
+_climate_grid_lock = threading.Lock()
+
+
+def _payload_file_mtime():
+    try:
+        return os.stat(os.path.join(ClimateGrid.default_path(), ClimateGrid.PAYLOAD_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_climate_grid():
+    """
+    Return the process-wide climate grid, or None if it has not been built
+
+    The payload table, which build_climate_grid replaces last, is checked on
+    every call (one stat), so running processes pick up a new build.
+    """
+    global _climate_grid, _climate_grid_built
+    built = _payload_file_mtime()
+    if built != _climate_grid_built:
+        with _climate_grid_lock:
+            if built != _climate_grid_built:
+                if built is None:
+                    _climate_grid = None
+                    print("Climate grid not built; run 'python manage.py build_climate_grid'")
+                else:
+                    try:
+                        _climate_grid = ClimateGrid.load()
+                    except Exception as e:
+                        # Keep serving the previous build rather than a half-written one
+                        print(f"Climate grid load error: {e}")
+                _climate_grid_built = built
+    return _climate_grid
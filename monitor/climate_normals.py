@@ -0,0 +1,157 @@
+"""
+Per-farm climate normals built from stored weather history
+"""
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Count, ExpressionWrapper, F, FloatField, Sum
+from django.utils import timezone
+from .climate_classifier import ClimateClassifier
+
+
+class ClimateNormalsService:
+    """
+    Maintain FarmClimateNormals rows from WeatherDailySummary
+
+    The 12-month window is aggregated from daily summaries (at most one row
+    per farm per day), so refreshing a farm costs a bounded indexed range scan
+    however long its history is. Rows are refreshed whenever daily summaries
+    change and once a day by refresh_climate_normals, which rolls the window
+    forward; reading a farm's classification is then a single-row lookup.
+
+    Observed rainfall only counts days whose summary has an accumulated total,
+    i.e. OpenWeatherMap hourly accumulations for every hour of the day. Summing
+    readings taken at the refresh cadence, or demo and legacy rows that store
+    0, would understate the year and classify farms as desert, so until enough
+    such days exist the classifier's estimate is used.
+    """
+
+    WINDOW_DAYS = 365
+    # With fewer observed days the rainfall total says little about a year
+    DEFAULT_MIN_DAYS = 90
+    BATCH_SIZE = 500
+
+    UPDATE_FIELDS = [
+        'window_start', 'window_end', 'days_observed', 'observation_count',
+        'temperature_mean', 'humidity_mean', 'rainfall_days', 'rainfall_total', 'annual_rainfall',
+        'rainfall_source', 'climate_code', 'climate_type', 'suitability', 'is_desert', 'updated_at',
+    ]
+
+    @staticmethod
+    def window(today=None):
+        """(first day, last day) of the rolling window ending today"""
+        today = today or timezone.localdate()
+        return today - timedelta(days=ClimateNormalsService.WINDOW_DAYS - 1), today
+
+    @staticmethod
+    def annual_rainfall(latitude, rainfall_days, rainfall_total, temperature_mean, humidity_mean):
+        """
+        (annual rainfall in mm, source) for a window's aggregates
+
+        rainfall_total is the accumulated rainfall of rainfall_days fully
+        covered days; it is scaled up to a full year. With too few such days
+        the classifier's estimate from the mean temperature and humidity is
+        used instead.
+        """
+        min_days = getattr(settings, 'CLIMATE_NORMALS_MIN_DAYS', ClimateNormalsService.DEFAULT_MIN_DAYS)
+        if rainfall_days >= min_days:
+            return float(rainfall_total) * ClimateNormalsService.WINDOW_DAYS / rainfall_days, 'observed'
+        return ClimateClassifier.estimate_annual_rainfall(
+            latitude if latitude is not None else 0, temperature_mean, humidity_mean
+        ), 'estimated'
+
+    @staticmethod
+    def _weighted(field):
+        """A daily mean weighted by the day's observation count"""
+        return ExpressionWrapper(F('observation_count') * F(field), output_field=FloatField())
+
+    @staticmethod
+    def refresh_farms(farm_ids, today=None):
+        """
+        Recompute the normals of the given farms in one aggregate and one upsert
+
+        Farms with no daily summaries inside the window lose their normals.
+        Returns the number of rows written.
+        """
+        from .models import Farm, FarmClimateNormals, WeatherDailySummary
+
+        farm_ids = set(farm_ids)
+        if not farm_ids:
+            return 0
+
+        window_start, window_end = ClimateNormalsService.window(today)
+        rows = (
+            WeatherDailySummary.objects
+            .filter(farm_id__in=farm_ids, date__gte=window_start, date__lte=window_end)
+            .values('farm_id')
+            .annotate(
+                days_observed=Count('id'),
+                observations=Sum('observation_count'),
+                temperature_sum=Sum(ClimateNormalsService._weighted('temperature_mean')),
+                humidity_sum=Sum(ClimateNormalsService._weighted('humidity_mean')),
+                rainfall_days=Count('accumulated_rainfall'),
+                rainfall_total=Sum('accumulated_rainfall'),
+            )
+            .order_by()
+        )
+        latitudes = dict(Farm.objects.filter(id__in=farm_ids).values_list('id', 'latitude'))
+
+        now = timezone.now()
+        normals = []
+        for row in rows:
+            if not row['observations']:
+                continue
+            temperature_mean = row['temperature_sum'] / row['observations']
+            humidity_mean = row['humidity_sum'] / row['observations']
+            rainfall_total = row['rainfall_total'] or 0
+            annual_rainfall, rainfall_source = ClimateNormalsService.annual_rainfall(
+                latitudes.get(row['farm_id']), row['rainfall_days'], rainfall_total,
+                temperature_mean, humidity_mean
+            )
+            climate = ClimateClassifier.classify_climate(temperature_mean, annual_rainfall, humidity_mean)
+            normals.append(FarmClimateNormals(
+                farm_id=row['farm_id'],
+                window_start=window_start,
+                window_end=window_end,
+                days_observed=row['days_observed'],
+                observation_count=row['observations'],
+                temperature_mean=temperature_mean,
+                humidity_mean=humidity_mean,
+                rainfall_days=row['rainfall_days'],
+                rainfall_total=rainfall_total,
+                annual_rainfall=annual_rainfall,
+                rainfall_source=rainfall_source,
+                climate_code=climate['climate_code'],
+                climate_type=climate['climate_type'],
+                suitability=climate['suitability'],
+                is_desert=climate['is_desert'],
+                updated_at=now,
+            ))
+
+        FarmClimateNormals.objects.bulk_create(
+            normals,
+            update_conflicts=True,
+            unique_fields=['farm'],
+            update_fields=ClimateNormalsService.UPDATE_FIELDS,
+        )
+        FarmClimateNormals.objects.filter(
+            farm_id__in=farm_ids - {normal.farm_id for normal in normals}
+        ).delete()
+        return len(normals)
+
+    @staticmethod
+    def refresh_all(today=None, farm_ids=None):
+        """Roll every farm's window forward (or just farm_ids); returns the number of rows written"""
+        from .models import Farm
+
+        ids = sorted(farm_ids or Farm.objects.values_list('id', flat=True))
+        written = 0
+        for start in range(0, len(ids), ClimateNormalsService.BATCH_SIZE):
+            written += ClimateNormalsService.refresh_farms(ids[start:start + ClimateNormalsService.BATCH_SIZE], today)
+        return written
+
+    @staticmethod
+    def for_farm(farm):
+        """The farm's stored normals, or None before any weather has been recorded"""
+        from .models import FarmClimateNormals
+
+        return FarmClimateNormals.objects.filter(farm=farm).first()
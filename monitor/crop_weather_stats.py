@@ -0,0 +1,253 @@
+"""
+Running weather statistics per crop, maintained as daily summaries change
+"""
+import math
+from collections import defaultdict
+from decimal import Decimal
+from django.db import transaction
+from django.utils import timezone
+
+
+class CropWeatherStatsService:
+    """
+    Maintain and read CropWeatherStats rows
+
+    Each row holds the observation count, the Welford mean and M2 of
+    temperature, the mean humidity and the rainfall total of every reading
+    since the crop was planted. When a day's summary changes, the old day is
+    removed from the row and the new one merged in with the pairwise update
+    of Chan et al., so keeping a crop current costs the same on day 300 of
+    its season as on day 5, and reading its statistics is one row.
+
+    Rows are built from the daily summaries the first time a crop is read.
+    Incremental updates skip crops without a row, and Crop.save() drops the
+    row when the crop's planting date, farm or active flag change, so a
+    missing row is always safe to rebuild.
+    """
+
+    # (count, temperature mean, temperature M2, humidity mean, rainfall total)
+    EMPTY = (0, 0.0, 0.0, 0.0, Decimal('0'))
+
+    UPDATE_FIELDS = [
+        'observation_count', 'temperature_mean', 'temperature_m2', 'humidity_mean',
+        'rainfall_total', 'updated_at',
+    ]
+
+    @staticmethod
+    def day_state(count, temperature_mean, temperature_variance, humidity_mean, rainfall_total):
+        """The state of one daily summary (its variance is the population variance)"""
+        return (
+            count, float(temperature_mean), float(temperature_variance) * count,
+            float(humidity_mean), Decimal(rainfall_total or 0),
+        )
+
+    @staticmethod
+    def merge(total, part):
+        """Combine two states"""
+        count = total[0] + part[0]
+        if not count:
+            return CropWeatherStatsService.EMPTY
+        delta = part[1] - total[1]
+        return (
+            count,
+            total[1] + delta * part[0] / count,
+            total[2] + part[2] + delta * delta * total[0] * part[0] / count,
+            total[3] + (part[3] - total[3]) * part[0] / count,
+            total[4] + part[4],
+        )
+
+    @staticmethod
+    def remove(total, part):
+        """Take a state that was merged in earlier back out"""
+        count = total[0] - part[0]
+        if count <= 0:
+            return CropWeatherStatsService.EMPTY
+        mean = (total[0] * total[1] - part[0] * part[1]) / count
+        delta = part[1] - mean
+        return (
+            count,
+            mean,
+            # Rounding can leave a tiny negative where the remaining readings are all equal
+            max(0.0, total[2] - part[2] - delta * delta * count * part[0] / total[0]),
+            (total[0] * total[3] - part[0] * part[3]) / count,
+            total[4] - part[4],
+        )
+
+    @staticmethod
+    def lock_farms(farm_ids):
+        """
+        Lock the rows of every crop on farm_ids until the transaction ends
+
+        Callers read the old daily summaries after this, so two refreshes of
+        the same farm cannot both take the same old day out of a row.
+        """
+        from .models import CropWeatherStats
+
+        list(
+            CropWeatherStats.objects.select_for_update(of=('self',))
+            .filter(crop__farm_id__in=farm_ids)
+            .order_by('crop_id')
+            .values_list('crop_id', flat=True)
+        )
+
+    @staticmethod
+    def apply_day_changes(old_days, new_days):
+        """
+        Update the stored rows of the crops whose season includes a changed day
+
+        Args:
+            old_days, new_days: dicts of (farm_id, date) -> day_state before
+                and after the summaries were refreshed; a missing key means
+                the day had no summary
+
+        Returns the number of rows updated. old_days must have been read in
+        the caller's transaction after lock_farms() for the same farms.
+        """
+        from .models import CropWeatherStats
+
+        changes = defaultdict(list)
+        for key in old_days.keys() | new_days.keys():
+            if old_days.get(key) != new_days.get(key):
+                changes[key[0]].append((key[1], old_days.get(key), new_days.get(key)))
+        if not changes:
+            return 0
+
+        with transaction.atomic():
+            rows = (
+                CropWeatherStats.objects.select_for_update()
+                .filter(crop__farm_id__in=changes.keys(), crop__is_active=True)
+                .values_list(
+                    'crop_id', 'crop__farm_id', 'crop__planting_date', 'observation_count',
+                    'temperature_mean', 'temperature_m2', 'humidity_mean', 'rainfall_total'
+                )
+            )
+            now = timezone.now()
+            updated = []
+            for crop_id, farm_id, planting_date, *state in rows:
+                state = tuple(state)
+                for day, old, new in changes[farm_id]:
+                    if day < planting_date:
+                        continue
+                    if old is not None:
+                        state = CropWeatherStatsService.remove(state, old)
+                    if new is not None:
+                        state = CropWeatherStatsService.merge(state, new)
+                updated.append(CropWeatherStatsService._row(crop_id, state, now))
+
+            CropWeatherStats.objects.bulk_create(
+                updated,
+                update_conflicts=True,
+                unique_fields=['crop'],
+                update_fields=CropWeatherStatsService.UPDATE_FIELDS,
+            )
+        return len(updated)
+
+    @staticmethod
+    def _row(crop_id, state, now):
+        from .models import CropWeatherStats
+
+        count, temperature_mean, temperature_m2, humidity_mean, rainfall_total = state
+        return CropWeatherStats(
+            crop_id=crop_id,
+            observation_count=count,
+            temperature_mean=temperature_mean,
+            temperature_m2=temperature_m2,
+            humidity_mean=humidity_mean,
+            rainfall_total=round(rainfall_total, 2),
+            updated_at=now,
+        )
+
+    @staticmethod
+    def build(crops):
+        """
+        Create or replace the rows of crops from their daily summaries
+
+        One grouped query over the season so far; returns the new states by crop id.
+        """
+        from .models import CropWeatherStats
+        from .prediction_service import YieldPredictionService
+
+        crops = list(crops)
+        stats = YieldPredictionService.batch_weather_stats(crops)
+        now = timezone.now()
+        states = {}
+        for i, crop in enumerate(crops):
+            count = int(stats['count'][i])
+            if count:
+                std = stats['temperature_std'][i]
+                states[crop.id] = (
+                    count,
+                    float(stats['avg_temperature'][i]),
+                    float(std) ** 2 * (count - 1) if count > 1 else 0.0,
+                    float(stats['avg_humidity'][i]),
+                    Decimal(str(round(float(stats['total_rainfall'][i]), 2))),
+                )
+            else:
+                states[crop.id] = CropWeatherStatsService.EMPTY
+
+        CropWeatherStats.objects.bulk_create(
+            [CropWeatherStatsService._row(crop_id, state, now) for crop_id, state in states.items()],
+            update_conflicts=True,
+            unique_fields=['crop'],
+            update_fields=CropWeatherStatsService.UPDATE_FIELDS,
+            batch_size=1000,
+        )
+        return states
+
+    @staticmethod
+    def rebuild(farm_ids=None):
+        """Rebuild every active crop's row (or those on farm_ids) from the daily summaries"""
+        from .models import Crop
+        from .prediction_service import YieldPredictionService
+
+        crops = Crop.objects.filter(is_active=True).only('id', 'farm_id', 'planting_date').order_by('id')
+        if farm_ids:
+            crops = crops.filter(farm_id__in=farm_ids)
+        crops = list(crops)
+        for start in range(0, len(crops), YieldPredictionService.BATCH_SIZE):
+            CropWeatherStatsService.build(crops[start:start + YieldPredictionService.BATCH_SIZE])
+        return len(crops)
+
+    @staticmethod
+    def stats(crops):
+        """
+        Weather statistics since planting for crops, read from their rows
+
+        Crops without a row are built first. Returns the same dict of NumPy
+        arrays as YieldPredictionService.batch_weather_stats.
+        """
+        import numpy as np
+        from .models import CropWeatherStats
+        from .prediction_service import YieldPredictionService
+
+        crops = list(crops)
+        ids = [crop.id for crop in crops]
+        states = {}
+        for start in range(0, len(ids), YieldPredictionService.BATCH_SIZE):
+            for crop_id, *state in CropWeatherStats.objects.filter(
+                crop_id__in=ids[start:start + YieldPredictionService.BATCH_SIZE]
+            ).values_list(
+                'crop_id', 'observation_count', 'temperature_mean', 'temperature_m2',
+                'humidity_mean', 'rainfall_total'
+            ):
+                states[crop_id] = tuple(state)
+        missing = [crop for crop in crops if crop.id not in states]
+        if missing:
+            states.update(CropWeatherStatsService.build(missing))
+
+        count = np.array([states[crop_id][0] for crop_id in ids], dtype=float)
+        has_weather = count > 0
+        return {
+            'count': count,
+            'avg_temperature': np.where(
+                has_weather, [states[crop_id][1] for crop_id in ids], np.nan
+            ).astype(float),
+            'temperature_std': np.array([
+                math.sqrt(states[crop_id][2] / (states[crop_id][0] - 1)) if states[crop_id][0] > 1 else math.nan
+                for crop_id in ids
+            ], dtype=float),
+            'avg_humidity': np.where(
+                has_weather, [states[crop_id][3] for crop_id in ids], np.nan
+            ).astype(float),
+            'total_rainfall': np.array([float(states[crop_id][4]) for crop_id in ids], dtype=float),
+        }
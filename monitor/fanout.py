@@ -0,0 +1,97 @@
+"""
+Concurrent upstream calls for a single request, bounded by a deadline
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.db import connections
+from .api_quota import ApiQuota
+from .metrics import metrics
+
+
+class FanOut:
+    """
+    Run independent calls of one page load side by side
+
+    Calls go to a process-wide thread pool rather than a pool per request, so
+    a call still running when the deadline passes does not hold the response
+    back: the page renders with what has finished, and the straggler completes
+    (and fills the caches) in the background.
+    """
+
+    DEFAULT_WORKERS = 16
+    DEFAULT_DEADLINE_SECONDS = 4.0
+
+    def __init__(self, executor):
+        self.executor = executor
+
+    @staticmethod
+    def default_deadline():
+        return getattr(settings, 'LOCATION_WEATHER_DEADLINE_SECONDS', FanOut.DEFAULT_DEADLINE_SECONDS)
+
+    @staticmethod
+    def _pooled(func):
+        """Worker-thread wrapper that keeps the caller's quota priority and releases DB connections"""
+        func = ApiQuota.bind_priority(func)
+
+        def run(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                connections.close_all()
+        return run
+
+    def submit(self, func, *args, **kwargs):
+        return self.executor.submit(self._pooled(func), *args, **kwargs)
+
+    def gather(self, futures, deadline):
+        """
+        Wait for named futures until `deadline` (a time.monotonic() value)
+
+        Returns:
+            (results by name, names that did not finish in time or raised)
+        """
+        done, _ = wait(futures.values(), timeout=max(0.0, deadline - time.monotonic()))
+        results = {}
+        incomplete = []
+        for call, future in futures.items():
+            if future not in done:
+                future.cancel()
+                metrics.increment('fanout_calls_total', call=call, result='timeout')
+                incomplete.append(call)
+            elif future.exception() is not None:
+                print(f"{call} call failed: {future.exception()}")
+                metrics.increment('fanout_calls_total', call=call, result='error')
+                incomplete.append(call)
+            else:
+                metrics.increment('fanout_calls_total', call=call, result='ok')
+                results[call] = future.result()
+        return results, incomplete
+
+    def run(self, calls, timeout=None):
+        """
+        Start every call in `calls` ({name: zero-argument callable}) at once
+
+        Returns:
+            (results by name, names that did not finish within `timeout` seconds or raised)
+        """
+        deadline = time.monotonic() + (self.default_deadline() if timeout is None else timeout)
+        return self.gather({call: self.submit(func) for call, func in calls.items()}, deadline)
+
+
+_fanout = None
+_fanout_lock = threading.Lock()
+
+
+def get_fanout():
+    """Return the process-wide fan-out pool sized by the FANOUT_WORKERS setting"""
+    global _fanout
+    if _fanout is None:
+        with _fanout_lock:
+            if _fanout is None:
+                _fanout = FanOut(ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'FANOUT_WORKERS', FanOut.DEFAULT_WORKERS),
+                    thread_name_prefix='fanout',
+                ))
+    return _fanout
@@ -0,0 +1,147 @@
+"""
+Persisted forecast store fed by the OpenWeatherMap forecast endpoints
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from django.db import connections, transaction
+from django.utils import timezone
+from .api_quota import ApiQuota
+
+
+class ForecastStore:
+    """Upsert forecast runs per farm so views and alerts can read them from the database"""
+
+    UPDATE_FIELDS = [
+        'run_time', 'temperature', 'temperature_min', 'temperature_max',
+        'humidity', 'rainfall', 'description',
+    ]
+
+    @staticmethod
+    def parse_5day(forecast_list):
+        """Convert get_5day_forecast() entries into ForecastRecord field dicts"""
+        entries = []
+        for item in forecast_list or []:
+            # dt_txt is UTC, e.g. "2026-10-18 12:00:00"
+            valid_time = datetime.strptime(item['datetime'], '%Y-%m-%d %H:%M:%S').replace(tzinfo=dt_timezone.utc)
+            entries.append({
+                'valid_time': valid_time,
+                'temperature': item['temperature'],
+                'humidity': item['humidity'],
+                'rainfall': item['rainfall'],
+                'description': item['description'][:200],
+            })
+        return entries
+
+    @staticmethod
+    def parse_daily(extended):
+        """Convert the 'daily' part of get_extended_weather() into ForecastRecord field dicts"""
+        entries = []
+        for item in (extended or {}).get('daily', []):
+            temp = item.get('temp', {})
+            entries.append({
+                'valid_time': datetime.fromtimestamp(item['dt'], tz=dt_timezone.utc),
+                'temperature': Decimal(str(temp.get('day', 0))),
+                'temperature_min': Decimal(str(temp['min'])) if 'min' in temp else None,
+                'temperature_max': Decimal(str(temp['max'])) if 'max' in temp else None,
+                'humidity': Decimal(str(item.get('humidity', 0))),
+                'rainfall': Decimal(str(item.get('rain', 0))),
+                'description': item.get('weather', [{}])[0].get('description', '')[:200],
+            })
+        return entries
+
+    @staticmethod
+    def store_run(farm, source, entries, run_time=None):
+        """
+        Idempotently store one forecast run for a farm
+
+        Rows are upserted on (farm, source, valid_time), then rows left over from
+        earlier runs are pruned, so the table holds only the latest run.
+        Returns the number of rows written.
+        """
+        from .models import ForecastRecord
+
+        if not entries:
+            return 0
+
+        run_time = run_time or timezone.now()
+        records = [
+            ForecastRecord(farm=farm, source=source, run_time=run_time, **entry)
+            for entry in entries
+        ]
+
+        with transaction.atomic():
+            ForecastRecord.objects.bulk_create(
+                records,
+                update_conflicts=True,
+                unique_fields=['farm', 'source', 'valid_time'],
+                update_fields=ForecastStore.UPDATE_FIELDS,
+            )
+            ForecastRecord.objects.filter(farm=farm, source=source).exclude(run_time=run_time).delete()
+
+        return len(records)
+
+    @staticmethod
+    def fetch(farm):
+        """Fetch both forecast products for a farm (network only, safe to run in a worker thread)"""
+        from .weather_service import WeatherService
+
+        return (
+            WeatherService.get_5day_forecast(farm.latitude, farm.longitude),
+            WeatherService.get_extended_weather(farm.latitude, farm.longitude),
+        )
+
+    @staticmethod
+    def store(farm, forecast_list, extended):
+        """Store the results of fetch(); returns the number of rows written"""
+        run_time = timezone.now()
+        return (
+            ForecastStore.store_run(farm, '3hourly', ForecastStore.parse_5day(forecast_list), run_time)
+            + ForecastStore.store_run(farm, 'daily', ForecastStore.parse_daily(extended), run_time)
+        )
+
+    @staticmethod
+    def refresh_farm(farm):
+        """Fetch and store the latest forecasts for one farm"""
+        return ForecastStore.store(farm, *ForecastStore.fetch(farm))
+
+    @staticmethod
+    def _pooled_fetch(farm):
+        """Worker-thread wrapper that releases the DB connection used by the API quota"""
+        try:
+            return ForecastStore.fetch(farm)
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def refresh_farms(farms, max_workers=None):
+        """
+        Refresh forecasts for many farms
+
+        Fetches run in a bounded thread pool; every write happens on the calling thread.
+        Returns the number of rows written.
+        """
+        from .weather_ingestion import WeatherIngestionService
+
+        farms = list(farms)
+        workers = WeatherIngestionService.get_max_workers(max_workers)
+        written = 0
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='forecast-fetch') as executor:
+            fetch = ApiQuota.bind_priority(ForecastStore._pooled_fetch)
+            for farm, (forecast_list, extended) in zip(farms, executor.map(fetch, farms)):
+                try:
+                    written += ForecastStore.store(farm, forecast_list, extended)
+                except Exception as e:
+                    print(f"Error storing forecast for {farm.name}: {e}")
+        return written
+
+    @staticmethod
+    def get_forecast(farm, source='3hourly', hours=None):
+        """Upcoming stored forecast rows for a farm, optionally limited to the next N hours"""
+        from .models import ForecastRecord
+
+        now = timezone.now()
+        forecasts = ForecastRecord.objects.filter(farm=farm, source=source, valid_time__gte=now)
+        if hours is not None:
+            forecasts = forecasts.filter(valid_time__lte=now + timedelta(hours=hours))
+        return forecasts
@@ -0,0 +1,160 @@
+"""
+Offline gazetteer of Kenyan counties and towns with a prefix index
+"""
+import bisect
+import csv
+import os
+import threading
+import unicodedata
+from collections import namedtuple
+
+
+Place = namedtuple('Place', 'name kind county latitude longitude mean_temp mean_humidity')
+
+
+class Gazetteer:
+    """
+    Bundled place list searchable by name or name prefix
+
+    Every place is indexed under its normalized name and under each later
+    word of it ("mai mahiu" and "mahiu"), in one sorted list of keys. A
+    prefix lookup is two binary searches over that list, so completions
+    never touch the network or the database.
+    """
+
+    PATH = os.path.join(os.path.dirname(__file__), 'data', 'kenya_gazetteer.csv')
+    COUNTRY = 'Kenya'
+    # (min_lat, max_lat, min_lon, max_lon) of the country; nearest() answers nothing outside it
+    BOUNDS = (-4.72, 5.03, 33.9, 41.91)
+
+    def __init__(self, places):
+        self.places = list(places)
+        self._tree = None
+        self._tree_ids = []
+        entries = []
+        for place_id, place in enumerate(self.places):
+            words = self.normalize(place.name).split()
+            for start in range(len(words)):
+                entries.append((' '.join(words[start:]), place_id))
+        entries.sort()
+        self._keys = [key for key, _ in entries]
+        self._ids = [place_id for _, place_id in entries]
+
+    def __len__(self):
+        return len(self.places)
+
+    @classmethod
+    def load(cls, path=None):
+        with open(path or cls.PATH, newline='', encoding='utf-8') as f:
+            return cls(
+                Place(
+                    name=row['name'],
+                    kind=row['kind'],
+                    county=row['county'],
+                    latitude=float(row['latitude']),
+                    longitude=float(row['longitude']),
+                    mean_temp=float(row['mean_temp_c']),
+                    mean_humidity=float(row['mean_humidity']),
+                )
+                for row in csv.DictReader(f)
+            )
+
+    @staticmethod
+    def normalize(text):
+        """Lowercase ASCII words: accents, apostrophes and punctuation removed"""
+        text = unicodedata.normalize('NFKD', str(text))
+        text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+        text = text.replace("'", '').replace('\u2019', '')
+        return ' '.join(''.join(char if char.isalnum() else ' ' for char in text).split())
+
+    def _matches(self, prefix):
+        low = bisect.bisect_left(self._keys, prefix)
+        high = bisect.bisect_left(self._keys, prefix + '\uffff')
+        seen = set()
+        for place_id in self._ids[low:high]:
+            if place_id not in seen:
+                seen.add(place_id)
+                yield self.places[place_id]
+
+    @staticmethod
+    def _rank(query):
+        # Exact names first, then counties before towns, then shorter names
+        def key(place):
+            return (Gazetteer.normalize(place.name) != query, place.kind != 'county', len(place.name), place.name)
+        return key
+
+    def complete(self, prefix, limit=10):
+        """Places whose name, or a word in it, starts with prefix"""
+        prefix = self.normalize(prefix)
+        if not prefix:
+            return []
+        return sorted(self._matches(prefix), key=self._rank(prefix))[:limit]
+
+    def lookup(self, query):
+        """
+        Places whose name matches a search query exactly
+
+        Accepts forms such as "Nakuru", "Nakuru County", "Thika, Kenya" and
+        "Karatina, Nyeri"; a second part narrows the match to that county.
+        Returns an empty list for anything the gazetteer does not know.
+        """
+        parts = [self.normalize(part) for part in str(query).split(',')]
+        parts = [part for part in parts if part]
+        if parts and parts[-1] == self.normalize(self.COUNTRY):
+            parts.pop()
+        if not parts or len(parts) > 2:
+            return []
+
+        name = parts[0]
+        if name.endswith(' county'):
+            name = name[:-len(' county')]
+        county = parts[1].replace(' county', '') if len(parts) == 2 else None
+
+        places = [
+            place for place in self._matches(name)
+            if self.normalize(place.name) == name
+            and (county is None or self.normalize(place.county) == county)
+        ]
+        return sorted(places, key=self._rank(name))
+
+    def nearest(self, latitude, longitude, max_distance_km=None):
+        """
+        (place, distance_km) of the place closest to a point, or None
+
+        The KD-tree over all places is built on the first call. Points outside
+        BOUNDS, or further than max_distance_km from every place, get None.
+        """
+        min_lat, max_lat, min_lon, max_lon = self.BOUNDS
+        if not (min_lat <= float(latitude) <= max_lat and min_lon <= float(longitude) <= max_lon):
+            return None
+        if self._tree is None:
+            from .spatial import SphereKDTree
+            # One point per coordinate pair; a town wins over the county row placed at it
+            point_ids = {}
+            for place_id, place in sorted(enumerate(self.places), key=lambda item: item[1].kind == 'county'):
+                point_ids.setdefault((place.latitude, place.longitude), place_id)
+            self._tree_ids = list(point_ids.values())
+            self._tree = SphereKDTree(list(point_ids))
+
+        found = self._tree.nearest(latitude, longitude)
+        if found is None:
+            return None
+        point, distance = found
+        place_id = self._tree_ids[point]
+        if max_distance_km is not None and distance > max_distance_km:
+            return None
+        return self.places[place_id], distance
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def get_gazetteer():
+    """Return the process-wide gazetteer, loading the bundled file on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.load()
+    return _gazetteer
@@ -0,0 +1,113 @@
+"""
+Two-tier cache for Nominatim geocoding answers
+"""
+import hashlib
+import time
+import unicodedata
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from django.utils import timezone
+from .metrics import metrics
+from .weather_cache import LocMemBackend
+
+
+class GeocodeCache:
+    """
+    Shared database cache with a per-process LRU in front of it
+
+    Forward searches are keyed by the normalized query text and reverse
+    lookups by coordinates rounded to REVERSE_PRECISION decimal places.
+    Queries Nominatim could not resolve are cached too (negative entries),
+    for a shorter time, so repeated typos do not spend the rate limit.
+    """
+
+    MISS = object()
+
+    DEFAULT_TTL = 30 * 86400
+    DEFAULT_NEGATIVE_TTL = 86400
+    DEFAULT_REVERSE_PRECISION = 3  # ~110 m
+
+    _local = None
+
+    @staticmethod
+    def _config():
+        return getattr(settings, 'GEOCODE_CACHE', {})
+
+    @staticmethod
+    def _local_tier():
+        if GeocodeCache._local is None:
+            GeocodeCache._local = LocMemBackend(max_entries=GeocodeCache._config().get('LOCAL_MAX_ENTRIES', 1024))
+        return GeocodeCache._local
+
+    @staticmethod
+    def search_key(query):
+        """Case-, width- and whitespace-insensitive key for a forward search"""
+        text = unicodedata.normalize('NFKC', str(query)).casefold()
+        key = ', '.join(' '.join(part.split()) for part in text.split(',') if part.strip())
+        if len(key) > 200:
+            key = key[:160] + '#' + hashlib.sha1(key.encode()).hexdigest()
+        return key
+
+    @staticmethod
+    def reverse_key(latitude, longitude):
+        """Key for a reverse lookup: coordinates rounded to REVERSE_PRECISION places"""
+        places = GeocodeCache._config().get('REVERSE_PRECISION', GeocodeCache.DEFAULT_REVERSE_PRECISION)
+        step = Decimal(1).scaleb(-places)
+
+        def snap(value):
+            return Decimal(str(value)).quantize(step, rounding=ROUND_HALF_UP) + 0  # + 0 folds -0 into 0
+        return f'{snap(latitude)}:{snap(longitude)}'
+
+    @staticmethod
+    def get(kind, key):
+        """Cached result for a lookup, or GeocodeCache.MISS"""
+        from .models import GeocodeCacheEntry
+
+        local_key = f'{kind}:{key}'
+        local = GeocodeCache._local_tier().get(local_key)
+        if local is not None and local[0] > time.time():
+            metrics.increment('geocode_cache_hits_total', kind=kind, tier='local')
+            return local[1]
+
+        try:
+            entry = GeocodeCacheEntry.objects.filter(kind=kind, key=key, expires_at__gt=timezone.now()).first()
+        except Exception as e:
+            print(f"Geocode cache read error: {e}")
+            entry = None
+
+        if entry is None:
+            metrics.increment('geocode_cache_misses_total', kind=kind)
+            return GeocodeCache.MISS
+
+        GeocodeCache._local_tier().set(local_key, (entry.expires_at.timestamp(), entry.result), None)
+        metrics.increment('geocode_cache_hits_total', kind=kind, tier='database')
+        return entry.result
+
+    @staticmethod
+    def set(kind, key, result, negative=False):
+        """Store an answer; negative entries use the shorter NEGATIVE_TTL"""
+        from .models import GeocodeCacheEntry
+
+        config = GeocodeCache._config()
+        ttl = (
+            config.get('NEGATIVE_TTL', GeocodeCache.DEFAULT_NEGATIVE_TTL) if negative
+            else config.get('TTL', GeocodeCache.DEFAULT_TTL)
+        )
+        expires_at = timezone.now() + timedelta(seconds=ttl)
+        try:
+            GeocodeCacheEntry.objects.update_or_create(
+                kind=kind, key=key,
+                defaults={'result': result, 'is_negative': negative, 'expires_at': expires_at}
+            )
+        except Exception as e:
+            print(f"Geocode cache write error: {e}")
+        GeocodeCache._local_tier().set(f'{kind}:{key}', (expires_at.timestamp(), result), None)
+
+    @staticmethod
+    def purge_expired():
+        """Delete expired entries; returns the number removed"""
+        from .models import GeocodeCacheEntry
+
+        deleted, _ = GeocodeCacheEntry.objects.filter(expires_at__lte=timezone.now()).delete()
+        return deleted
@@ -0,0 +1,135 @@
+"""
+Shared HTTP client with pooled keep-alive sessions, retries and latency metrics
+"""
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from .metrics import metrics
+
+
+class HttpClient:
+    """One keep-alive session per upstream host, shared by every service in the process"""
+
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+    IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+    def __init__(self, connect_timeout=3.05, read_timeout=10, max_retries=2,
+                 backoff_base=0.5, backoff_max=8.0, pool_maxsize=20, user_agent='ClimateMonitor/2.0'):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.pool_maxsize = pool_maxsize
+        self.user_agent = user_agent
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def session_for(self, url):
+        """Return the pooled session for the URL's scheme and host"""
+        parts = urlsplit(url)
+        host = f'{parts.scheme}://{parts.netloc}'
+        session = self._sessions.get(host)
+        if session is None:
+            with self._lock:
+                session = self._sessions.get(host)
+                if session is None:
+                    session = requests.Session()
+                    # Retries are handled in request() so they can be jittered and measured
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_maxsize, max_retries=0)
+                    session.mount(host, adapter)
+                    session.headers['User-Agent'] = self.user_agent
+                    self._sessions[host] = session
+        return session
+
+    def backoff(self, attempt, retry_after=None):
+        """Seconds to wait before the next attempt: Retry-After if given, else full-jitter exponential"""
+        if retry_after:
+            try:
+                return min(self.backoff_max, max(0.0, float(retry_after)))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def request(self, method, url, upstream, timeout=None, retries=None, acquire=None, **kwargs):
+        """
+        Send a request through the pooled session for its host
+
+        Retries 429/5xx responses and connection errors with jittered backoff.
+        Non-idempotent methods are only retried when the server never saw the
+        request (connect timeouts) or explicitly asked us to slow down (429).
+
+        For rate-limited upstreams pass `acquire`, a callable that takes a
+        quota token and returns False when none is available. The caller
+        pays for the first attempt; `acquire` is called before every retry,
+        and a retry without a token is not sent: the last response is
+        returned, or the last error raised.
+        """
+        method = method.upper()
+        retries = self.max_retries if retries is None else retries
+        session = self.session_for(url)
+        idempotent = method in self.IDEMPOTENT_METHODS
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except requests.RequestException as e:
+                metrics.observe('http_request_duration_seconds', time.perf_counter() - started, upstream=upstream)
+                metrics.increment('http_requests_total', upstream=upstream, status='error')
+                retryable = isinstance(e, requests.ConnectTimeout) or (
+                    idempotent and isinstance(e, (requests.ConnectionError, requests.Timeout))
+                )
+                if retryable and attempt < retries:
+                    time.sleep(self.backoff(attempt))
+                    if acquire is not None and not acquire():
+                        raise
+                    attempt += 1
+                    metrics.increment('http_retries_total', upstream=upstream)
+                    continue
+                raise
+
+            metrics.observe('http_request_duration_seconds', time.perf_counter() - started, upstream=upstream)
+            metrics.increment('http_requests_total', upstream=upstream, status=response.status_code)
+
+            retryable = response.status_code == 429 or (idempotent and response.status_code in self.RETRY_STATUSES)
+            if retryable and attempt < retries:
+                time.sleep(self.backoff(attempt, response.headers.get('Retry-After')))
+                if acquire is not None and not acquire():
+                    return response
+                attempt += 1
+                metrics.increment('http_retries_total', upstream=upstream)
+                continue
+            return response
+
+    def get(self, url, upstream, **kwargs):
+        return self.request('GET', url, upstream, **kwargs)
+
+    def post(self, url, upstream, **kwargs):
+        return self.request('POST', url, upstream, **kwargs)
+
+
+_http_client = None
+_http_client_lock = threading.Lock()
+
+
+def get_http_client():
+    """Return the process-wide client built from the HTTP_CLIENT setting"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                config = getattr(settings, 'HTTP_CLIENT', {})
+                _http_client = HttpClient(
+                    connect_timeout=config.get('CONNECT_TIMEOUT', 3.05),
+                    read_timeout=config.get('READ_TIMEOUT', 10),
+                    max_retries=config.get('MAX_RETRIES', 2),
+                    backoff_base=config.get('BACKOFF_BASE', 0.5),
+                    backoff_max=config.get('BACKOFF_MAX', 8.0),
+                    pool_maxsize=config.get('POOL_MAXSIZE', 20),
+                )
+    return _http_client
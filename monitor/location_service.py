@@ -1,8 +1,12 @@
 """
 Location and Geolocation Services
 """
-import requests
+import time
 from django.conf import settings
+from .api_quota import ApiQuota
+from .gazetteer import get_gazetteer
+from .geocode_cache import GeocodeCache
+from .http_client import get_http_client
 from decimal import Decimal
 
 
@@ -13,8 +17,60 @@ class LocationService:
     REVERSE_GEOCODING_URL = "https://nominatim.openstreetmap.org/reverse"
     
     @staticmethod
-    def get_location_from_coordinates(latitude, longitude):
-        """Get location name from coordinates (reverse geocoding)"""
+    def get_location_from_coordinates(latitude, longitude, enrich=True):
+        """
+        Get location name from coordinates (reverse geocoding)
+        
+        Coordinates in Kenya resolve offline to the nearest gazetteer town and
+        county. Nominatim is then asked for a more precise name only if its
+        answer is cached or a request fits in the rate limit right now, so the
+        offline answer is never held up waiting for quota.
+        """
+        location = LocationService.reverse_offline(latitude, longitude)
+        if not enrich:
+            return location
+        
+        enriched = LocationService.reverse_nominatim(
+            latitude, longitude, max_wait=0 if location else None
+        )
+        if not enriched:
+            return location
+        if location:
+            # Nominatim's village or suburb names win; the gazetteer fills any gaps
+            enriched = dict(enriched, **{
+                key: location[key] for key in ('city', 'county', 'country') if not enriched.get(key)
+            })
+        return enriched
+    
+    @staticmethod
+    def reverse_offline(latitude, longitude):
+        """Nearest gazetteer place to the coordinates, shaped like a reverse geocoding result"""
+        max_distance = getattr(settings, 'REVERSE_GEOCODE_MAX_DISTANCE_KM', 150)
+        found = get_gazetteer().nearest(latitude, longitude, max_distance)
+        if found is None:
+            return None
+        
+        place, distance = found
+        location = LocationService.place_to_location(place)
+        return {
+            'location': location['display_name'],
+            'city': location['city'],
+            'county': location['county'],
+            'country': location['country'],
+            'latitude': latitude,
+            'longitude': longitude,
+            'distance_km': round(distance, 1),
+            'source': 'gazetteer'
+        }
+    
+    @staticmethod
+    def reverse_nominatim(latitude, longitude, max_wait=None):
+        """Reverse geocode through Nominatim (cached), waiting at most max_wait seconds for quota"""
+        cache_key = GeocodeCache.reverse_key(latitude, longitude)
+        cached = GeocodeCache.get('reverse', cache_key)
+        if cached is not GeocodeCache.MISS:
+            return dict(cached, latitude=latitude, longitude=longitude) if cached else None
+        
         try:
             params = {
                 'lat': latitude,
@@ -27,15 +83,26 @@ class LocationService:
                 'User-Agent': 'ClimateMonitor/2.0'
             }
             
-            response = requests.get(
+            if not ApiQuota.acquire('nominatim', max_wait=max_wait):
+                print("Nominatim request skipped: rate limit reached")
+                return None
+            
+            response = get_http_client().get(
                 LocationService.REVERSE_GEOCODING_URL,
+                'nominatim',
                 params=params,
                 headers=headers,
-                timeout=10
+                # Every retry is another upstream request and must take its own token
+                acquire=lambda: ApiQuota.acquire('nominatim', max_wait=max_wait)
             )
             
             if response.status_code == 200:
                 data = response.json()
+                if data.get('error'):
+                    # Nominatim could not place these coordinates (e.g. open sea)
+                    GeocodeCache.set('reverse', cache_key, None, negative=True)
+                    return None
+                
                 address = data.get('address', {})
                 
                 # Build location string
@@ -57,14 +124,19 @@ class LocationService:
                 
                 location_name = ', '.join(location_parts) if location_parts else data.get('display_name', 'Unknown Location')
                 
-                return {
+                location = {
                     'location': location_name,
                     'city': address.get('city') or address.get('town') or address.get('village', ''),
                     'county': address.get('county') or address.get('state', ''),
                     'country': address.get('country', ''),
                     'latitude': latitude,
-                    'longitude': longitude
+                    'longitude': longitude,
+                    'source': 'nominatim'
                 }
+                GeocodeCache.set('reverse', cache_key, {
+                    key: value for key, value in location.items() if key not in ('latitude', 'longitude')
+                })
+                return location
             
             return None
             
@@ -72,9 +144,37 @@ class LocationService:
             print(f"Reverse geocoding error: {e}")
             return None
     
+    @staticmethod
+    def place_to_location(place):
+        """Shape a gazetteer Place like a search_location result"""
+        country = get_gazetteer().COUNTRY
+        if place.kind == 'county':
+            display_name = f'{place.name} County, {country}'
+        else:
+            display_name = f'{place.name}, {place.county} County, {country}'
+        return {
+            'display_name': display_name,
+            'latitude': place.latitude,
+            'longitude': place.longitude,
+            'city': place.name if place.kind == 'town' else '',
+            'county': place.county,
+            'country': country,
+            'type': place.kind
+        }
+    
     @staticmethod
     def search_location(location_name):
         """Search for location and get coordinates (geocoding)"""
+        # Kenyan towns and counties resolve offline from the bundled gazetteer
+        places = get_gazetteer().lookup(location_name)
+        if places:
+            return [LocationService.place_to_location(place) for place in places]
+        
+        cache_key = GeocodeCache.search_key(location_name)
+        cached = GeocodeCache.get('search', cache_key)
+        if cached is not GeocodeCache.MISS:
+            return cached
+        
         try:
             params = {
                 'q': location_name,
@@ -87,11 +187,17 @@ class LocationService:
                 'User-Agent': 'ClimateMonitor/2.0'
             }
             
-            response = requests.get(
+            if not ApiQuota.acquire('nominatim'):
+                print("Nominatim request skipped: rate limit reached")
+                return None
+            
+            response = get_http_client().get(
                 LocationService.GEOCODING_URL,
+                'nominatim',
                 params=params,
                 headers=headers,
-                timeout=10
+                # Every retry is another upstream request and must take its own token
+                acquire=lambda: ApiQuota.acquire('nominatim')
             )
             
             if response.status_code == 200:
@@ -111,7 +217,10 @@ class LocationService:
                             'type': result.get('type', '')
                         })
                     
+                    GeocodeCache.set('search', cache_key, locations)
                     return locations
+                
+                GeocodeCache.set('search', cache_key, [], negative=True)
             
             return []
             
@@ -120,44 +229,73 @@ class LocationService:
             return []
     
     @staticmethod
-    def get_current_location_weather(latitude, longitude):
-        """Get weather for current location"""
-        from .weather_service import WeatherService
+    def get_current_location_weather(latitude, longitude, timeout=None):
+        """
+        Get weather for current location
         
-        # Get location name
-        location_info = LocationService.get_location_from_coordinates(latitude, longitude)
+        Reverse geocoding and the weather call run concurrently under one
+        deadline. Whatever has not finished by then is left out and named in
+        'incomplete'; the location falls back to the offline gazetteer answer,
+        or to the bare coordinates.
+        """
+        from .fanout import get_fanout
+        from .weather_service import WeatherService
         
-        # Get weather data
-        weather_data = WeatherService.get_weather_data(latitude, longitude)
+        results, incomplete = get_fanout().run({
+            'location': lambda: LocationService.get_location_from_coordinates(latitude, longitude),
+            'weather': lambda: WeatherService.get_weather_data(latitude, longitude),
+        }, timeout)
         
-        if location_info and weather_data:
-            return {
-                'location': location_info,
-                'weather': weather_data
-            }
+        location_info = results.get('location') or LocationService.reverse_offline(latitude, longitude) or {
+            'location': f'{float(latitude):.4f}, {float(longitude):.4f}',
+            'latitude': latitude,
+            'longitude': longitude
+        }
         
-        return None
+        return {
+            'location': location_info,
+            'weather': results.get('weather'),
+            'incomplete': incomplete
+        }
     
     @staticmethod
-    def search_location_weather(location_name):
-        """Search location and get its weather"""
+    def search_location_weather(location_name, timeout=None):
+        """
+        Search location and get its weather
+        
+        The weather call needs the coordinates the search returns, so the two
+        run one after the other, but within a single deadline. Returns None if
+        the place is unknown; if the deadline passes first, the missing parts
+        are None and named in 'incomplete'.
+        """
+        from .fanout import FanOut, get_fanout
         from .weather_service import WeatherService
         
+        fanout = get_fanout()
+        deadline = time.monotonic() + (FanOut.default_deadline() if timeout is None else timeout)
+        
         # Search for location
-        locations = LocationService.search_location(location_name)
+        results, incomplete = fanout.gather(
+            {'search': fanout.submit(LocationService.search_location, location_name)}, deadline
+        )
+        locations = results.get('search')
         
         if not locations:
+            if incomplete:
+                return {'location': None, 'weather': None, 'all_results': [], 'incomplete': incomplete}
             return None
         
         # Get weather for first result
         first_location = locations[0]
-        weather_data = WeatherService.get_weather_data(
-            first_location['latitude'],
-            first_location['longitude']
-        )
+        results, incomplete = fanout.gather({
+            'weather': fanout.submit(
+                WeatherService.get_weather_data, first_location['latitude'], first_location['longitude']
+            )
+        }, deadline)
         
         return {
             'location': first_location,
-            'weather': weather_data,
-            'all_results': locations
+            'weather': results.get('weather'),
+            'all_results': locations,
+            'incomplete': incomplete
         }
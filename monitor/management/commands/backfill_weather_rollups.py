@@ -0,0 +1,38 @@
+"""Management command to build daily weather summaries from existing records"""
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from monitor.crop_weather_stats import CropWeatherStatsService
+from monitor.weather_rollups import WeatherRollupService
+
+
+class Command(BaseCommand):
+    help = 'Rebuild WeatherDailySummary rows, and the crop weather statistics built on them, from existing WeatherRecords'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--farm',
+            type=int,
+            action='append',
+            dest='farm_ids',
+            help='Only rebuild this farm (can be repeated)',
+        )
+        parser.add_argument(
+            '--since',
+            help='Only rebuild days on or after this date (YYYY-MM-DD)',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = date.fromisoformat(options['since'])
+            except ValueError:
+                raise CommandError('--since must be a date in YYYY-MM-DD format')
+        
+        self.stdout.write('Rebuilding daily weather summaries...')
+        written = WeatherRollupService.backfill(farm_ids=options['farm_ids'], since=since)
+        self.stdout.write(self.style.SUCCESS(f'✓ Wrote {written} daily summaries'))
+
+        # Exact totals from the rebuilt summaries, clearing any drift in the running updates
+        rebuilt = CropWeatherStatsService.rebuild(farm_ids=options['farm_ids'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt weather statistics for {rebuilt} active crops'))
@@ -0,0 +1,145 @@
+"""Management command to backtest yield predictors against recorded harvests"""
+import json
+import os
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from monitor.backtest import BacktestService
+
+
+class Command(BaseCommand):
+    help = 'Replay every prediction with an actual yield through one or more predictors and report their errors'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--predictor',
+            action='append',
+            dest='predictors',
+            help="heuristic, recorded, model (the active one) or model:VERSION; can be repeated "
+                 "(default: heuristic and recorded, plus model when one is active)",
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes used for prediction',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=BacktestService.CHUNK_SIZE,
+            help='Samples sent to a worker at a time',
+        )
+        parser.add_argument(
+            '--since',
+            help='Only replay predictions made on or after this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--until',
+            help='Only replay predictions made on or before this date (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--crop-type',
+            action='append',
+            dest='crop_types',
+            help='Only replay this crop type (can be repeated)',
+        )
+        parser.add_argument(
+            '--json',
+            metavar='PATH',
+            help='Also write the full report to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size must be at least 1')
+        since = self._date(options['since'], '--since')
+        until = self._date(options['until'], '--until')
+
+        predictors = options['predictors'] or self._default_predictors()
+        model_sources = {}
+        for predictor in predictors:
+            if predictor.partition(':')[0] not in BacktestService.PREDICTORS:
+                raise CommandError(f'Unknown predictor {predictor!r}; use one of {", ".join(BacktestService.PREDICTORS)}')
+            if predictor.startswith('model'):
+                try:
+                    model_sources[predictor] = BacktestService.resolve_model(predictor)
+                except (FileNotFoundError, ValueError) as e:
+                    raise CommandError(f'Cannot load {predictor}: {e}')
+
+        started = time.perf_counter()
+        samples = BacktestService.load_samples(since, until, options['crop_types'])
+        total = len(samples['actual'])
+        if not total:
+            raise CommandError('No predictions with an actual yield to replay')
+        self.stdout.write(
+            f"Rebuilt {total} predictions of {len(set(samples['crop_ids'].tolist()))} harvested crops "
+            f"as of their prediction dates in {time.perf_counter() - started:.1f}s"
+        )
+
+        report = {'samples': total, 'predictors': {}}
+        for predictor in predictors:
+            predicted, elapsed = BacktestService.run(
+                predictor, samples, options['workers'], options['chunk_size'], model_sources.get(predictor)
+            )
+            result = {
+                'version': model_sources[predictor][1] if predictor in model_sources else None,
+                'seconds': elapsed,
+                'crops_per_second': total / elapsed if elapsed else None,
+                'overall': BacktestService.errors(predicted, samples['actual']),
+                'by_crop_type': BacktestService.grouped_errors(predicted, samples['actual'], samples['crop_types']),
+                'by_county': BacktestService.grouped_errors(predicted, samples['actual'], samples['counties']),
+            }
+            report['predictors'][predictor] = result
+            self._print(predictor, result)
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['json']}")
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Backtested {len(predictors)} predictor(s) on {total} predictions '
+            f'in {time.perf_counter() - started:.1f}s'
+        ))
+
+    def _default_predictors(self):
+        from monitor.yield_model import YieldModel
+
+        predictors = ['heuristic', 'recorded']
+        if YieldModel.active_version():
+            predictors.append('model')
+        return predictors
+
+    def _date(self, value, option):
+        if not value:
+            return None
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            raise CommandError(f'{option} must be a date in YYYY-MM-DD format')
+
+    def _print(self, predictor, result):
+        label = predictor + (f" ({result['version']})" if result['version'] and ':' not in predictor else '')
+        rate = result['crops_per_second']
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f"\n{label}: {rate:,.0f} crops/s" if rate else f"\n{label}"
+        ))
+        if predictor.startswith('model'):
+            self.stdout.write('  Includes the samples the model was trained on; see train_yield_model --list for holdout error')
+        self.stdout.write(f"  {'':<20} {'n':>7} {'MAE':>9} {'MAPE %':>8} {'bias':>9}")
+        self._row('all', result['overall'])
+        for title, groups in (('crop type', result['by_crop_type']), ('county', result['by_county'])):
+            self.stdout.write(f'  by {title}:')
+            for key, errors in groups.items():
+                self._row(f'  {key}', errors)
+
+    def _row(self, name, errors):
+        def number(value, width):
+            return f'{value:>{width}.2f}' if value is not None else f"{'-':>{width}}"
+
+        self.stdout.write(
+            f"  {name[:20]:<20} {errors['n']:>7} {number(errors['mae'], 9)} "
+            f"{number(errors['mape'], 8)} {number(errors['bias'], 9)}"
+        )
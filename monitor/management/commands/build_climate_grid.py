@@ -0,0 +1,119 @@
+"""Management command to precompute climate analysis over a grid covering Kenya"""
+import json
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from monitor.climate_classifier import ClimateClassifier
+from monitor.climate_grid import ClimateGrid
+from monitor.gazetteer import get_gazetteer
+from monitor.spatial import SpatialService
+
+
+class Command(BaseCommand):
+    help = 'Build the memory-mapped climate grid used by the public location weather pages'
+
+    # Typical conditions are rounded before classification so that neighbouring
+    # cells with practically the same climate share one payload
+    TEMPERATURE_STEP = 0.5
+    HUMIDITY_STEP = 1.0
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--resolution',
+            type=float,
+            default=None,
+            help='Cell size in degrees (default: CLIMATE_GRID RESOLUTION setting)',
+        )
+        parser.add_argument(
+            '--output',
+            default=None,
+            help='Directory to write the grid to (default: CLIMATE_GRID PATH setting)',
+        )
+        parser.add_argument(
+            '--neighbours',
+            type=int,
+            default=4,
+            help='Gazetteer places averaged (inverse distance weighted) for each cell',
+        )
+
+    def handle(self, *args, **options):
+        import numpy as np
+
+        config = getattr(settings, 'CLIMATE_GRID', {})
+        resolution = options['resolution'] or config.get('RESOLUTION', ClimateGrid.DEFAULT_RESOLUTION)
+        if resolution <= 0:
+            raise CommandError('--resolution must be positive')
+        output = options['output'] or ClimateGrid.default_path()
+        max_distance = getattr(settings, 'REVERSE_GEOCODE_MAX_DISTANCE_KM', 150)
+
+        started = time.monotonic()
+        gazetteer = get_gazetteer()
+        bounds = gazetteer.BOUNDS
+        rows, columns = ClimateGrid.shape(bounds, resolution)
+        latitudes = bounds[0] + (np.arange(rows) + 0.5) * resolution
+        longitudes = bounds[2] + (np.arange(columns) + 0.5) * resolution
+        cell_lat, cell_lon = (values.ravel() for values in np.meshgrid(latitudes, longitudes, indexing='ij'))
+
+        temperature, humidity, nearest = self._typical_conditions(
+            gazetteer.places, cell_lat, cell_lon, min(options['neighbours'], len(gazetteer)) or 1
+        )
+        temperature = np.round(temperature / self.TEMPERATURE_STEP) * self.TEMPERATURE_STEP
+        humidity = np.round(humidity / self.HUMIDITY_STEP) * self.HUMIDITY_STEP
+
+        cells = np.full(rows * columns, -1, dtype=np.int16)
+        payloads = []
+        interned = {}
+        for index in np.flatnonzero(nearest <= max_distance):
+            profile = ClimateClassifier.climate_profile(
+                float(cell_lat[index]), float(temperature[index]), float(humidity[index])
+            )
+            key = json.dumps(profile, sort_keys=True)
+            if key not in interned:
+                if len(payloads) >= np.iinfo(np.int16).max:
+                    raise CommandError('Too many distinct payloads; use a coarser --resolution')
+                interned[key] = len(payloads)
+                payloads.append(profile)
+            cells[index] = interned[key]
+
+        grid = ClimateGrid(cells.reshape(rows, columns), payloads, bounds, resolution)
+        grid.save(output)
+
+        covered = int((cells >= 0).sum())
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Built {rows} x {columns} climate grid at {resolution}° in {output}: '
+            f'{covered} cells covered, {len(payloads)} distinct payloads '
+            f'({time.monotonic() - started:.1f}s)'
+        ))
+        self.stdout.write('Restart web workers to load the new grid')
+
+    @staticmethod
+    def _typical_conditions(places, cell_lat, cell_lon, neighbours):
+        """
+        Inverse-distance-weighted mean temperature and humidity of the nearest
+        gazetteer places, plus the distance (km) to the nearest one, per cell
+        """
+        import numpy as np
+
+        place_lat = np.radians([place.latitude for place in places])
+        place_lon = np.radians([place.longitude for place in places])
+        lat = np.radians(cell_lat)[:, None]
+        lon = np.radians(cell_lon)[:, None]
+        a = (
+            np.sin((place_lat - lat) / 2) ** 2
+            + np.cos(lat) * np.cos(place_lat) * np.sin((place_lon - lon) / 2) ** 2
+        )
+        distance = 2 * SpatialService.EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))
+
+        closest = np.argpartition(distance, neighbours - 1, axis=1)[:, :neighbours]
+        closest_distance = np.take_along_axis(distance, closest, axis=1)
+        # A place within 100 m of the cell centre dominates instead of dividing by zero
+        weights = 1.0 / np.maximum(closest_distance, 0.1) ** 2
+        weights /= weights.sum(axis=1, keepdims=True)
+
+        mean_temp = np.array([place.mean_temp for place in places])
+        mean_humidity = np.array([place.mean_humidity for place in places])
+        return (
+            (weights * mean_temp[closest]).sum(axis=1),
+            (weights * mean_humidity[closest]).sum(axis=1),
+            closest_distance.min(axis=1),
+        )
@@ -0,0 +1,108 @@
+"""Management command to collapse duplicate weather observations"""
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+from monitor.models import WeatherRecord
+from monitor.weather_ingestion import WeatherIngestionService
+from monitor.weather_rollups import WeatherRollupService
+
+
+class Command(BaseCommand):
+    help = 'Keep one WeatherRecord per farm, source and observation slot, deleting the rest'
+
+    BATCH_SIZE = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--slot-minutes',
+            type=int,
+            help='Slot length to compact to (default: WEATHER_OBSERVATION_SLOT_MINUTES)',
+        )
+        parser.add_argument(
+            '--older-than',
+            type=int,
+            metavar='DAYS',
+            help='Only compact records dated more than this many days ago',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be removed without changing anything',
+        )
+        parser.add_argument(
+            '--vacuum',
+            action='store_true',
+            help='Reclaim disk space after deleting (SQLite and PostgreSQL only)',
+        )
+
+    def handle(self, *args, **options):
+        slot_minutes = options['slot_minutes']
+        if slot_minutes is not None and slot_minutes < 1:
+            raise CommandError('--slot-minutes must be at least 1')
+
+        records = WeatherRecord.objects.all()
+        if options['older_than'] is not None:
+            cutoff = timezone.localdate() - timedelta(days=options['older_than'])
+            records = records.filter(date__lt=cutoff)
+
+        total = records.count()
+        self.stdout.write(f'Scanning {total} weather records...')
+
+        # The newest record in each slot wins, matching what an upsert would have kept
+        keepers = {}
+        duplicates = []
+        affected_days = set()
+        rows = records.order_by('id').values_list('id', 'farm_id', 'source', 'observed_at', 'date')
+        for record_id, farm_id, source, observed_at, day in rows.iterator():
+            slot = WeatherIngestionService.observation_slot(observed_at, slot_minutes)
+            key = (farm_id, source, slot)
+            previous = keepers.get(key)
+            if previous is not None:
+                duplicates.append(previous[0])
+                affected_days.add((farm_id, previous[2]))
+                affected_days.add((farm_id, day))
+            keepers[key] = (record_id, observed_at, day)
+
+        reslotted = [
+            WeatherRecord(id=record_id, observed_at=slot)
+            for (_, _, slot), (record_id, observed_at, _) in keepers.items()
+            if observed_at != slot
+        ]
+
+        if options['dry_run']:
+            self.stdout.write(
+                f'Would remove {len(duplicates)} duplicate records '
+                f'and re-key {len(reslotted)} across {len(affected_days)} farm-days'
+            )
+            return
+
+        with transaction.atomic():
+            for start in range(0, len(duplicates), self.BATCH_SIZE):
+                WeatherRecord.objects.filter(id__in=duplicates[start:start + self.BATCH_SIZE]).delete()
+            WeatherRecord.objects.bulk_update(reslotted, ['observed_at'], batch_size=self.BATCH_SIZE)
+
+            days = sorted(affected_days)
+            for start in range(0, len(days), 1000):
+                WeatherRollupService.refresh_days(days[start:start + 1000])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Removed {len(duplicates)} duplicate records ({total} → {total - len(duplicates)}), '
+            f'refreshed {len(affected_days)} daily summaries'
+        ))
+
+        if options['vacuum']:
+            self.vacuum()
+
+    def vacuum(self):
+        if connection.vendor == 'sqlite':
+            statement = 'VACUUM'
+        elif connection.vendor == 'postgresql':
+            statement = f'VACUUM ANALYZE {WeatherRecord._meta.db_table}'
+        else:
+            self.stdout.write(self.style.WARNING(f'VACUUM is not supported on {connection.vendor}, skipping'))
+            return
+
+        with connection.cursor() as cursor:
+            cursor.execute(statement)
+        self.stdout.write(self.style.SUCCESS('✓ Reclaimed free space'))
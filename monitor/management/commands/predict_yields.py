@@ -0,0 +1,64 @@
+"""Management command to predict yields for every active crop in batches"""
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from monitor.models import Crop
+from monitor.prediction_service import YieldPredictionService
+
+
+class Command(BaseCommand):
+    help = 'Predict yields for all active crops with the vectorized batch predictor (run nightly)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=YieldPredictionService.BATCH_SIZE,
+            help='Crops predicted and written per batch',
+        )
+        parser.add_argument(
+            '--replace',
+            action='store_true',
+            help="Replace predictions already made today instead of skipping those crops",
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Compute predictions without saving them',
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        # prediction_date is auto_now_add, which stores date.today()
+        today = date.today()
+        crops = Crop.objects.filter(is_active=True)
+        if not options['replace']:
+            crops = crops.exclude(predictions__prediction_date=today)
+        crop_ids = list(crops.order_by('id').values_list('id', flat=True).distinct())
+        self.stdout.write(f'Predicting yields for {len(crop_ids)} active crops...')
+
+        started = time.monotonic()
+        written = 0
+        for start in range(0, len(crop_ids), batch_size):
+            batch = list(
+                Crop.objects.filter(id__in=crop_ids[start:start + batch_size])
+                .only('id', 'crop_type', 'current_stage', 'area_planted', 'planting_date', 'farm_id')
+                .order_by('id')
+            )
+            predictions = YieldPredictionService.predict_batch(batch)
+            if options['dry_run']:
+                written += len(predictions)
+                continue
+
+            YieldPredictionService.store_predictions(batch, predictions, replace=options['replace'])
+            written += len(predictions)
+
+        elapsed = time.monotonic() - started
+        rate = written / elapsed if elapsed else 0
+        verb = 'Computed' if options['dry_run'] else 'Saved'
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ {verb} {written} predictions in {elapsed:.1f}s ({rate:,.0f} crops/s)'
+        ))
@@ -0,0 +1,110 @@
+"""Management command to measure how long a fresh process takes to become ready"""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+STARTUP_SCRIPT = '''
+import importlib, json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+for name in sys.argv[1:]:
+    importlib.import_module(name)
+elapsed = (time.perf_counter() - started) * 1000
+print(json.dumps({"elapsed_ms": elapsed, "modules": sorted(sys.modules)}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start time (django.setup() plus the URLconf) and report import time per module'
+
+    # Loaded only by the code paths that need them; seeing one at startup is a regression
+    HEAVY_MODULES = ('pandas', 'numpy', 'sklearn', 'scipy')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--budget-ms',
+            type=float,
+            default=None,
+            help='Fail if startup takes longer than this (default: STARTUP_BUDGET_MS setting)',
+        )
+        parser.add_argument(
+            '--runs',
+            type=int,
+            default=3,
+            help='Fresh interpreters to time; the fastest run is reported',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=15,
+            help='Number of packages and app modules to list',
+        )
+        parser.add_argument(
+            '--module',
+            action='append',
+            dest='modules',
+            help='Module to import after setup (default: ROOT_URLCONF, which loads every view); can be repeated',
+        )
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1:
+            raise CommandError('--runs must be at least 1')
+        budget = options['budget_ms'] if options['budget_ms'] is not None else getattr(settings, 'STARTUP_BUDGET_MS', None)
+        modules = options['modules'] or [settings.ROOT_URLCONF]
+
+        runs = [self._run(modules) for _ in range(options['runs'])]
+        best = min(runs, key=lambda run: run['elapsed_ms'])
+        timings = self._import_times(modules)
+
+        self.stdout.write(
+            f"Cold start: {best['elapsed_ms']:.0f} ms (fastest of {len(runs)}; "
+            f"slowest {max(run['elapsed_ms'] for run in runs):.0f} ms) importing {', '.join(modules)}"
+        )
+
+        packages = defaultdict(int)
+        for name, self_us, _ in timings:
+            packages[name.split('.')[0]] += self_us
+        self.stdout.write('\nImport time by top-level package (self time, with -X importtime):')
+        for package, total in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]:
+            self.stdout.write(f'  {total / 1000:8.1f} ms  {package}')
+
+        app_modules = [timing for timing in timings if timing[0].split('.')[0] in ('monitor', 'ccm_project')]
+        self.stdout.write('\nApp modules (cumulative):')
+        for name, _, cumulative_us in sorted(app_modules, key=lambda timing: -timing[2])[:options['top']]:
+            self.stdout.write(f'  {cumulative_us / 1000:8.1f} ms  {name}')
+
+        heavy = [name for name in self.HEAVY_MODULES if name in best['modules']]
+        if heavy:
+            self.stdout.write(self.style.WARNING(f"\nHeavy modules imported at startup: {', '.join(heavy)}"))
+
+        if budget is not None:
+            if best['elapsed_ms'] > budget:
+                raise CommandError(f"Startup took {best['elapsed_ms']:.0f} ms, over the {budget:.0f} ms budget")
+            self.stdout.write(self.style.SUCCESS(f"\n✓ Within the {budget:.0f} ms startup budget"))
+
+    def _run(self, modules, importtime=False):
+        """Start a fresh interpreter, import the modules and return its timing report"""
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', STARTUP_SCRIPT] + modules
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'ccm_project.settings')
+        result = subprocess.run(command, capture_output=True, text=True, cwd=str(settings.BASE_DIR), env=env)
+        if result.returncode != 0:
+            raise CommandError(f'Startup failed:\n{result.stderr[-2000:]}')
+        result_line = result.stdout.strip().splitlines()[-1]
+        return dict(json.loads(result_line), stderr=result.stderr)
+
+    def _import_times(self, modules):
+        """[(module, self microseconds, cumulative microseconds)] from one -X importtime run"""
+        timings = []
+        for line in self._run(modules, importtime=True)['stderr'].splitlines():
+            if not line.startswith('import time:') or 'self [us]' in line:
+                continue
+            self_us, cumulative_us, name = line[len('import time:'):].split('|')
+            timings.append((name.strip(), int(self_us), int(cumulative_us)))
+        return timings
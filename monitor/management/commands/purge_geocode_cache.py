@@ -0,0 +1,11 @@
+"""Management command to delete expired geocoding cache entries"""
+from django.core.management.base import BaseCommand
+from monitor.geocode_cache import GeocodeCache
+
+
+class Command(BaseCommand):
+    help = 'Delete expired GeocodeCacheEntry rows'
+
+    def handle(self, *args, **options):
+        deleted = GeocodeCache.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'✓ Removed {deleted} expired geocode cache entries'))
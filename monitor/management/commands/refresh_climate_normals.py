@@ -0,0 +1,22 @@
+"""Management command to roll farm climate normals forward to today"""
+from django.core.management.base import BaseCommand
+from monitor.climate_normals import ClimateNormalsService
+
+
+class Command(BaseCommand):
+    help = 'Recompute the rolling 12-month FarmClimateNormals (run daily)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--farm',
+            type=int,
+            action='append',
+            dest='farm_ids',
+            help='Only refresh this farm (can be repeated)',
+        )
+
+    def handle(self, *args, **options):
+        window_start, window_end = ClimateNormalsService.window()
+        self.stdout.write(f'Refreshing climate normals for {window_start} to {window_end}...')
+        written = ClimateNormalsService.refresh_all(farm_ids=options['farm_ids'])
+        self.stdout.write(self.style.SUCCESS(f'✓ Updated climate normals for {written} farms'))
@@ -0,0 +1,45 @@
+"""Management command to recompute the yield predictions whose inputs changed"""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from monitor.models import Crop
+from monitor.prediction_service import YieldPredictionService
+
+
+class Command(BaseCommand):
+    help = 'Advance crop stages and recompute predictions for crops marked dirty by new weather or edits'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=YieldPredictionService.BATCH_SIZE,
+            help='Crops predicted and written per batch',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Mark every active crop dirty first, e.g. after changing the prediction model',
+        )
+        parser.add_argument(
+            '--skip-stages',
+            action='store_true',
+            help='Do not advance growth stages before refreshing',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        started = time.monotonic()
+        if options['all']:
+            marked = Crop.objects.filter(is_active=True).update(prediction_dirty=True)
+            self.stdout.write(f'Marked {marked} active crops dirty')
+        if not options['skip_stages']:
+            advanced = YieldPredictionService.advance_stages()
+            self.stdout.write(f'Advanced the growth stage of {advanced} crop(s)')
+
+        refreshed = YieldPredictionService.refresh_dirty(options['batch_size'])
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Refreshed predictions for {refreshed} dirty crop(s) in {elapsed:.1f}s'
+        ))
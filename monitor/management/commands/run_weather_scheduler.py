@@ -0,0 +1,132 @@
+"""Management command that keeps farm weather fresh on a per-farm schedule"""
+import signal
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.utils import timezone
+from monitor.api_quota import ApiQuota
+from monitor.prediction_service import YieldPredictionService
+from monitor.refresh_scheduler import RefreshScheduler
+from monitor.weather_ingestion import WeatherIngestionService
+
+
+class Command(BaseCommand):
+    help = 'Run a long-lived scheduler that refreshes each farm when its weather is due'
+
+    # Longest single sleep, so a stop signal or reload is never far away
+    MAX_SLEEP_SECONDS = 60
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Most farms refreshed in one wake-up',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of concurrent weather fetches (default: WEATHER_FETCH_WORKERS setting)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=WeatherIngestionService.DEFAULT_CHUNK_SIZE,
+            help='Farms written per database transaction',
+        )
+        parser.add_argument(
+            '--spread-minutes',
+            type=float,
+            default=15,
+            help='Window over which overdue farms are spread when the queue is loaded',
+        )
+        parser.add_argument(
+            '--reload-minutes',
+            type=float,
+            default=5,
+            help='How often to reload farms, crop stages and alerts and refresh stale yield predictions',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Refresh the farms that are due now and exit',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Print the upcoming schedule and exit',
+        )
+
+    @ApiQuota.priority(ApiQuota.BACKGROUND)
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be at least 1')
+        if options['reload_minutes'] <= 0:
+            raise CommandError('--reload-minutes must be positive')
+
+        scheduler = RefreshScheduler(
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            chunk_size=options['chunk_size'],
+            spread=timedelta(minutes=0 if options['once'] else options['spread_minutes']),
+        )
+        count = scheduler.load()
+        self.stdout.write(f'Scheduling weather refreshes for {count} farms')
+
+        if options['dry_run']:
+            for due_at, farm in scheduler.upcoming(20):
+                interval = scheduler.intervals[farm.id]
+                self.stdout.write(
+                    f'  {timezone.localtime(due_at):%Y-%m-%d %H:%M:%S}  {farm.name} '
+                    f'(every {interval.total_seconds() / 60:.0f} min)'
+                )
+            return
+
+        if options['once']:
+            self._report(scheduler.run_due())
+            self._refresh_predictions()
+            return
+
+        # Stop cleanly under process managers that send SIGTERM
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+        reload_every = options['reload_minutes'] * 60
+        last_load = time.monotonic()
+        try:
+            while True:
+                close_old_connections()
+                if time.monotonic() - last_load >= reload_every:
+                    scheduler.load()
+                    self._refresh_predictions()
+                    last_load = time.monotonic()
+
+                result = scheduler.run_due()
+                if result['refreshed'] or result['failed']:
+                    self._report(result)
+
+                wait = scheduler.seconds_until_next()
+                reload_in = reload_every - (time.monotonic() - last_load)
+                time.sleep(max(0.1, min(wait if wait is not None else reload_in, reload_in, self.MAX_SLEEP_SECONDS)))
+        except KeyboardInterrupt:
+            self.stdout.write('Scheduler stopped')
+
+    def _refresh_predictions(self):
+        """Recompute the predictions that new weather or stage changes made stale"""
+        try:
+            YieldPredictionService.advance_stages()
+            refreshed = YieldPredictionService.refresh_dirty()
+        except Exception as e:
+            print(f"Error refreshing yield predictions: {e}")
+            return
+        if refreshed:
+            self.stdout.write(f'{timezone.localtime():%H:%M:%S} refreshed {refreshed} yield prediction(s)')
+
+    def _report(self, result):
+        message = f'{timezone.localtime():%H:%M:%S} refreshed {result["refreshed"]} farm(s)'
+        if result['alerts']:
+            message += f', {result["alerts"]} alert(s) created'
+        self.stdout.write(self.style.SUCCESS(message))
+        if result['failed']:
+            self.stdout.write(self.style.ERROR(f'  ✗ {result["failed"]} farm(s) failed, retrying later'))
@@ -1,7 +1,8 @@
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User
 from monitor.models import Farmer, Farm, Crop, WeatherRecord, Alert
-from datetime import date, timedelta
+from monitor.weather_rollups import WeatherRollupService
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
 from decimal import Decimal
 
 
@@ -110,8 +111,10 @@ class Command(BaseCommand):
             record_date = today - timedelta(days=i)
             WeatherRecord.objects.get_or_create(
                 farm=farm1,
-                date=record_date,
+                source='demo',
+                observed_at=datetime.combine(record_date, time(12), tzinfo=dt_timezone.utc),
                 defaults={
+                    'date': record_date,
                     'temperature': Decimal('22.5') + Decimal(str(i * 0.5)),
                     'humidity': Decimal('65.0') + Decimal(str(i * 2)),
                     'rainfall': Decimal('2.5') if i % 2 == 0 else Decimal('0'),
@@ -120,6 +123,7 @@ class Command(BaseCommand):
                 }
             )
 
+        WeatherRollupService.backfill(farm_ids=[farm1.id])
         self.stdout.write(self.style.SUCCESS('Created weather records'))
 
         # Create alerts
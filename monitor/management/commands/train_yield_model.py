@@ -0,0 +1,217 @@
+"""Management command to train a yield model on recorded harvests"""
+import time
+from collections import defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from monitor.models import Crop, YieldPrediction
+from monitor.prediction_service import YieldPredictionService
+from monitor.yield_model import YieldModel
+
+
+class Command(BaseCommand):
+    help = 'Fit a yield model on predictions with an actual yield, save it to the registry and activate it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--alpha',
+            type=float,
+            default=1.0,
+            help='Ridge regularisation strength',
+        )
+        parser.add_argument(
+            '--holdout',
+            type=float,
+            default=0.2,
+            help='Fraction of crops held out to compare the model with the heuristic',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed for the holdout split',
+        )
+        parser.add_argument(
+            '--min-samples',
+            type=int,
+            default=50,
+            help='Refuse to train on fewer predictions with an actual yield',
+        )
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Activate the new model even if it does not beat the heuristic on the holdout",
+        )
+        parser.add_argument(
+            '--no-activate',
+            action='store_true',
+            help='Save the new model without activating it',
+        )
+        parser.add_argument(
+            '--list',
+            action='store_true',
+            help='List the models in the registry and exit',
+        )
+        parser.add_argument(
+            '--activate',
+            metavar='VERSION',
+            help='Activate an existing version (e.g. to roll back) and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['list']:
+            return self._list()
+        if options['activate']:
+            try:
+                YieldModel.activate(options['activate'])
+            except (FileNotFoundError, ValueError) as e:
+                raise CommandError(f"Cannot activate {options['activate']}: {e}")
+            self.stdout.write(self.style.SUCCESS(f"✓ Activated yield model {options['activate']}"))
+            self._invalidate_predictions()
+            return
+        if not 0 < options['holdout'] < 1:
+            raise CommandError('--holdout must be between 0 and 1')
+
+        import numpy as np
+
+        started = time.monotonic()
+        rows = list(
+            YieldPrediction.objects.filter(actual_yield__isnull=False, crop__area_planted__gt=0)
+            .values_list(
+                'id', 'crop_id', 'crop__crop_type', 'crop__planting_date', 'prediction_date',
+                'crop__area_planted', 'actual_yield'
+            )
+            .order_by('id')
+        )
+        self.stdout.write(f'Loading weather for {len(rows)} predictions with an actual yield...')
+        stats = YieldPredictionService.prediction_weather_stats([row[0] for row in rows])
+
+        # The model only serves crops with weather, so it is only trained on them
+        has_weather = stats['count'] > 0
+        rows = [row for row, keep in zip(rows, has_weather) if keep]
+        stats = {name: values[has_weather] for name, values in stats.items()}
+        if len(rows) < options['min_samples']:
+            raise CommandError(
+                f"Only {len(rows)} predictions with an actual yield and weather; need {options['min_samples']}"
+            )
+
+        crop_ids = np.array([row[1] for row in rows])
+        crop_types = [row[2] for row in rows]
+        # The stage the crop was at when the prediction was made, not today's
+        stages = [YieldPredictionService.stage_for_days(row[2], (row[4] - row[3]).days) for row in rows]
+        areas = np.array([float(row[5]) for row in rows])
+        actual = np.array([float(row[6]) for row in rows])
+        heuristic = YieldPredictionService.predict_arrays(crop_types, stages, areas, stats)
+
+        # Hold out whole crops so repeated predictions of one crop never straddle the split
+        unique_crops = np.unique(crop_ids)
+        rng = np.random.default_rng(options['seed'])
+        held_out = unique_crops[rng.random(len(unique_crops)) < options['holdout']]
+        test = np.isin(crop_ids, held_out)
+        train = ~test
+        if not test.any() or not train.any():
+            raise CommandError('Holdout split left no training or no test crops; adjust --holdout')
+
+        def subset(mask):
+            return (
+                [value for value, keep in zip(crop_types, mask) if keep],
+                [value for value, keep in zip(stages, mask) if keep],
+                {name: values[mask] for name, values in stats.items()},
+                {name: values[mask] for name, values in heuristic.items()},
+            )
+
+        train_types, train_stages, train_stats, train_heuristic = subset(train)
+        candidate = YieldModel.fit(
+            train_types, train_stages, train_stats, train_heuristic, actual[train] / areas[train], options['alpha']
+        )
+        test_types, test_stages, test_stats, test_heuristic = subset(test)
+        model_yield = candidate.predict_per_acre(
+            candidate.features(test_types, test_stages, test_stats, test_heuristic)
+        ) * areas[test]
+        heuristic_yield = heuristic['predicted_yield'][test]
+        metrics = {
+            'model_mae': self._mae(model_yield, actual[test]),
+            'heuristic_mae': self._mae(heuristic_yield, actual[test]),
+            'model_mape': self._mape(model_yield, actual[test]),
+            'heuristic_mape': self._mape(heuristic_yield, actual[test]),
+        }
+        by_type = defaultdict(list)
+        for i, crop_type in enumerate(test_types):
+            by_type[crop_type].append(i)
+        mape_by_type = {
+            crop_type: self._mape(model_yield[indexes], actual[test][indexes])
+            for crop_type, indexes in by_type.items()
+        }
+
+        # Served from every sample once the holdout has vouched for the approach
+        model = YieldModel.fit(crop_types, stages, stats, heuristic, actual / areas, options['alpha'])
+        model.metadata = {
+            'trained_at': timezone.now().isoformat(),
+            'alpha': options['alpha'],
+            'samples': len(rows),
+            'holdout_samples': int(test.sum()),
+            'metrics': metrics,
+            'holdout_mape_by_crop_type': mape_by_type,
+        }
+        version = timezone.now().strftime('%Y%m%d-%H%M%S')
+        model.save(version)
+
+        self.stdout.write(
+            f"Holdout ({int(test.sum())} predictions): model MAE {metrics['model_mae']:.2f} bags "
+            f"(MAPE {metrics['model_mape']:.1f}%), heuristic MAE {metrics['heuristic_mae']:.2f} bags "
+            f"(MAPE {metrics['heuristic_mape']:.1f}%)"
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'✓ Saved yield model {version} trained on {len(rows)} predictions '
+            f'({time.monotonic() - started:.1f}s)'
+        ))
+
+        if options['no_activate']:
+            return
+        if metrics['model_mae'] >= metrics['heuristic_mae'] and not options['force']:
+            self.stdout.write(self.style.WARNING(
+                f'Not activating {version}: it does not beat the heuristic on the holdout (use --force)'
+            ))
+            return
+        YieldModel.activate(version)
+        self.stdout.write(self.style.SUCCESS(f'✓ Activated yield model {version}'))
+        self._invalidate_predictions()
+
+    def _invalidate_predictions(self):
+        """
+        Every stored prediction came from the previous model
+
+        Safe to do straight away: get_yield_model() notices the new ACTIVE
+        file, so the next refresh pass predicts with the new version.
+        """
+        marked = Crop.objects.filter(is_active=True).update(prediction_dirty=True)
+        self.stdout.write(f'Marked {marked} active crops for refresh_predictions')
+
+    def _list(self):
+        active = YieldModel.active_version()
+        versions = YieldModel.versions()
+        if not versions:
+            self.stdout.write('No yield models trained yet')
+        for metadata in versions:
+            marker = '*' if metadata['version'] == active else ' '
+            metrics = metadata.get('metrics', {})
+            self.stdout.write(
+                f"{marker} {metadata['version']}  {metadata.get('samples', 0)} samples  "
+                f"holdout MAE {metrics.get('model_mae', float('nan')):.2f} "
+                f"(heuristic {metrics.get('heuristic_mae', float('nan')):.2f})"
+            )
+
+    @staticmethod
+    def _mae(predicted, actual):
+        import numpy as np
+
+        return float(np.mean(np.abs(predicted - actual)))
+
+    @staticmethod
+    def _mape(predicted, actual):
+        """Mean absolute percentage error over samples with a positive actual yield"""
+        import numpy as np
+
+        positive = actual > 0
+        if not positive.any():
+            return 100.0
+        return float(np.mean(np.abs(predicted[positive] - actual[positive]) / actual[positive]) * 100)
@@ -1,10 +1,12 @@
 """Management command to update weather data for all farms"""
+import time
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from datetime import timedelta
-from monitor.models import Farm, WeatherRecord
-from monitor.weather_service import WeatherService
-from monitor.utils import check_and_create_alerts
+from monitor.api_quota import ApiQuota
+from monitor.models import Farm
+from monitor.forecast_store import ForecastStore
+from monitor.refresh_policy import RefreshPolicy
+from monitor.weather_ingestion import WeatherIngestionService
 
 
 class Command(BaseCommand):
@@ -14,74 +16,126 @@ class Command(BaseCommand):
         parser.add_argument(
             '--force',
             action='store_true',
-            help='Force update even if recently updated',
+            help='Update every farm, ignoring the per-farm refresh interval',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=None,
+            help='Number of concurrent weather fetches (default: WEATHER_FETCH_WORKERS setting, 1 = serial)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=WeatherIngestionService.DEFAULT_CHUNK_SIZE,
+            help='Farms written per database transaction',
+        )
+        parser.add_argument(
+            '--forecasts',
+            action='store_true',
+            help='Also refresh the stored 5-day and 7-day forecasts for updated farms',
         )
 
+    @ApiQuota.priority(ApiQuota.BACKGROUND)
     def handle(self, *args, **options):
         force = options['force']
-        farms = Farm.objects.exclude(latitude__isnull=True, longitude__isnull=True)
+        farms = list(
+            Farm.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True).select_related('farmer__user')
+        )
         
         updated_count = 0
         skipped_count = 0
         error_count = 0
         
+        now = timezone.now()
+        intervals = {} if force else RefreshPolicy.intervals_for(farms, now)
+        due_farms = []
         for farm in farms:
-            # Skip if updated in last 3 hours (unless forced)
-            if not force and farm.last_weather_update:
-                time_since_update = timezone.now() - farm.last_weather_update
-                if time_since_update < timedelta(hours=3):
+            # Skip farms whose refresh interval has not elapsed yet (unless forced)
+            if not force:
+                due_at = RefreshPolicy.next_due(farm, intervals[farm.id])
+                if due_at and due_at > now:
                     skipped_count += 1
                     continue
+            due_farms.append(farm)
+        
+        workers = WeatherIngestionService.get_max_workers(options['workers'])
+        chunk_size = options['chunk_size']
+        clusters = len(WeatherIngestionService.cluster_farms(due_farms))
+        self.stdout.write(
+            f'Fetching weather for {len(due_farms)} farms in {clusters} cluster(s) with {workers} worker(s)...'
+        )
+        
+        latencies = []
+        pending = []
+        alert_count = 0
+        started = time.perf_counter()
+        
+        # Fetches run concurrently; every DB write below happens on this thread
+        for farm, weather_data, latency, error in WeatherIngestionService.fetch_weather(due_farms, workers):
+            latencies.append(latency)
             
-            self.stdout.write(f'Updating weather for {farm.name}...')
-            
-            try:
-                weather_data = WeatherService.get_weather_data(
-                    farm.latitude, 
-                    farm.longitude
+            if error is not None:
+                error_count += 1
+                self.stdout.write(
+                    self.style.ERROR(f'  ✗ Error updating {farm.name}: {str(error)}')
                 )
-                
-                if weather_data:
-                    WeatherRecord.objects.create(
-                        farm=farm,
-                        temperature=weather_data['temperature'],
-                        humidity=weather_data['humidity'],
-                        rainfall=weather_data['rainfall'],
-                        wind_speed=weather_data['wind_speed'],
-                        description=weather_data['description']
-                    )
-                    
-                    farm.last_weather_update = timezone.now()
-                    farm.save(update_fields=['last_weather_update'])
-                    
-                    # Check and create alerts
-                    alerts = check_and_create_alerts(farm)
-                    if alerts:
-                        self.stdout.write(
-                            self.style.WARNING(
-                                f'  Created {len(alerts)} alert(s) for {farm.name}'
-                            )
-                        )
-                    
-                    updated_count += 1
-                    self.stdout.write(
-                        self.style.SUCCESS(f'  ✓ Updated {farm.name}')
-                    )
-                else:
-                    error_count += 1
-                    self.stdout.write(
-                        self.style.ERROR(f'  ✗ Failed to fetch data for {farm.name}')
-                    )
-            
-            except Exception as e:
+            elif weather_data and not weather_data.get('stale'):
+                pending.append((farm, weather_data))
+                self.stdout.write(
+                    self.style.SUCCESS(f'  ✓ Fetched {farm.name} ({latency * 1000:.0f} ms)')
+                )
+            else:
                 error_count += 1
                 self.stdout.write(
-                    self.style.ERROR(f'  ✗ Error updating {farm.name}: {str(e)}')
+                    self.style.ERROR(f'  ✗ Failed to fetch data for {farm.name}')
                 )
+            
+            if len(pending) >= chunk_size:
+                updated, alerts = self._flush(pending, chunk_size)
+                updated_count += updated
+                alert_count += alerts
+                pending = []
+        
+        updated, alerts = self._flush(pending, chunk_size)
+        updated_count += updated
+        alert_count += alerts
+        
+        forecast_rows = 0
+        if options['forecasts'] and due_farms:
+            self.stdout.write('Refreshing stored forecasts...')
+            forecast_rows = ForecastStore.refresh_farms(due_farms, workers)
+        
+        elapsed = time.perf_counter() - started
+        summary = WeatherIngestionService.summarize_latencies(latencies, elapsed)
         
         self.stdout.write('\n' + '='*50)
         self.stdout.write(self.style.SUCCESS(f'Updated: {updated_count} farms'))
         self.stdout.write(f'Skipped: {skipped_count} farms')
+        if options['forecasts']:
+            self.stdout.write(f'Forecast rows stored: {forecast_rows}')
+        if alert_count > 0:
+            self.stdout.write(self.style.WARNING(f'Alerts created: {alert_count}'))
         if error_count > 0:
             self.stdout.write(self.style.ERROR(f'Errors: {error_count} farms'))
+        self.stdout.write(
+            f'Fetch latency: p50 {summary["p50"] * 1000:.0f} ms, '
+            f'p95 {summary["p95"] * 1000:.0f} ms, max {summary["max"] * 1000:.0f} ms'
+        )
+        self.stdout.write(f'Throughput: {summary["throughput"]:.1f} farms/s over {elapsed:.1f}s')
         self.stdout.write('='*50)
+
+    def _flush(self, pending, chunk_size):
+        """Persist buffered observations; returns (farms updated, alerts created)"""
+        if not pending:
+            return 0, 0
+        
+        try:
+            result = WeatherIngestionService.persist_observations(pending, chunk_size)
+        except Exception as e:
+            self.stdout.write(
+                self.style.ERROR(f'  ✗ Error saving {len(pending)} farm(s): {str(e)}')
+            )
+            return 0, 0
+        
+        return result['records'], len(result['alerts'])
@@ -0,0 +1,101 @@
+"""
+Lightweight in-process metrics for caches and outbound services
+"""
+import threading
+from collections import defaultdict
+
+
+class MetricsRegistry:
+    """Thread-safe counters, gauges and histograms kept in process memory"""
+
+    # Histogram bucket upper bounds in seconds
+    DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = defaultdict(float)
+        self._gauges = {}
+        self._histograms = {}
+        self._collectors = []
+
+    @staticmethod
+    def _key(name, labels):
+        """Build a metric key such as name{endpoint=current}"""
+        if not labels:
+            return name
+        label_str = ','.join(f'{k}={v}' for k, v in sorted(labels.items()))
+        return f'{name}{{{label_str}}}'
+
+    def increment(self, name, value=1, **labels):
+        """Increase a counter"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] += value
+
+    def set_gauge(self, name, value, **labels):
+        """Record the current value of a gauge"""
+        key = self._key(name, labels)
+        with self._lock:
+            self._gauges[key] = value
+
+    def observe(self, name, value, buckets=None, **labels):
+        """Add an observation (usually a latency in seconds) to a histogram"""
+        key = self._key(name, labels)
+        buckets = buckets or self.DEFAULT_BUCKETS
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = {
+                    'buckets': {str(bound): 0 for bound in buckets},
+                    'bounds': tuple(buckets),
+                    'count': 0,
+                    'sum': 0.0,
+                }
+                self._histograms[key] = histogram
+            for bound in histogram['bounds']:
+                if value <= bound:
+                    histogram['buckets'][str(bound)] += 1
+                    break
+            else:
+                histogram['buckets'].setdefault('+Inf', 0)
+                histogram['buckets']['+Inf'] += 1
+            histogram['count'] += 1
+            histogram['sum'] += value
+
+    def register_collector(self, collector):
+        """Register a callable that refreshes gauges right before a snapshot"""
+        with self._lock:
+            if collector not in self._collectors:
+                self._collectors.append(collector)
+
+    def snapshot(self):
+        """Return a JSON-serializable copy of every metric"""
+        for collector in list(self._collectors):
+            try:
+                collector(self)
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+
+        with self._lock:
+            return {
+                'counters': dict(self._counters),
+                'gauges': dict(self._gauges),
+                'histograms': {
+                    key: {
+                        'buckets': dict(h['buckets']),
+                        'count': h['count'],
+                        'sum': round(h['sum'], 6),
+                    }
+                    for key, h in self._histograms.items()
+                },
+            }
+
+    def reset(self):
+        """Clear all recorded values (collectors stay registered)"""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0004_soilmeasurement'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ForecastRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('3hourly', '3-Hourly (5 days)'), ('daily', 'Daily (7 days)')], max_length=20)),
+                ('run_time', models.DateTimeField(help_text='When this forecast run was ingested')),
+                ('valid_time', models.DateTimeField()),
+                ('temperature', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('temperature_min', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('temperature_max', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('humidity', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('rainfall', models.DecimalField(decimal_places=2, default=0, max_digits=6)),
+                ('description', models.CharField(blank=True, max_length=200)),
+            ],
+            options={
+                'ordering': ['valid_time'],
+            },
+        ),
+        migrations.AddField(
+            model_name='forecastrecord',
+            name='farm',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='monitor.farm'),
+        ),
+        migrations.AddIndex(
+            model_name='forecastrecord',
+            index=models.Index(fields=['farm', 'valid_time'], name='monitor_for_farm_id_89a47b_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='forecastrecord',
+            constraint=models.UniqueConstraint(fields=('farm', 'source', 'valid_time'), name='unique_forecast_per_farm_source_time'),
+        ),
+    ]
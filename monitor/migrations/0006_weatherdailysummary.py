@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:18
+
+from django.db import migrations, models
+from django.db.models import Avg, Count, Max, Min, Sum, Variance
+import django.db.models.deletion
+
+
+def backfill_daily_summaries(apps, schema_editor):
+    """Build summaries for the weather records that already exist"""
+    WeatherRecord = apps.get_model('monitor', 'WeatherRecord')
+    WeatherDailySummary = apps.get_model('monitor', 'WeatherDailySummary')
+
+    rows = (
+        WeatherRecord.objects
+        .values('farm_id', 'date')
+        .annotate(
+            temperature_min=Min('temperature'),
+            temperature_max=Max('temperature'),
+            temperature_mean=Avg('temperature'),
+            temperature_variance=Variance('temperature'),
+            humidity_mean=Avg('humidity'),
+            rainfall_total=Sum('rainfall'),
+            observation_count=Count('id'),
+        )
+        .order_by()
+    )
+    WeatherDailySummary.objects.bulk_create(
+        [
+            WeatherDailySummary(
+                farm_id=row['farm_id'],
+                date=row['date'],
+                temperature_min=row['temperature_min'],
+                temperature_max=row['temperature_max'],
+                temperature_mean=float(row['temperature_mean']),
+                temperature_variance=float(row['temperature_variance'] or 0),
+                humidity_mean=float(row['humidity_mean']),
+                rainfall_total=row['rainfall_total'] or 0,
+                observation_count=row['observation_count'],
+            )
+            for row in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0005_forecastrecord'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WeatherDailySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('temperature_min', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('temperature_max', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('temperature_mean', models.FloatField()),
+                ('temperature_variance', models.FloatField(default=0, help_text="Population variance of the day's readings")),
+                ('humidity_mean', models.FloatField()),
+                ('rainfall_total', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('observation_count', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('farm', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_weather', to='monitor.farm')),
+            ],
+            options={
+                'ordering': ['-date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='weatherdailysummary',
+            constraint=models.UniqueConstraint(fields=('farm', 'date'), name='unique_daily_summary_per_farm_date'),
+        ),
+        migrations.RunPython(backfill_daily_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:19
+
+from importlib import import_module
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def assign_observation_slots(apps, schema_editor):
+    """
+    Key existing records by the hour they were fetched in and drop duplicates
+
+    Rows fetched within the same hour for the same farm and day collapse into
+    the newest one, then the daily summaries are rebuilt from what is left.
+    The record's own date is kept, so backdated rows stay in separate slots.
+    """
+    WeatherRecord = apps.get_model('monitor', 'WeatherRecord')
+    WeatherDailySummary = apps.get_model('monitor', 'WeatherDailySummary')
+
+    latest = {}
+    duplicates = []
+    rows = WeatherRecord.objects.order_by('id').values_list('id', 'farm_id', 'date', 'created_at')
+    for record_id, farm_id, day, created_at in rows.iterator():
+        slot = django.utils.timezone.localtime(created_at).replace(
+            year=day.year, month=day.month, day=day.day, minute=0, second=0, microsecond=0
+        )
+        key = (farm_id, slot)
+        if key in latest:
+            duplicates.append(latest[key][0])
+        latest[key] = (record_id, slot)
+
+    for start in range(0, len(duplicates), 500):
+        WeatherRecord.objects.filter(id__in=duplicates[start:start + 500]).delete()
+
+    updates = [WeatherRecord(id=record_id, observed_at=slot) for record_id, slot in latest.values()]
+    WeatherRecord.objects.bulk_update(updates, ['observed_at'], batch_size=500)
+
+    if duplicates:
+        WeatherDailySummary.objects.all().delete()
+        import_module('monitor.migrations.0006_weatherdailysummary').backfill_daily_summaries(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0006_weatherdailysummary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatherrecord',
+            name='source',
+            field=models.CharField(choices=[('openweathermap', 'OpenWeatherMap'), ('demo', 'Demo Data'), ('legacy', 'Legacy (before observation keys)')], default='legacy', max_length=20),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='weatherrecord',
+            name='source',
+            field=models.CharField(choices=[('openweathermap', 'OpenWeatherMap'), ('demo', 'Demo Data'), ('legacy', 'Legacy (before observation keys)')], default='openweathermap', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='weatherrecord',
+            name='observed_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.RunPython(assign_observation_slots, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='weatherrecord',
+            name='observed_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='Start of the observation slot; one record per farm, source and slot'),
+        ),
+        migrations.AddIndex(
+            model_name='weatherrecord',
+            index=models.Index(fields=['farm', 'date'], name='monitor_wea_farm_id_691efb_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='weatherrecord',
+            constraint=models.UniqueConstraint(fields=('farm', 'source', 'observed_at'), name='unique_weather_observation'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0007_weatherrecord_observation_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApiQuotaBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(help_text='Upstream and window, e.g. openweathermap.minute', max_length=100, unique=True)),
+                ('capacity', models.FloatField()),
+                ('refill_rate', models.FloatField(help_text='Tokens added per second')),
+                ('tokens', models.FloatField()),
+                ('refilled_at', models.FloatField(help_text='Unix time the tokens were last brought up to date')),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+def populate_geohashes(apps, schema_editor):
+    from monitor.spatial import SpatialService
+
+    Farm = apps.get_model('monitor', 'Farm')
+    farms = list(Farm.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True))
+    for farm in farms:
+        farm.geohash = SpatialService.geohash(farm.latitude, farm.longitude)
+    Farm.objects.bulk_update(farms, ['geohash'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0008_apiquotabucket'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farm',
+            name='geohash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Geohash of the coordinates, kept in sync on save for spatial lookups', max_length=12),
+        ),
+        migrations.RunPython(populate_geohashes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0009_farm_geohash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='weatherrecord',
+            name='cluster',
+            field=models.CharField(blank=True, help_text='Geohash cell whose single upstream fetch produced this record', max_length=12),
+        ),
+    ]
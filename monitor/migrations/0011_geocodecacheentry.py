@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0010_weatherrecord_cluster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('search', 'Forward search'), ('reverse', 'Reverse lookup')], max_length=10)),
+                ('key', models.CharField(max_length=255)),
+                ('result', models.JSONField(blank=True, help_text='Empty for negative (no match) entries', null=True)),
+                ('is_negative', models.BooleanField(default=False)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='geocodecacheentry',
+            constraint=models.UniqueConstraint(fields=('kind', 'key'), name='unique_geocode_cache_key'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 11:38
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0011_geocodecacheentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FarmClimateNormals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('window_start', models.DateField()),
+                ('window_end', models.DateField()),
+                ('days_observed', models.PositiveIntegerField(default=0)),
+                ('observation_count', models.PositiveIntegerField(default=0)),
+                ('temperature_mean', models.FloatField()),
+                ('humidity_mean', models.FloatField()),
+                ('rainfall_total', models.DecimalField(decimal_places=2, default=0, max_digits=8)),
+                ('annual_rainfall', models.FloatField(help_text='Annual rainfall (mm) used for the classification')),
+                ('rainfall_source', models.CharField(choices=[('observed', 'Observed rainfall, scaled to a year'), ('estimated', 'Estimated from mean temperature and humidity')], max_length=10)),
+                ('climate_code', models.CharField(max_length=5)),
+                ('climate_type', models.CharField(max_length=50)),
+                ('suitability', models.CharField(max_length=20)),
+                ('is_desert', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('farm', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='climate_normals', to='monitor.farm')),
+            ],
+            options={
+                'verbose_name_plural': 'farm climate normals',
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0012_farmclimatenormals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='crop',
+            name='prediction_dirty',
+            field=models.BooleanField(default=True, editable=False, help_text="Set when the crop's weather, stage or area change; refresh_predictions recomputes dirty crops"),
+        ),
+        migrations.AddIndex(
+            model_name='crop',
+            index=models.Index(fields=['is_active', 'prediction_dirty'], name='monitor_cro_is_acti_acb73d_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0013_crop_prediction_dirty'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CropWeatherStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('observation_count', models.PositiveIntegerField(default=0)),
+                ('temperature_mean', models.FloatField(default=0)),
+                ('temperature_m2', models.FloatField(default=0, help_text="Sum of squared deviations from the mean (Welford's M2)")),
+                ('humidity_mean', models.FloatField(default=0)),
+                ('rainfall_total', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('crop', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='weather_stats', to='monitor.crop')),
+            ],
+            options={
+                'verbose_name_plural': 'crop weather stats',
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-18 13:10
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """0004 created the SoilMeasurement index under the Crop index's hashed name"""
+
+    dependencies = [
+        ('monitor', '0014_cropweatherstats'),
+    ]
+
+    operations = [
+        migrations.RenameIndex(
+            model_name='soilmeasurement',
+            new_name='monitor_soi_farm_id_1ee336_idx',
+            old_name='monitor_soi_farm_id_f3056d_idx',
+        ),
+    ]
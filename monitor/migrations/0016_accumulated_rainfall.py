@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:22
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_accumulated_rainfall(apps, schema_editor):
+    """Days whose OpenWeatherMap readings cover every hour get their accumulated total"""
+    if getattr(settings, 'WEATHER_OBSERVATION_SLOT_MINUTES', 60) != 60:
+        return
+    WeatherDailySummary = apps.get_model('monitor', 'WeatherDailySummary')
+    WeatherRecord = apps.get_model('monitor', 'WeatherRecord')
+    full_days = (
+        WeatherRecord.objects.filter(source='openweathermap')
+        .values('farm_id', 'date')
+        .annotate(readings=Count('id'), rainfall=Sum('rainfall'))
+        .filter(readings__gte=24)
+        .order_by()
+    )
+    for day in full_days.iterator():
+        WeatherDailySummary.objects.filter(farm_id=day['farm_id'], date=day['date']).update(
+            accumulated_rainfall=day['rainfall'] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('monitor', '0015_rename_soilmeasurement_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='farmclimatenormals',
+            name='rainfall_days',
+            field=models.PositiveIntegerField(default=0, help_text='Days in the window with accumulated rainfall for every hour'),
+        ),
+        migrations.AddField(
+            model_name='weatherdailysummary',
+            name='accumulated_rainfall',
+            field=models.DecimalField(blank=True, decimal_places=2, help_text="The day's rainfall from hourly accumulations covering every hour; empty when they do not", max_digits=8, null=True),
+        ),
+        migrations.AlterField(
+            model_name='farmclimatenormals',
+            name='rainfall_total',
+            field=models.DecimalField(decimal_places=2, default=0, help_text='Accumulated rainfall (mm) over those days', max_digits=8),
+        ),
+        migrations.RunPython(fill_accumulated_rainfall, migrations.RunPython.noop),
+    ]
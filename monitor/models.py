@@ -19,6 +19,10 @@ class Farm(models.Model):
     location = models.CharField(max_length=200)
     latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
     longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True)
+    geohash = models.CharField(
+        max_length=12, blank=True, db_index=True, editable=False,
+        help_text="Geohash of the coordinates, kept in sync on save for spatial lookups"
+    )
     size_acres = models.DecimalField(max_digits=10, decimal_places=2)
     soil_type = models.CharField(max_length=100, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -34,6 +38,19 @@ class Farm(models.Model):
     def __str__(self):
         return f"{self.name} - {self.farmer}"
     
+    def save(self, *args, **kwargs):
+        from .spatial import SpatialService
+        
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = SpatialService.geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'latitude', 'longitude'} & set(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'geohash'}
+        super().save(*args, **kwargs)
+    
     def get_active_crops_count(self):
         """Get count of active crops"""
         return self.crops.filter(is_active=True).count()
@@ -74,18 +91,53 @@ class Crop(models.Model):
     area_planted = models.DecimalField(max_digits=10, decimal_places=2)
     current_stage = models.CharField(max_length=50, choices=GROWTH_STAGES, default='germination')
     is_active = models.BooleanField(default=True)
+    prediction_dirty = models.BooleanField(
+        default=True, editable=False,
+        help_text="Set when the crop's weather, stage or area change; refresh_predictions recomputes dirty crops"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Fields whose change makes the stored yield prediction stale
+    PREDICTION_INPUTS = ('crop_type', 'planting_date', 'area_planted', 'current_stage', 'farm_id', 'is_active')
+    # Fields that define which weather CropWeatherStats covers
+    WEATHER_WINDOW_INPUTS = ('planting_date', 'farm_id', 'is_active')
+
     class Meta:
         ordering = ['-planting_date']
         indexes = [
             models.Index(fields=['farm', 'is_active']),
             models.Index(fields=['crop_type', 'current_stage']),
+            models.Index(fields=['is_active', 'prediction_dirty']),
         ]
 
     def __str__(self):
         return f"{self.get_crop_type_display()} at {self.farm.name}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        crop = super().from_db(db, field_names, values)
+        crop._saved_prediction_inputs = crop._prediction_inputs()
+        return crop
+
+    def _prediction_inputs(self):
+        # Only loaded fields, so deferred ones are never fetched just to compare
+        return {name: self.__dict__[name] for name in self.PREDICTION_INPUTS if name in self.__dict__}
+
+    def save(self, *args, **kwargs):
+        saved = getattr(self, '_saved_prediction_inputs', None) or {}
+        current = self._prediction_inputs()
+        changed = {name for name, value in saved.items() if current.get(name, value) != value}
+        if changed and not self.prediction_dirty:
+            self.prediction_dirty = True
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | {'prediction_dirty'}
+        super().save(*args, **kwargs)
+        if changed & set(self.WEATHER_WINDOW_INPUTS):
+            # Rebuilt from the daily summaries the next time the crop is predicted
+            CropWeatherStats.objects.filter(crop=self).delete()
+        self._saved_prediction_inputs = current
+
     def days_since_planting(self):
         return (timezone.now().date() - self.planting_date).days
     
@@ -111,8 +163,23 @@ class Crop(models.Model):
 
 
 class WeatherRecord(models.Model):
+    SOURCES = [
+        ('openweathermap', 'OpenWeatherMap'),
+        ('demo', 'Demo Data'),
+        ('legacy', 'Legacy (before observation keys)'),
+    ]
+
     farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='weather_records')
     date = models.DateField(default=timezone.now)
+    observed_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="Start of the observation slot; one record per farm, source and slot"
+    )
+    source = models.CharField(max_length=20, choices=SOURCES, default='openweathermap')
+    cluster = models.CharField(
+        max_length=12, blank=True,
+        help_text="Geohash cell whose single upstream fetch produced this record"
+    )
     temperature = models.DecimalField(max_digits=5, decimal_places=2)
     humidity = models.DecimalField(max_digits=5, decimal_places=2)
     rainfall = models.DecimalField(max_digits=6, decimal_places=2, default=0)
@@ -122,11 +189,129 @@ class WeatherRecord(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['farm', 'date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['farm', 'source', 'observed_at'], name='unique_weather_observation'),
+        ]
 
     def __str__(self):
         return f"Weather for {self.farm.name} on {self.date}"
 
 
+class WeatherDailySummary(models.Model):
+    """Per-farm daily rollup of WeatherRecord rows, refreshed as records are stored"""
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='daily_weather')
+    date = models.DateField()
+    temperature_min = models.DecimalField(max_digits=5, decimal_places=2)
+    temperature_max = models.DecimalField(max_digits=5, decimal_places=2)
+    temperature_mean = models.FloatField()
+    temperature_variance = models.FloatField(default=0, help_text="Population variance of the day's readings")
+    humidity_mean = models.FloatField()
+    rainfall_total = models.DecimalField(max_digits=8, decimal_places=2, default=0)
+    accumulated_rainfall = models.DecimalField(
+        max_digits=8, decimal_places=2, null=True, blank=True,
+        help_text="The day's rainfall from hourly accumulations covering every hour; empty when they do not"
+    )
+    observation_count = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(fields=['farm', 'date'], name='unique_daily_summary_per_farm_date'),
+        ]
+
+    def __str__(self):
+        return f"Daily weather for {self.farm.name} on {self.date}"
+
+
+class FarmClimateNormals(models.Model):
+    """Rolling 12-month weather aggregates for a farm and the climate classified from them"""
+    RAINFALL_SOURCES = [
+        ('observed', 'Observed rainfall, scaled to a year'),
+        ('estimated', 'Estimated from mean temperature and humidity'),
+    ]
+
+    farm = models.OneToOneField(Farm, on_delete=models.CASCADE, related_name='climate_normals')
+    window_start = models.DateField()
+    window_end = models.DateField()
+    days_observed = models.PositiveIntegerField(default=0)
+    observation_count = models.PositiveIntegerField(default=0)
+    temperature_mean = models.FloatField()
+    humidity_mean = models.FloatField()
+    rainfall_days = models.PositiveIntegerField(
+        default=0, help_text="Days in the window with accumulated rainfall for every hour"
+    )
+    rainfall_total = models.DecimalField(
+        max_digits=8, decimal_places=2, default=0, help_text="Accumulated rainfall (mm) over those days"
+    )
+    annual_rainfall = models.FloatField(help_text="Annual rainfall (mm) used for the classification")
+    rainfall_source = models.CharField(max_length=10, choices=RAINFALL_SOURCES)
+    climate_code = models.CharField(max_length=5)
+    climate_type = models.CharField(max_length=50)
+    suitability = models.CharField(max_length=20)
+    is_desert = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'farm climate normals'
+
+    def __str__(self):
+        return f"{self.farm.name}: {self.climate_type} ({self.window_start} to {self.window_end})"
+
+
+class CropWeatherStats(models.Model):
+    """Running statistics of every weather reading since a crop was planted"""
+    crop = models.OneToOneField(Crop, on_delete=models.CASCADE, related_name='weather_stats')
+    observation_count = models.PositiveIntegerField(default=0)
+    temperature_mean = models.FloatField(default=0)
+    temperature_m2 = models.FloatField(
+        default=0, help_text="Sum of squared deviations from the mean (Welford's M2)"
+    )
+    humidity_mean = models.FloatField(default=0)
+    rainfall_total = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'crop weather stats'
+
+    def __str__(self):
+        return f"Weather since planting for {self.crop}: {self.observation_count} readings"
+
+
+class ForecastRecord(models.Model):
+    """Forecast values for a farm, replaced whenever a newer forecast run is ingested"""
+    SOURCES = [
+        ('3hourly', '3-Hourly (5 days)'),
+        ('daily', 'Daily (7 days)'),
+    ]
+
+    farm = models.ForeignKey(Farm, on_delete=models.CASCADE, related_name='forecasts')
+    source = models.CharField(max_length=20, choices=SOURCES)
+    run_time = models.DateTimeField(help_text="When this forecast run was ingested")
+    valid_time = models.DateTimeField()
+    temperature = models.DecimalField(max_digits=5, decimal_places=2)
+    temperature_min = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    temperature_max = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    humidity = models.DecimalField(max_digits=5, decimal_places=2)
+    rainfall = models.DecimalField(max_digits=6, decimal_places=2, default=0)
+    description = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        ordering = ['valid_time']
+        indexes = [
+            models.Index(fields=['farm', 'valid_time']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['farm', 'source', 'valid_time'], name='unique_forecast_per_farm_source_time'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_source_display()} forecast for {self.farm.name} at {self.valid_time}"
+
+
 class YieldPrediction(models.Model):
     crop = models.ForeignKey(Crop, on_delete=models.CASCADE, related_name='predictions')
     predicted_yield = models.DecimalField(max_digits=10, decimal_places=2)
@@ -249,3 +434,38 @@ class SoilMeasurement(models.Model):
             self.overall_health = 'fair'
         
         self.save()
+
+
+class ApiQuotaBucket(models.Model):
+    """Token bucket for one upstream rate limit, shared by every web and cron process"""
+    name = models.CharField(max_length=100, unique=True, help_text="Upstream and window, e.g. openweathermap.minute")
+    capacity = models.FloatField()
+    refill_rate = models.FloatField(help_text="Tokens added per second")
+    tokens = models.FloatField()
+    refilled_at = models.FloatField(help_text="Unix time the tokens were last brought up to date")
+
+    def __str__(self):
+        return f"{self.name}: {self.tokens:.1f}/{self.capacity:.0f}"
+
+
+class GeocodeCacheEntry(models.Model):
+    """Cached Nominatim answer for a normalized search or a quantized reverse lookup"""
+    KINDS = [
+        ('search', 'Forward search'),
+        ('reverse', 'Reverse lookup'),
+    ]
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    key = models.CharField(max_length=255)
+    result = models.JSONField(null=True, blank=True, help_text="Empty for negative (no match) entries")
+    is_negative = models.BooleanField(default=False)
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='unique_geocode_cache_key'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind}: {self.key}"
@@ -3,7 +3,7 @@ Notification service for SMS and Email alerts
 """
 from django.core.mail import send_mail
 from django.conf import settings
-import requests
+from .http_client import get_http_client
 
 
 class NotificationService:
@@ -33,7 +33,7 @@ class NotificationService:
                 'message': message
             }
             
-            response = requests.post(url, headers=headers, data=data, timeout=10)
+            response = get_http_client().post(url, 'africastalking', headers=headers, data=data)
             return response.status_code == 201
             
         except Exception as e:
@@ -117,3 +117,25 @@ class NotificationService:
             )
         
         return True
+    
+    @staticmethod
+    def send_regional_pest_alert(farm, pest_name, severity, radius_km=None):
+        """
+        Send a pest alert to the owner of every farm within radius_km of an outbreak
+        
+        Each farmer is alerted once, about their farm closest to the outbreak.
+        Returns the number of farmers notified.
+        """
+        from .spatial import SpatialService
+        
+        radius_km = radius_km or getattr(settings, 'PEST_ALERT_RADIUS_KM', 10)
+        nearby = [farm] + SpatialService.neighbouring_farms(farm, radius_km)
+        
+        notified = set()
+        for nearby_farm in nearby:
+            if nearby_farm.farmer_id in notified:
+                continue
+            notified.add(nearby_farm.farmer_id)
+            NotificationService.send_pest_alert(nearby_farm.farmer, nearby_farm, pest_name, severity)
+        
+        return len(notified)
@@ -1,5 +1,3 @@
-import pandas as pd
-import numpy as np
 from decimal import Decimal
 from django.utils import timezone
 
@@ -29,6 +27,30 @@ class YieldPredictionService:
         'tomato': (18, 27),
     }
     
+    # Optimal rainfall over the season (min, max) in mm
+    OPTIMAL_RAINFALL = {
+        'maize': (500, 800),
+        'beans': (400, 600),
+        'wheat': (450, 650),
+        'coffee': (1000, 1500),
+        'tea': (1200, 1800),
+        'potato': (500, 700),
+        'tomato': (400, 600),
+    }
+    
+    # Crops aggregated per query by the batch predictor
+    BATCH_SIZE = 5000
+    
+    # Yield multiplier by growth stage
+    STAGE_BONUS = {
+        'germination': 0.9,
+        'vegetative': 1.0,
+        'flowering': 1.1,
+        'fruiting': 1.15,
+        'maturity': 1.2,
+        'harvest': 1.0
+    }
+    
     @staticmethod
     def predict_yield(crop, weather_records):
         """
@@ -41,7 +63,39 @@ class YieldPredictionService:
         Returns:
             dict with predicted_yield and confidence_score
         """
-        if not weather_records.exists():
+        values = list(weather_records.values_list('temperature', 'humidity', 'rainfall'))
+        if not values:
+            return YieldPredictionService.predict_from_stats(crop, None)
+        
+        # Plain NumPy arrays for analysis; numpy is imported on first use to keep startup light
+        import numpy as np
+        temperature, humidity, rainfall = np.array(values, dtype=float).T
+        
+        # Calculate weather factors
+        stats = {
+            'count': len(values),
+            'avg_temperature': float(temperature.mean()),
+            'avg_humidity': float(humidity.mean()),
+            'total_rainfall': float(rainfall.sum()),
+            'temperature_std': float(temperature.std(ddof=1)) if len(values) > 1 else None,
+        }
+        return YieldPredictionService.predict_from_stats(crop, stats)
+    
+    @staticmethod
+    def predict_from_stats(crop, stats):
+        """
+        Predict crop yield from aggregate weather statistics
+        
+        Args:
+            crop: Crop model instance
+            stats: dict with count, avg_temperature, avg_humidity, total_rainfall
+                and temperature_std (None or NaN with a single reading), or None
+                when there is no weather data
+        
+        Returns:
+            dict with predicted_yield and confidence_score
+        """
+        if not stats:
             # No weather data, return base yield with low confidence
             base_yield = YieldPredictionService.BASE_YIELDS.get(crop.crop_type, 10)
             return {
@@ -54,14 +108,10 @@ class YieldPredictionService:
                 }
             }
         
-        # Convert to pandas DataFrame for analysis
-        df = pd.DataFrame(list(weather_records.values('temperature', 'humidity', 'rainfall')))
-        
-        # Calculate weather factors
-        avg_temp = float(df['temperature'].mean())
-        avg_humidity = float(df['humidity'].mean())
-        total_rainfall = float(df['rainfall'].sum())
-        temp_variance = float(df['temperature'].std())
+        avg_temp = stats['avg_temperature']
+        avg_humidity = stats['avg_humidity']
+        total_rainfall = stats['total_rainfall']
+        temp_variance = stats['temperature_std']
         
         # Get base yield for crop type
         base_yield = YieldPredictionService.BASE_YIELDS.get(crop.crop_type, 10)
@@ -75,21 +125,11 @@ class YieldPredictionService:
             temp_factor = max(0.5, 1.0 - (deviation * 0.05))
         
         # Penalize high temperature variance (stress)
-        if temp_variance > 5:
+        if temp_variance is not None and temp_variance > 5:
             temp_factor *= max(0.8, 1.0 - (temp_variance - 5) * 0.02)
         
         # Calculate rainfall factor with crop-specific requirements
-        optimal_rainfall = {
-            'maize': (500, 800),
-            'beans': (400, 600),
-            'wheat': (450, 650),
-            'coffee': (1000, 1500),
-            'tea': (1200, 1800),
-            'potato': (500, 700),
-            'tomato': (400, 600),
-        }
-        
-        rain_range = optimal_rainfall.get(crop.crop_type, (500, 800))
+        rain_range = YieldPredictionService.OPTIMAL_RAINFALL.get(crop.crop_type, (500, 800))
         if rain_range[0] <= total_rainfall <= rain_range[1]:
             rain_factor = 1.0
         elif total_rainfall < rain_range[0]:
@@ -106,15 +146,7 @@ class YieldPredictionService:
             humidity_factor = max(0.7, 1.0 - (avg_humidity - 80) / 100)
         
         # Growth stage bonus
-        stage_bonus = {
-            'germination': 0.9,
-            'vegetative': 1.0,
-            'flowering': 1.1,
-            'fruiting': 1.15,
-            'maturity': 1.2,
-            'harvest': 1.0
-        }
-        stage_multiplier = stage_bonus.get(crop.current_stage, 1.0)
+        stage_multiplier = YieldPredictionService.STAGE_BONUS.get(crop.current_stage, 1.0)
         
         # Calculate final yield with weighted factors
         combined_factor = (
@@ -127,7 +159,7 @@ class YieldPredictionService:
         total_predicted_yield = predicted_yield_per_acre * float(crop.area_planted)
         
         # Calculate confidence score based on data availability and quality
-        days_of_data = weather_records.count()
+        days_of_data = stats['count']
         data_quality = min(100, (days_of_data / 30) * 100)  # 30 days = 100%
         
         # Reduce confidence if factors are poor
@@ -146,11 +178,352 @@ class YieldPredictionService:
             }
         }
     
+    @staticmethod
+    def batch_weather_stats(crops):
+        """
+        Weather statistics since planting for many crops in one grouped query
+        
+        Joins each crop to its farm's daily summaries from its own planting
+        date onwards and sums them per crop, so the cost is one query and one
+        row per crop however many days each season has.
+        
+        Returns:
+            dict of NumPy arrays aligned with `crops`: count, avg_temperature,
+            temperature_std (NaN with fewer than two readings), avg_humidity
+            and total_rainfall
+        """
+        from django.db.models import F, FilteredRelation, Q
+        from .models import Crop
+        
+        # The date bound is part of the join, so each crop is a range scan of the (farm, date) index
+        window = FilteredRelation(
+            'farm__daily_weather', condition=Q(farm__daily_weather__date__gte=F('planting_date'))
+        )
+        return YieldPredictionService._window_stats(Crop.objects.all(), window, [crop.id for crop in crops])
+    
+    @staticmethod
+    def prediction_weather_stats(prediction_ids):
+        """
+        Weather statistics from planting to each prediction's date
+        
+        The same statistics batch_weather_stats gives a crop, as they stood
+        when each YieldPrediction was made; used to train yield models on
+        the inputs the predictor actually saw.
+        """
+        from django.db.models import F, FilteredRelation, Q
+        from .models import YieldPrediction
+        
+        window = FilteredRelation(
+            'crop__farm__daily_weather',
+            condition=Q(
+                crop__farm__daily_weather__date__gte=F('crop__planting_date'),
+                crop__farm__daily_weather__date__lte=F('prediction_date'),
+            )
+        )
+        return YieldPredictionService._window_stats(YieldPrediction.objects.all(), window, list(prediction_ids))
+    
+    @staticmethod
+    def _window_stats(queryset, window, ids):
+        """Sum the daily summaries in `window` for each row of queryset in ids, in batches"""
+        import numpy as np
+        from django.db.models import F, FloatField, Sum
+        
+        def total(expression):
+            return Sum(expression, output_field=FloatField())
+        
+        count = F('window__observation_count')
+        mean = F('window__temperature_mean')
+        rows = {}
+        for start in range(0, len(ids), YieldPredictionService.BATCH_SIZE):
+            rows.update(
+                (row[0], row[1:])
+                for row in queryset.filter(id__in=ids[start:start + YieldPredictionService.BATCH_SIZE])
+                .annotate(window=window)
+                .values('id')
+                .annotate(
+                    observations=total(count),
+                    temperature_sum=total(count * mean),
+                    temperature_squares=total(count * mean * mean),
+                    within_day=total(count * F('window__temperature_variance')),
+                    humidity_sum=total(count * F('window__humidity_mean')),
+                    rainfall=total(F('window__rainfall_total')),
+                )
+                .values_list(
+                    'id', 'observations', 'temperature_sum', 'temperature_squares',
+                    'within_day', 'humidity_sum', 'rainfall'
+                )
+                .order_by()
+            )
+        empty = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        sums = np.array([[value or 0.0 for value in rows.get(id, empty)] for id in ids], dtype=float)
+        sums = sums.reshape(len(ids), 6)
+        n, temperature_sum, temperature_squares, within_day, humidity_sum, rainfall = sums.T
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            avg_temperature = temperature_sum / n
+            # Parallel variance: within-day spread plus spread of the daily means
+            m2 = within_day + np.maximum(temperature_squares - n * avg_temperature ** 2, 0.0)
+            temperature_std = np.where(n > 1, np.sqrt(m2 / (n - 1)), np.nan)
+            avg_humidity = humidity_sum / n
+        
+        return {
+            'count': n,
+            'avg_temperature': avg_temperature,
+            'temperature_std': temperature_std,
+            'avg_humidity': avg_humidity,
+            'total_rainfall': rainfall,
+        }
+    
+    @staticmethod
+    def predict_arrays(crop_types, stages, areas, stats):
+        """
+        predict_from_stats over NumPy arrays, one element per crop
+        
+        Applies the same factors in the same order of operations as the
+        scalar path. Crops whose stats count is 0 get the base yield.
+        
+        Returns:
+            dict of arrays: predicted_yield, yield_per_acre, confidence_score,
+            temperature, rainfall and humidity factors, stage_bonus and has_weather
+        """
+        import numpy as np
+        
+        service = YieldPredictionService
+        
+        def lookup(table, keys, default):
+            return np.array([table.get(key, default) for key in keys], dtype=float).reshape(len(keys), -1)
+        
+        base_yield = lookup(service.BASE_YIELDS, crop_types, 10)[:, 0]
+        temp_range = lookup(service.OPTIMAL_TEMP, crop_types, (15, 30))
+        rain_range = lookup(service.OPTIMAL_RAINFALL, crop_types, (500, 800))
+        stage_multiplier = lookup(service.STAGE_BONUS, stages, 1.0)[:, 0]
+        areas = np.asarray(areas, dtype=float)
+        
+        count = stats['count']
+        avg_temp = stats['avg_temperature']
+        temp_std = stats['temperature_std']
+        total_rainfall = stats['total_rainfall']
+        avg_humidity = stats['avg_humidity']
+        has_weather = count > 0
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Temperature factor with variance penalty
+            low, high = temp_range[:, 0], temp_range[:, 1]
+            deviation = np.minimum(np.abs(avg_temp - low), np.abs(avg_temp - high))
+            temp_factor = np.where(
+                (low <= avg_temp) & (avg_temp <= high), 1.0, np.maximum(0.5, 1.0 - (deviation * 0.05))
+            )
+            temp_factor = np.where(
+                temp_std > 5, temp_factor * np.maximum(0.8, 1.0 - (temp_std - 5) * 0.02), temp_factor
+            )
+            
+            # Rainfall factor
+            low, high = rain_range[:, 0], rain_range[:, 1]
+            rain_factor = np.select(
+                [(low <= total_rainfall) & (total_rainfall <= high), total_rainfall < low],
+                [1.0, np.maximum(0.4, total_rainfall / low)],
+                default=np.maximum(0.6, 1.0 - ((total_rainfall - high) / high)),
+            )
+            
+            # Humidity factor
+            humidity_factor = np.select(
+                [(60 <= avg_humidity) & (avg_humidity <= 80), avg_humidity < 60],
+                [1.0, np.maximum(0.6, avg_humidity / 60)],
+                default=np.maximum(0.7, 1.0 - (avg_humidity - 80) / 100),
+            )
+        
+        combined_factor = (
+            (temp_factor * 0.35) +
+            (rain_factor * 0.40) +
+            (humidity_factor * 0.25)
+        ) * stage_multiplier
+        
+        predicted_yield_per_acre = base_yield * combined_factor
+        total_predicted_yield = predicted_yield_per_acre * areas
+        
+        data_quality = np.minimum(100, (count / 30) * 100)
+        factor_quality = combined_factor * 100
+        confidence = np.maximum(30, np.minimum(95, (data_quality * 0.6) + (factor_quality * 0.4)))
+        
+        return {
+            'predicted_yield': np.where(has_weather, total_predicted_yield, base_yield * areas),
+            'yield_per_acre': np.where(has_weather, predicted_yield_per_acre, base_yield),
+            'confidence_score': np.where(has_weather, confidence, 30.0),
+            'temperature': temp_factor,
+            'rainfall': rain_factor,
+            'humidity': humidity_factor,
+            'stage_bonus': stage_multiplier,
+            'has_weather': has_weather,
+        }
+    
+    @staticmethod
+    def predict_batch(crops):
+        """
+        Predict yields for many crops at once
+        
+        Returns a list of predict_from_stats results aligned with `crops`.
+        Crops the active trained model covers (see yield_model) get its
+        prediction; the rest get the heuristic's.
+        """
+        from .crop_weather_stats import CropWeatherStatsService
+        from .yield_model import get_yield_model
+        
+        crops = list(crops)
+        if not crops:
+            return []
+        
+        crop_types = [crop.crop_type for crop in crops]
+        stages = [crop.current_stage for crop in crops]
+        areas = [float(crop.area_planted) for crop in crops]
+        # One stored row per crop, however long its season has run
+        stats = CropWeatherStatsService.stats(crops)
+        result = YieldPredictionService.predict_arrays(crop_types, stages, areas, stats)
+        
+        model = get_yield_model()
+        modelled = None
+        if model is not None:
+            predicted, confidence, modelled = model.predict(crop_types, stages, areas, stats, result)
+        
+        predictions = []
+        for i in range(len(crops)):
+            if modelled is not None and modelled[i]:
+                factors = {
+                    'model': model.version,
+                    'heuristic_yield': f"{result['predicted_yield'][i]:.2f}",
+                }
+                predicted_yield = Decimal(str(round(float(predicted[i]), 2)))
+                confidence_score = Decimal(str(round(float(confidence[i]), 2)))
+            elif result['has_weather'][i]:
+                factors = {
+                    'temperature': f"{result['temperature'][i]:.2f}",
+                    'rainfall': f"{result['rainfall'][i]:.2f}",
+                    'humidity': f"{result['humidity'][i]:.2f}",
+                    'stage_bonus': f"{result['stage_bonus'][i]:.2f}"
+                }
+                predicted_yield = Decimal(str(round(float(result['predicted_yield'][i]), 2)))
+                confidence_score = Decimal(str(round(float(result['confidence_score'][i]), 2)))
+            else:
+                factors = {'temperature': 'Unknown', 'rainfall': 'Unknown', 'humidity': 'Unknown'}
+                predicted_yield = Decimal(str(float(result['predicted_yield'][i])))
+                confidence_score = Decimal('30.0')
+            predictions.append({
+                'predicted_yield': predicted_yield,
+                'confidence_score': confidence_score,
+                'factors': factors
+            })
+        return predictions
+    
+    @staticmethod
+    def store_predictions(crops, predictions, replace=False):
+        """
+        Save predict_batch results as YieldPrediction rows in one transaction
+        
+        With replace, the crops' unrealised predictions from today are
+        deleted first, so each crop keeps a single prediction per day.
+        """
+        from datetime import date
+        from django.db import transaction
+        from .models import YieldPrediction
+        
+        with transaction.atomic():
+            if replace:
+                # prediction_date is auto_now_add, which stores date.today()
+                YieldPrediction.objects.filter(
+                    crop__in=crops, prediction_date=date.today(), actual_yield__isnull=True
+                ).delete()
+            YieldPrediction.objects.bulk_create([
+                YieldPrediction(
+                    crop=crop,
+                    predicted_yield=prediction['predicted_yield'],
+                    confidence_score=prediction['confidence_score']
+                )
+                for crop, prediction in zip(crops, predictions)
+            ], batch_size=1000)
+    
+    @staticmethod
+    def mark_weather_changed(farm_days):
+        """
+        Flag the active crops whose season includes any changed (farm_id, date) day
+        
+        Returns the number of crops newly marked dirty.
+        """
+        from collections import defaultdict
+        from .models import Crop
+        
+        latest = {}
+        for farm_id, day in farm_days:
+            latest[farm_id] = max(latest.get(farm_id, day), day)
+        farms_by_day = defaultdict(list)
+        for farm_id, day in latest.items():
+            farms_by_day[day].append(farm_id)
+        
+        # Live ingestion changes only today, so this is normally a single UPDATE
+        return sum(
+            Crop.objects.filter(
+                farm_id__in=farm_ids, is_active=True, prediction_dirty=False, planting_date__lte=day
+            ).update(prediction_dirty=True)
+            for day, farm_ids in farms_by_day.items()
+        )
+    
+    @staticmethod
+    def advance_stages():
+        """Move active crops to the stage their age implies, marking moved crops dirty"""
+        from .models import Crop
+        
+        changed = []
+        crops = Crop.objects.filter(is_active=True).only('id', 'crop_type', 'planting_date', 'current_stage')
+        for crop in crops.iterator(chunk_size=2000):
+            stage = YieldPredictionService.update_crop_stage(crop)
+            if stage != crop.current_stage:
+                crop.current_stage = stage
+                crop.prediction_dirty = True
+                changed.append(crop)
+        Crop.objects.bulk_update(changed, ['current_stage', 'prediction_dirty'], batch_size=1000)
+        return len(changed)
+    
+    @staticmethod
+    def refresh_dirty(batch_size=None):
+        """
+        Recompute and store predictions for active crops marked dirty
+        
+        Each batch's flags are cleared before its predictions are computed,
+        so inputs that change meanwhile mark the crop dirty again for the
+        next pass instead of being lost. Crops marked after the pass starts
+        are left for the next one.
+        
+        Returns the number of crops refreshed.
+        """
+        from .models import Crop
+        
+        batch_size = batch_size or YieldPredictionService.BATCH_SIZE
+        crop_ids = list(
+            Crop.objects.filter(is_active=True, prediction_dirty=True).order_by('id').values_list('id', flat=True)
+        )
+        for start in range(0, len(crop_ids), batch_size):
+            ids = crop_ids[start:start + batch_size]
+            Crop.objects.filter(id__in=ids).update(prediction_dirty=False)
+            try:
+                batch = list(
+                    Crop.objects.filter(id__in=ids)
+                    .only('id', 'crop_type', 'current_stage', 'area_planted', 'planting_date', 'farm_id')
+                    .order_by('id')
+                )
+                YieldPredictionService.store_predictions(
+                    batch, YieldPredictionService.predict_batch(batch), replace=True
+                )
+            except Exception:
+                Crop.objects.filter(id__in=ids).update(prediction_dirty=True)
+                raise
+        return len(crop_ids)
+    
     @staticmethod
     def update_crop_stage(crop):
         """Update crop growth stage based on days since planting"""
-        days = crop.days_since_planting()
-        
+        return YieldPredictionService.stage_for_days(crop.crop_type, crop.days_since_planting())
+    
+    @staticmethod
+    def stage_for_days(crop_type, days):
+        """Growth stage a crop of this type reaches `days` after planting"""
         # Simple stage progression based on days (varies by crop)
         stage_thresholds = {
             'maize': [(0, 'germination'), (14, 'vegetative'), (60, 'flowering'), 
@@ -161,7 +534,7 @@ class YieldPredictionService:
                      (80, 'fruiting'), (100, 'maturity'), (120, 'harvest')],
         }
         
-        thresholds = stage_thresholds.get(crop.crop_type, stage_thresholds['maize'])
+        thresholds = stage_thresholds.get(crop_type, stage_thresholds['maize'])
         
         for threshold_days, stage in reversed(thresholds):
             if days >= threshold_days:
@@ -0,0 +1,139 @@
+"""
+Per-farm weather refresh cadence
+"""
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+
+
+class RefreshPolicy:
+    """
+    Decide how often each farm's weather should be refreshed
+
+    The base interval comes from the most weather-sensitive active crop stage
+    (flowering crops are refreshed more often than maturing ones). It is
+    shortened for farms with recent unread alerts and for farmers who are
+    actively using the app, lengthened for farmers who have not logged in
+    for a long time, and clamped to the configured bounds.
+    """
+
+    DEFAULT_INTERVAL_MINUTES = 180
+
+    STAGE_INTERVAL_MINUTES = {
+        'flowering': 60,
+        'fruiting': 90,
+        'germination': 120,
+        'vegetative': 180,
+        'maturity': 240,
+        'harvest': 360,
+    }
+
+    # Multipliers applied to the stage interval
+    ALERT_FACTORS = {'critical': 0.5, 'high': 0.5, 'medium': 0.75}
+    ACTIVE_USER_FACTOR = 0.75
+    IDLE_USER_FACTOR = 2.0
+
+    ALERT_WINDOW = timedelta(hours=24)
+    ACTIVE_USER_WINDOW = timedelta(days=1)
+    IDLE_USER_WINDOW = timedelta(days=30)
+
+    # Each farm's due time is shifted by up to ±JITTER of its interval so farms
+    # that were refreshed together drift apart instead of staying in lockstep
+    JITTER = 0.1
+
+    @staticmethod
+    def _config():
+        return getattr(settings, 'WEATHER_REFRESH', {})
+
+    @staticmethod
+    def bounds():
+        """(minimum, maximum) interval as timedeltas"""
+        config = RefreshPolicy._config()
+        return (
+            timedelta(minutes=config.get('MIN_INTERVAL_MINUTES', 30)),
+            timedelta(minutes=config.get('MAX_INTERVAL_MINUTES', 720)),
+        )
+
+    @staticmethod
+    def stage_interval(stages):
+        """Base interval in minutes for a farm whose active crops are in these stages"""
+        config = RefreshPolicy._config()
+        stage_minutes = dict(RefreshPolicy.STAGE_INTERVAL_MINUTES, **config.get('STAGE_INTERVAL_MINUTES', {}))
+        default = config.get('DEFAULT_INTERVAL_MINUTES', RefreshPolicy.DEFAULT_INTERVAL_MINUTES)
+        return min((stage_minutes.get(stage, default) for stage in stages), default=default)
+
+    @staticmethod
+    def interval(stages, alert_severities=(), last_login=None, now=None):
+        """
+        Refresh interval for one farm
+
+        Args:
+            stages: growth stages of the farm's active crops
+            alert_severities: severities of recent unread alerts
+            last_login: when the farm's owner last logged in, if ever
+        """
+        now = now or timezone.now()
+        minutes = RefreshPolicy.stage_interval(stages)
+
+        alert_factor = min(
+            (RefreshPolicy.ALERT_FACTORS.get(severity, 1.0) for severity in alert_severities),
+            default=1.0
+        )
+        minutes *= alert_factor
+
+        if last_login and now - last_login <= RefreshPolicy.ACTIVE_USER_WINDOW:
+            minutes *= RefreshPolicy.ACTIVE_USER_FACTOR
+        elif not last_login or now - last_login > RefreshPolicy.IDLE_USER_WINDOW:
+            minutes *= RefreshPolicy.IDLE_USER_FACTOR
+
+        low, high = RefreshPolicy.bounds()
+        return min(high, max(low, timedelta(minutes=minutes)))
+
+    @staticmethod
+    def intervals_for(farms, now=None):
+        """
+        Refresh interval for each farm, using one query each for crops and alerts
+
+        Returns:
+            dict of farm id -> timedelta
+        """
+        from .models import Alert, Crop
+
+        now = now or timezone.now()
+        farms = list(farms)
+        farm_ids = [farm.id for farm in farms]
+
+        stages = defaultdict(list)
+        for farm_id, stage in (
+            Crop.objects.filter(farm_id__in=farm_ids, is_active=True).values_list('farm_id', 'current_stage')
+        ):
+            stages[farm_id].append(stage)
+
+        severities = defaultdict(list)
+        for farm_id, severity in (
+            Alert.objects
+            .filter(farm_id__in=farm_ids, is_read=False, created_at__gte=now - RefreshPolicy.ALERT_WINDOW)
+            .values_list('farm_id', 'severity')
+        ):
+            severities[farm_id].append(severity)
+
+        return {
+            farm.id: RefreshPolicy.interval(
+                stages[farm.id], severities[farm.id], farm.farmer.user.last_login, now
+            )
+            for farm in farms
+        }
+
+    @staticmethod
+    def jitter(farm_id, interval):
+        """Stable per-farm offset within ±JITTER of the interval"""
+        fraction = (farm_id * 2654435761 % 2 ** 32) / 2 ** 32
+        return interval * ((fraction - 0.5) * 2 * RefreshPolicy.JITTER)
+
+    @staticmethod
+    def next_due(farm, interval):
+        """When the farm should next be refreshed; None if it has never been"""
+        if not farm.last_weather_update:
+            return None
+        return farm.last_weather_update + interval + RefreshPolicy.jitter(farm.id, interval)
@@ -0,0 +1,139 @@
+"""
+Priority queue of farms ordered by when their weather is next due
+"""
+import heapq
+from datetime import timedelta
+from django.utils import timezone
+from .metrics import metrics
+from .refresh_policy import RefreshPolicy
+from .weather_ingestion import WeatherIngestionService
+
+
+class RefreshScheduler:
+    """
+    Keeps every farm with coordinates in a heap keyed by its next due time
+
+    Farms that are already overdue when the queue is (re)loaded are spread
+    evenly over `spread` instead of all being fetched at once, and each farm
+    is rescheduled by its own RefreshPolicy interval after it is refreshed,
+    so requests stay evenly distributed rather than bursting on cron ticks.
+    """
+
+    RETRY_DELAY = timedelta(minutes=15)
+
+    def __init__(self, batch_size=50, workers=None, chunk_size=None, spread=timedelta(minutes=15)):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.spread = spread
+        self.farms = {}
+        self.intervals = {}
+        self._heap = []
+
+    def load(self, now=None):
+        """Rebuild the queue from the database"""
+        from .models import Farm
+
+        now = now or timezone.now()
+        farms = list(
+            Farm.objects.exclude(latitude__isnull=True).exclude(longitude__isnull=True).select_related('farmer__user')
+        )
+        self.farms = {farm.id: farm for farm in farms}
+        self.intervals = RefreshPolicy.intervals_for(farms, now)
+
+        heap = []
+        overdue = []
+        for farm in farms:
+            due_at = RefreshPolicy.next_due(farm, self.intervals[farm.id])
+            if due_at is None or due_at <= now:
+                overdue.append((due_at or farm.created_at, farm.id))
+            else:
+                heap.append((due_at, farm.id))
+
+        # Most overdue first, evenly spaced across the spread window
+        overdue.sort()
+        step = self.spread / len(overdue) if overdue else timedelta(0)
+        for position, (_, farm_id) in enumerate(overdue):
+            heap.append((now + step * position, farm_id))
+
+        heapq.heapify(heap)
+        self._heap = heap
+        self._publish(now)
+        return len(heap)
+
+    def _publish(self, now):
+        metrics.set_gauge('weather_scheduler_queue_size', len(self._heap))
+        metrics.set_gauge('weather_scheduler_due_now', sum(1 for due_at, _ in self._heap if due_at <= now))
+
+    def __len__(self):
+        return len(self._heap)
+
+    def upcoming(self, limit=20):
+        """The next `limit` (due_at, farm) entries without removing them"""
+        return [(due_at, self.farms[farm_id]) for due_at, farm_id in heapq.nsmallest(limit, self._heap)]
+
+    def seconds_until_next(self, now=None):
+        """Seconds until the earliest farm is due (0 if one is due now, None if the queue is empty)"""
+        if not self._heap:
+            return None
+        now = now or timezone.now()
+        return max(0.0, (self._heap[0][0] - now).total_seconds())
+
+    def pop_due(self, now=None):
+        """Remove and return up to batch_size farms that are due"""
+        now = now or timezone.now()
+        due = []
+        while self._heap and self._heap[0][0] <= now and len(due) < self.batch_size:
+            _, farm_id = heapq.heappop(self._heap)
+            due.append(self.farms[farm_id])
+        return due
+
+    def schedule(self, farm, due_at):
+        heapq.heappush(self._heap, (due_at, farm.id))
+
+    def run_due(self, now=None):
+        """
+        Refresh the farms that are due and put them back in the queue
+
+        Returns:
+            dict with the number of farms refreshed and failed, and alerts created
+        """
+        now = now or timezone.now()
+        due_farms = self.pop_due(now)
+        result = {'refreshed': 0, 'failed': 0, 'alerts': 0}
+        if not due_farms:
+            self._publish(now)
+            return result
+
+        observations = []
+        failed = []
+        for farm, weather_data, latency, error in WeatherIngestionService.fetch_weather(due_farms, self.workers):
+            if error is None and weather_data and not weather_data.get('stale'):
+                observations.append((farm, weather_data))
+            else:
+                failed.append(farm)
+
+        try:
+            persisted = WeatherIngestionService.persist_observations(observations, self.chunk_size)
+        except Exception as e:
+            print(f"Error saving scheduled weather refresh: {e}")
+            failed.extend(farm for farm, _ in observations)
+            observations = []
+        else:
+            result['alerts'] = len(persisted['alerts'])
+
+        # New alerts or stage changes can shorten a farm's interval
+        refreshed = [farm for farm, _ in observations]
+        self.intervals.update(RefreshPolicy.intervals_for(refreshed))
+        for farm in refreshed:
+            interval = self.intervals[farm.id]
+            self.schedule(farm, now + interval + RefreshPolicy.jitter(farm.id, interval))
+        for farm in failed:
+            self.schedule(farm, now + min(self.RETRY_DELAY, self.intervals[farm.id]))
+
+        result['refreshed'] = len(refreshed)
+        result['failed'] = len(failed)
+        metrics.increment('weather_scheduler_refreshes_total', len(refreshed), result='ok')
+        metrics.increment('weather_scheduler_refreshes_total', len(failed), result='failed')
+        self._publish(timezone.now())
+        return result
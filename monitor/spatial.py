@@ -0,0 +1,288 @@
+"""
+Geohash-based spatial lookups for farms
+"""
+import heapq
+import math
+
+
+class SpatialService:
+    """
+    Radius and nearest-neighbour queries over Farm.geohash
+
+    A query is answered in three steps: the geohash cells covering the search
+    area become indexed range scans, a latitude/longitude bounding box trims
+    the cell corners in SQL, and an exact haversine distance filters and
+    orders the remaining candidates in Python.
+    """
+
+    BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+    PRECISION = 9  # ~5m cells, finer than any coordinate we receive
+    EARTH_RADIUS_KM = 6371.0088
+
+    # Nearest-neighbour search starts at this radius and doubles until it finds k farms
+    INITIAL_SEARCH_RADIUS_KM = 5.0
+
+    @staticmethod
+    def geohash(latitude, longitude, precision=PRECISION):
+        """Encode coordinates as a geohash string"""
+        lat_range = [-90.0, 90.0]
+        lon_range = [-180.0, 180.0]
+        latitude = float(latitude)
+        longitude = float(longitude)
+
+        chars = []
+        bits = 0
+        value = 0
+        even = True
+        while len(chars) < precision:
+            interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+            mid = (interval[0] + interval[1]) / 2
+            value <<= 1
+            if coordinate >= mid:
+                value |= 1
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+            bits += 1
+            if bits == 5:
+                chars.append(SpatialService.BASE32[value])
+                bits = 0
+                value = 0
+        return ''.join(chars)
+
+    @staticmethod
+    def cell_center(geohash):
+        """(latitude, longitude) at the centre of a geohash cell"""
+        lat_range = [-90.0, 90.0]
+        lon_range = [-180.0, 180.0]
+        even = True
+        for char in geohash:
+            value = SpatialService.BASE32.index(char)
+            for shift in range(4, -1, -1):
+                interval = lon_range if even else lat_range
+                mid = (interval[0] + interval[1]) / 2
+                if value >> shift & 1:
+                    interval[0] = mid
+                else:
+                    interval[1] = mid
+                even = not even
+        return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+    @staticmethod
+    def cell_size(precision):
+        """(latitude degrees, longitude degrees) covered by one cell"""
+        bits = 5 * precision
+        return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+    @staticmethod
+    def haversine_km(lat1, lon1, lat2, lon2):
+        """Great-circle distance in kilometres"""
+        lat1, lon1, lat2, lon2 = map(math.radians, (float(lat1), float(lon1), float(lat2), float(lon2)))
+        a = (
+            math.sin((lat2 - lat1) / 2) ** 2
+            + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+        )
+        return 2 * SpatialService.EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+    @staticmethod
+    def bounding_box(latitude, longitude, radius_km):
+        """
+        (min_lat, max_lat, min_lon, max_lon) enclosing the circle
+
+        Longitude bounds are None when the box would wrap a pole or the
+        antimeridian, in which case only the latitude bounds are usable.
+        """
+        latitude = float(latitude)
+        longitude = float(longitude)
+        angular = math.degrees(radius_km / SpatialService.EARTH_RADIUS_KM)
+        min_lat = max(-90.0, latitude - angular)
+        max_lat = min(90.0, latitude + angular)
+
+        if min_lat <= -90.0 or max_lat >= 90.0:
+            return min_lat, max_lat, None, None
+
+        delta_lon = math.degrees(
+            math.asin(min(1.0, math.sin(math.radians(angular)) / math.cos(math.radians(latitude))))
+        )
+        min_lon = longitude - delta_lon
+        max_lon = longitude + delta_lon
+        if min_lon < -180.0 or max_lon > 180.0:
+            return min_lat, max_lat, None, None
+        return min_lat, max_lat, min_lon, max_lon
+
+    @staticmethod
+    def covering_prefixes(bbox):
+        """Geohash prefixes whose cells together cover the bounding box (at most 3 x 3)"""
+        min_lat, max_lat, min_lon, max_lon = bbox
+        if min_lon is None:
+            return []
+
+        precision = 0
+        for candidate in range(1, SpatialService.PRECISION + 1):
+            cell_lat, cell_lon = SpatialService.cell_size(candidate)
+            if cell_lat * 2 < max_lat - min_lat or cell_lon * 2 < max_lon - min_lon:
+                break
+            precision = candidate
+        if precision == 0:
+            return []
+
+        cell_lat, cell_lon = SpatialService.cell_size(precision)
+
+        def steps(low, high, size):
+            values = []
+            value = low
+            while value < high:
+                values.append(value)
+                value += size
+            values.append(high)
+            return values
+
+        return sorted({
+            SpatialService.geohash(lat, lon, precision)
+            for lat in steps(min_lat, max_lat, cell_lat)
+            for lon in steps(min_lon, max_lon, cell_lon)
+        })
+
+    @staticmethod
+    def candidates(latitude, longitude, radius_km, queryset=None):
+        """Farms inside the covering cells and bounding box, before the exact distance check"""
+        from django.db.models import Q
+        from .models import Farm
+
+        queryset = Farm.objects.all() if queryset is None else queryset
+        queryset = queryset.exclude(geohash='')
+
+        bbox = SpatialService.bounding_box(latitude, longitude, radius_km)
+        min_lat, max_lat, min_lon, max_lon = bbox
+        queryset = queryset.filter(latitude__gte=min_lat, latitude__lte=max_lat)
+        if min_lon is not None:
+            queryset = queryset.filter(longitude__gte=min_lon, longitude__lte=max_lon)
+
+        prefixes = SpatialService.covering_prefixes(bbox)
+        if prefixes:
+            # Range scans on the indexed column; '~' sorts after every base32 character
+            cells = Q()
+            for prefix in prefixes:
+                cells |= Q(geohash__gte=prefix, geohash__lt=prefix + '~')
+            queryset = queryset.filter(cells)
+        return queryset
+
+    @staticmethod
+    def farms_within(latitude, longitude, radius_km, queryset=None):
+        """
+        Farms within radius_km of a point, nearest first
+
+        Each returned farm has a `distance_km` attribute.
+        """
+        results = []
+        for farm in SpatialService.candidates(latitude, longitude, radius_km, queryset):
+            distance = SpatialService.haversine_km(latitude, longitude, farm.latitude, farm.longitude)
+            if distance <= radius_km:
+                farm.distance_km = distance
+                results.append(farm)
+        results.sort(key=lambda farm: farm.distance_km)
+        return results
+
+    @staticmethod
+    def nearest_farms(latitude, longitude, k=5, queryset=None, max_radius_km=None):
+        """
+        The k farms closest to a point, nearest first
+
+        Searches a growing radius until it holds k farms; every farm outside
+        that radius is further away than every farm inside it, so the first k
+        of the sorted result are exact.
+        """
+        max_radius_km = max_radius_km or math.pi * SpatialService.EARTH_RADIUS_KM
+        radius = min(SpatialService.INITIAL_SEARCH_RADIUS_KM, max_radius_km)
+        while True:
+            found = SpatialService.farms_within(latitude, longitude, radius, queryset)
+            if len(found) >= k or radius >= max_radius_km:
+                return heapq.nsmallest(k, found, key=lambda farm: farm.distance_km)
+            radius = min(radius * 2, max_radius_km)
+
+    @staticmethod
+    def neighbouring_farms(farm, radius_km):
+        """Other farms within radius_km of this farm, nearest first"""
+        from .models import Farm
+
+        if farm.latitude is None or farm.longitude is None:
+            return []
+        return SpatialService.farms_within(
+            farm.latitude, farm.longitude, radius_km,
+            Farm.objects.exclude(pk=farm.pk).select_related('farmer__user')
+        )
+
+
+class SphereKDTree:
+    """
+    Static KD-tree over points on the unit sphere
+
+    Coordinates are stored as 3D unit vectors, where straight-line (chord)
+    distance orders points exactly like great-circle distance, so an ordinary
+    Euclidean KD-tree gives exact nearest neighbours with no special casing
+    at the antimeridian or the poles.
+    """
+
+    def __init__(self, coordinates):
+        """coordinates: sequence of (latitude, longitude); results refer to their indexes"""
+        points = [(self.to_vector(lat, lon), index) for index, (lat, lon) in enumerate(coordinates)]
+        # Flat arrays: node i holds a point and the indexes of its children (-1 for none)
+        self._vectors = []
+        self._items = []
+        self._axes = []
+        self._left = []
+        self._right = []
+        self._root = self._build(points, 0)
+
+    @staticmethod
+    def to_vector(latitude, longitude):
+        lat = math.radians(float(latitude))
+        lon = math.radians(float(longitude))
+        return (math.cos(lat) * math.cos(lon), math.cos(lat) * math.sin(lon), math.sin(lat))
+
+    def _build(self, points, depth):
+        if not points:
+            return -1
+        axis = depth % 3
+        points.sort(key=lambda point: point[0][axis])
+        middle = len(points) // 2
+        node = len(self._vectors)
+        self._vectors.append(points[middle][0])
+        self._items.append(points[middle][1])
+        self._axes.append(axis)
+        self._left.append(-1)
+        self._right.append(-1)
+        self._left[node] = self._build(points[:middle], depth + 1)
+        self._right[node] = self._build(points[middle + 1:], depth + 1)
+        return node
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def nearest(self, latitude, longitude):
+        """(index, distance_km) of the closest point, or None if the tree is empty"""
+        if self._root < 0:
+            return None
+        target = self.to_vector(latitude, longitude)
+        vectors, axes, left, right = self._vectors, self._axes, self._left, self._right
+        best_node = -1
+        best = float('inf')
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            point = vectors[node]
+            distance = (
+                (point[0] - target[0]) ** 2 + (point[1] - target[1]) ** 2 + (point[2] - target[2]) ** 2
+            )
+            if distance < best:
+                best, best_node = distance, node
+            delta = target[axes[node]] - point[axes[node]]
+            near, far = (left[node], right[node]) if delta < 0 else (right[node], left[node])
+            # Visit the far side only if the splitting plane is closer than the best match
+            if far >= 0 and delta * delta < best:
+                stack.append(far)
+            if near >= 0:
+                stack.append(near)
+        chord = math.sqrt(best)
+        return self._items[best_node], 2 * SpatialService.EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
@@ -0,0 +1,245 @@
+import tempfile
+from contextlib import redirect_stdout
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from io import StringIO
+from types import SimpleNamespace
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from monitor.climate_classifier import ClimateClassifier
+from monitor.climate_grid import ClimateGrid, get_climate_grid
+from monitor.climate_normals import ClimateNormalsService
+from monitor.crop_weather_stats import CropWeatherStatsService
+from monitor.management.commands.profile_startup import Command as ProfileStartupCommand
+from monitor.models import Crop, CropWeatherStats, Farm, Farmer, WeatherRecord
+from monitor.prediction_service import YieldPredictionService
+from monitor.weather_ingestion import WeatherIngestionService
+from monitor.weather_rollups import WeatherRollupService
+
+
+class StartupTests(SimpleTestCase):
+    """Cold start stays within STARTUP_BUDGET_MS and keeps heavy modules out"""
+
+    def test_profile_startup_within_budget(self):
+        # Raises CommandError when startup fails or goes over the budget
+        call_command('profile_startup', runs=1, stdout=StringIO())
+
+    def test_urlconf_does_not_import_heavy_modules(self):
+        run = ProfileStartupCommand()._run([settings.ROOT_URLCONF])
+        imported = [name for name in ProfileStartupCommand.HEAVY_MODULES if name in run['modules']]
+        self.assertEqual(imported, [])
+
+
+class WeatherClusterTests(SimpleTestCase):
+    """Farms missing a coordinate are reported, not fetched"""
+
+    def farm(self, farm_id, latitude, longitude):
+        return SimpleNamespace(id=farm_id, name=f'Farm {farm_id}', geohash='', latitude=latitude, longitude=longitude)
+
+    def test_cluster_farms_leaves_out_farms_without_coordinates(self):
+        located = self.farm(1, -1.29, 36.82)
+        clusters = WeatherIngestionService.cluster_farms([self.farm(2, None, 36.82), located, self.farm(3, -1.29, None)])
+        self.assertEqual(list(clusters.values()), [[located]])
+
+    def test_fetch_weather_yields_an_error_for_farms_without_coordinates(self):
+        farm = self.farm(1, None, 36.82)
+        results = list(WeatherIngestionService.fetch_weather([farm], max_workers=1))
+        self.assertEqual(len(results), 1)
+        self.assertIs(results[0][0], farm)
+        self.assertIsNone(results[0][1])
+        self.assertIsInstance(results[0][3], ValueError)
+
+
+class ClimateNormalsRainfallTests(TestCase):
+    """Observed annual rainfall only comes from days with hourly accumulations for every hour"""
+
+    DAYS = 100
+
+    def setUp(self):
+        user = User.objects.create_user('grower', password='unused')
+        self.farmer = Farmer.objects.create(user=user, county='Nakuru')
+
+    def farm_with_readings(self, name, source, hours, rainfall):
+        farm = Farm.objects.create(
+            farmer=self.farmer, name=name, location=name, latitude=Decimal('-0.3031'),
+            longitude=Decimal('36.0800'), size_acres=Decimal('5'),
+        )
+        today = timezone.localdate()
+        records = []
+        for offset in range(self.DAYS):
+            day = today - timedelta(days=offset)
+            midnight = timezone.make_aware(datetime.combine(day, time()))
+            for hour in hours:
+                records.append(WeatherRecord(
+                    farm=farm, date=day, observed_at=midnight + timedelta(hours=hour), source=source,
+                    temperature=Decimal('21.5'), humidity=Decimal('65'), rainfall=Decimal(rainfall),
+                ))
+        WeatherRecord.objects.bulk_create(records)
+        WeatherRollupService.backfill(farm_ids=[farm.id])
+        return ClimateNormalsService.for_farm(farm)
+
+    def test_every_hour_accumulated_gives_observed_rainfall(self):
+        normals = self.farm_with_readings('Hourly', 'openweathermap', range(24), '0.10')
+        self.assertEqual(normals.rainfall_source, 'observed')
+        self.assertEqual(normals.rainfall_days, self.DAYS)
+        self.assertAlmostEqual(normals.annual_rainfall, 2.4 * ClimateNormalsService.WINDOW_DAYS)
+
+    def test_readings_at_the_refresh_cadence_keep_the_estimate(self):
+        normals = self.farm_with_readings('Three-hourly', 'openweathermap', range(0, 24, 3), '0.10')
+        self.assertEqual(normals.rainfall_source, 'estimated')
+        self.assertEqual(normals.rainfall_days, 0)
+        self.assertFalse(normals.is_desert)
+
+    def test_demo_readings_keep_the_estimate(self):
+        normals = self.farm_with_readings('Demo', 'demo', range(24), '0')
+        self.assertEqual(normals.rainfall_source, 'estimated')
+        self.assertFalse(normals.is_desert)
+        self.assertEqual(
+            normals.annual_rainfall,
+            ClimateNormalsService.annual_rainfall(normals.farm.latitude, 0, 0, 21.5, 65.0)[0],
+        )
+
+
+class CropWeatherStatsTests(TestCase):
+    """Incremental updates leave the same running statistics as a rebuild"""
+
+    def test_refreshing_a_day_again_does_not_count_it_twice(self):
+        user = User.objects.create_user('grower', password='unused')
+        farmer = Farmer.objects.create(user=user, county='Nakuru')
+        farm = Farm.objects.create(
+            farmer=farmer, name='Shamba', location='Nakuru', latitude=Decimal('-0.3031'),
+            longitude=Decimal('36.0800'), size_acres=Decimal('5'),
+        )
+        today = timezone.localdate()
+        crop = Crop.objects.create(
+            farm=farm, crop_type='maize', planting_date=today - timedelta(days=10), area_planted=Decimal('2'),
+        )
+        CropWeatherStatsService.stats([crop])
+
+        midnight = timezone.make_aware(datetime.combine(today, time()))
+        for hour, temperature in enumerate(['18.0', '22.5', '25.0']):
+            WeatherIngestionService.record_observation(farm, {
+                'source': 'openweathermap', 'temperature': Decimal(temperature), 'humidity': Decimal('60'),
+                'rainfall': Decimal('0.4'), 'wind_speed': None, 'description': '',
+            }, midnight + timedelta(hours=hour))
+        WeatherRollupService.refresh_days({(farm.id, today)})
+
+        incremental = CropWeatherStats.objects.values_list(
+            'observation_count', 'temperature_mean', 'temperature_m2', 'rainfall_total'
+        ).get(crop=crop)
+        CropWeatherStatsService.rebuild([farm.id])
+        rebuilt = CropWeatherStats.objects.values_list(
+            'observation_count', 'temperature_mean', 'temperature_m2', 'rainfall_total'
+        ).get(crop=crop)
+        self.assertEqual(incremental[0], 3)
+        self.assertEqual(incremental[0], rebuilt[0])
+        for value, expected in zip(incremental[1:], rebuilt[1:]):
+            self.assertAlmostEqual(float(value), float(expected))
+
+
+class ClimateGridTests(SimpleTestCase):
+    """Running processes pick up a grid built after they started"""
+
+    def test_grid_built_after_first_lookup_is_loaded(self):
+        import numpy as np
+
+        with tempfile.TemporaryDirectory() as path, override_settings(CLIMATE_GRID={'PATH': path}):
+            with redirect_stdout(StringIO()):
+                self.assertIsNone(get_climate_grid())
+            payload = {'climate': {'is_desert': False}, 'recommendations': []}
+            ClimateGrid(np.zeros((2, 2), dtype=np.int16), [payload], (-1.0, 0.0, 36.0, 37.0), 0.5).save(path)
+            grid = get_climate_grid()
+            self.assertIsNotNone(grid)
+            self.assertEqual(grid.lookup(-0.75, 36.25), payload)
+
+
+class BatchPredictionTests(TestCase):
+    """predict_batch gives the scalar predictor's results for the same weather"""
+
+    def setUp(self):
+        user = User.objects.create_user('grower', password='unused')
+        self.farmer = Farmer.objects.create(user=user, county='Nakuru')
+        self.today = timezone.localdate()
+
+    def farm(self, name, readings):
+        """A farm with (temperature, humidity, rainfall) readings every 8 hours over the last 20 days"""
+        farm = Farm.objects.create(
+            farmer=self.farmer, name=name, location=name, latitude=Decimal('-0.3031'),
+            longitude=Decimal('36.0800'), size_acres=Decimal('50'),
+        )
+        records = []
+        for offset in range(20):
+            day = self.today - timedelta(days=offset)
+            midnight = timezone.make_aware(datetime.combine(day, time()))
+            for slot, (temperature, humidity, rainfall) in enumerate(readings):
+                records.append(WeatherRecord(
+                    farm=farm, date=day, observed_at=midnight + timedelta(hours=8 * slot), source='openweathermap',
+                    temperature=Decimal(temperature) + Decimal(offset % 3), humidity=Decimal(humidity),
+                    rainfall=Decimal(rainfall) * (offset % 4),
+                ))
+        WeatherRecord.objects.bulk_create(records)
+        WeatherRollupService.backfill(farm_ids=[farm.id])
+        return farm
+
+    def test_batch_matches_scalar_for_every_stage(self):
+        farms = [
+            self.farm('Mild', [('19.5', '66', '3.1'), ('24.25', '71', '7.3'), ('21.75', '75', '0.6')]),
+            self.farm('Hot and dry', [('14.5', '31', '0.2'), ('33.75', '42', '0'), ('38.25', '36', '1.1')]),
+            self.farm('Humid', [('12.25', '88', '22.4'), ('16.5', '93', '31.7'), ('13.75', '97', '18.9')]),
+            self.farm('No weather', []),
+        ]
+        crop_types = [crop_type for crop_type, _ in Crop.CROP_TYPES]
+        crops = []
+        for f, farm in enumerate(farms):
+            for s, (stage, _) in enumerate(Crop.GROWTH_STAGES):
+                crops.append(Crop.objects.create(
+                    farm=farm, crop_type=crop_types[(f + s) % len(crop_types)], current_stage=stage,
+                    planting_date=self.today - timedelta(days=5 + 3 * s), area_planted=Decimal('2.5'),
+                ))
+
+        with tempfile.TemporaryDirectory() as path, override_settings(YIELD_MODELS={'PATH': path}):
+            batch = YieldPredictionService.predict_batch(crops)
+        stats = CropWeatherStatsService.stats(crops)
+        for i, (crop, result) in enumerate(zip(crops, batch)):
+            crop_stats = {name: float(values[i]) for name, values in stats.items()} if stats['count'][i] else None
+            scalar = YieldPredictionService.predict_from_stats(crop, crop_stats)
+            # Summing the raw records rounds differently in the last bits, so allow a cent
+            from_records = YieldPredictionService.predict_yield(
+                crop, crop.farm.weather_records.filter(date__gte=crop.planting_date)
+            )
+            with self.subTest(farm=crop.farm.name, crop_type=crop.crop_type, stage=crop.current_stage):
+                self.assertEqual(result, scalar)
+                self.assertAlmostEqual(result['predicted_yield'], from_records['predicted_yield'], delta=Decimal('0.01'))
+
+
+class ClimateClassifierBatchTests(SimpleTestCase):
+    """classify_climate_batch agrees with the scalar rules point for point"""
+
+    # Branch boundaries of estimate_annual_rainfall and classify_climate, with
+    # neighbours on either side; humidity 0, 40 and 70 put estimates exactly on
+    # the 250, 1200 and 1500 mm rainfall thresholds
+    LATITUDES = [-60, -50, -23.5, -10, 0, 23.49, 23.5, 35, 49.99, 50, 70]
+    TEMPERATURES = [-5, 9.99, 10, 10.01, 14.99, 15, 17.99, 18, 18.01, 22, 22.01, 25, 25.01, 28, 28.01, 35]
+    HUMIDITIES = [0, 20, 39.99, 40, 49.99, 50, 60, 60.01, 69.99, 70, 70.01, 90]
+    RAINFALL = [0, 5, 5.01, 20]
+
+    def test_batch_matches_scalar_functions(self):
+        from itertools import product
+
+        points = list(product(self.LATITUDES, self.TEMPERATURES, self.HUMIDITIES, self.RAINFALL))
+        latitude, temperature, humidity, rainfall = zip(*points)
+        batch = ClimateClassifier.classify_climate_batch(latitude, temperature, humidity, rainfall)
+
+        for i, point in enumerate(points):
+            estimated = ClimateClassifier.estimate_annual_rainfall(*point)
+            climate = ClimateClassifier.classify_climate(point[1], estimated, point[2])
+            with self.subTest(latitude=point[0], temperature=point[1], humidity=point[2], rainfall=point[3]):
+                self.assertEqual(batch['estimated_rainfall'][i], estimated)
+                self.assertEqual(batch['climate_code'][i], climate['climate_code'])
+                self.assertEqual(batch['climate_type'][i], climate['climate_type'])
+                self.assertEqual(batch['suitability'][i], climate['suitability'])
+                self.assertEqual(bool(batch['is_desert'][i]), climate['is_desert'])
+                self.assertEqual(batch['water_status'][i], ClimateClassifier.water_status(estimated))
@@ -33,6 +33,10 @@ urlpatterns = [
     # Location-based weather
     path('weather/current-location/', views.current_location_weather, name='current_location_weather'),
     path('weather/search/', views.search_location_weather, name='search_location_weather'),
+    path('weather/autocomplete/', views.location_autocomplete, name='location_autocomplete'),
+    
+    # Service metrics (staff only)
+    path('metrics/', views.service_metrics, name='service_metrics'),
     
     # Soil measurements
     path('farms/<int:farm_id>/soil/create/', views.soil_measurement_create, name='soil_measurement_create'),
@@ -61,8 +61,9 @@ def export_weather_to_csv(weather_records):
 
 def calculate_farm_statistics(farm):
     """Calculate comprehensive statistics for a farm"""
-    from django.db.models import Avg, Sum, Count
-    from .models import Crop, WeatherRecord, YieldPrediction
+    from django.db.models import Sum
+    from .models import Crop
+    from .weather_rollups import WeatherRollupService
     
     active_crops = farm.crops.filter(is_active=True)
     
@@ -87,21 +88,16 @@ def calculate_farm_statistics(farm):
         if count > 0:
             stats['crops_by_type'][crop_name] = count
     
-    # Weather summary (last 30 days)
+    # Weather summary (last 30 days), read from the daily rollups
     thirty_days_ago = timezone.now().date() - timedelta(days=30)
-    recent_weather = farm.weather_records.filter(date__gte=thirty_days_ago)
-    
-    if recent_weather.exists():
-        weather_agg = recent_weather.aggregate(
-            avg_temp=Avg('temperature'),
-            avg_humidity=Avg('humidity'),
-            total_rainfall=Sum('rainfall')
-        )
+    recent_weather = WeatherRollupService.window_stats(farm, thirty_days_ago)
+    
+    if recent_weather:
         stats['weather_summary'] = {
-            'avg_temperature': round(float(weather_agg['avg_temp'] or 0), 1),
-            'avg_humidity': round(float(weather_agg['avg_humidity'] or 0), 1),
-            'total_rainfall': round(float(weather_agg['total_rainfall'] or 0), 1),
-            'days_recorded': recent_weather.count()
+            'avg_temperature': round(recent_weather['avg_temperature'], 1),
+            'avg_humidity': round(recent_weather['avg_humidity'], 1),
+            'total_rainfall': round(recent_weather['total_rainfall'], 1),
+            'days_recorded': recent_weather['count']
         }
     
     # Total predicted yield
@@ -117,73 +113,91 @@ def calculate_farm_statistics(farm):
 
 def check_and_create_alerts(farm):
     """Check conditions and create alerts if needed"""
-    from .models import Alert, WeatherRecord
-    
-    alerts_created = []
-    
     # Get latest weather
     latest_weather = farm.weather_records.first()
     if not latest_weather:
-        return alerts_created
+        return []
+    
+    candidates = build_farm_alerts(farm, latest_weather, farm.crops.filter(is_active=True))
+    return create_missing_alerts(candidates)
+
+
+def build_farm_alerts(farm, latest_weather, active_crops):
+    """Build (unsaved) alerts for a farm's latest weather and its active crops"""
+    from .models import Alert
+    
+    alerts = []
     
     # Check for extreme temperature
     if latest_weather.temperature > 35:
-        alert, created = Alert.objects.get_or_create(
+        alerts.append(Alert(
             farm=farm,
             alert_type='weather',
             title='High Temperature Alert',
-            defaults={
-                'severity': 'high',
-                'message': f'Temperature is {latest_weather.temperature}°C. Consider irrigation and shade for sensitive crops.'
-            }
-        )
-        if created:
-            alerts_created.append(alert)
+            severity='high',
+            message=f'Temperature is {latest_weather.temperature}°C. Consider irrigation and shade for sensitive crops.'
+        ))
     
     elif latest_weather.temperature < 10:
-        alert, created = Alert.objects.get_or_create(
+        alerts.append(Alert(
             farm=farm,
             alert_type='weather',
             title='Low Temperature Alert',
-            defaults={
-                'severity': 'medium',
-                'message': f'Temperature is {latest_weather.temperature}°C. Protect sensitive crops from cold.'
-            }
-        )
-        if created:
-            alerts_created.append(alert)
+            severity='medium',
+            message=f'Temperature is {latest_weather.temperature}°C. Protect sensitive crops from cold.'
+        ))
     
     # Check for low humidity
     if latest_weather.humidity < 40:
-        alert, created = Alert.objects.get_or_create(
+        alerts.append(Alert(
             farm=farm,
             alert_type='irrigation',
             title='Low Humidity Alert',
-            defaults={
-                'severity': 'medium',
-                'message': f'Humidity is {latest_weather.humidity}%. Increase irrigation frequency.'
-            }
-        )
-        if created:
-            alerts_created.append(alert)
+            severity='medium',
+            message=f'Humidity is {latest_weather.humidity}%. Increase irrigation frequency.'
+        ))
     
     # Check crops needing attention
-    from .models import Crop
-    for crop in farm.crops.filter(is_active=True):
+    for crop in active_crops:
         if crop.needs_attention():
-            alert, created = Alert.objects.get_or_create(
+            alerts.append(Alert(
                 farm=farm,
                 alert_type='harvest',
                 title=f'{crop.get_crop_type_display()} Needs Attention',
-                defaults={
-                    'severity': 'medium',
-                    'message': f'{crop.get_crop_type_display()} at {crop.current_stage} stage for {crop.days_since_planting()} days. Check growth progress.'
-                }
-            )
-            if created:
-                alerts_created.append(alert)
-    
-    return alerts_created
+                severity='medium',
+                message=f'{crop.get_crop_type_display()} at {crop.current_stage} stage for {crop.days_since_planting()} days. Check growth progress.'
+            ))
+    
+    return alerts
+
+
+def create_missing_alerts(candidates):
+    """
+    Save candidate alerts that do not exist yet, in one lookup and one insert
+    
+    An alert already exists when the farm has one with the same type and title,
+    matching the get_or_create() checks this replaces.
+    """
+    from .models import Alert
+    
+    if not candidates:
+        return []
+    
+    existing = set(
+        Alert.objects.filter(
+            farm_id__in={alert.farm_id for alert in candidates},
+            title__in={alert.title for alert in candidates}
+        ).values_list('farm_id', 'alert_type', 'title')
+    )
+    
+    new_alerts = []
+    for alert in candidates:
+        key = (alert.farm_id, alert.alert_type, alert.title)
+        if key not in existing:
+            existing.add(key)
+            new_alerts.append(alert)
+    
+    return Alert.objects.bulk_create(new_alerts)
 
 
 def get_crop_recommendations(farm, weather_records):
@@ -1,18 +1,22 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth import login, authenticate
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib import messages
 from django.utils import timezone
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 from django.db.models import Q, Count, Sum, Avg
 from datetime import timedelta
-from .models import Farmer, Farm, Crop, WeatherRecord, YieldPrediction, Alert
+from .models import Farmer, Farm, Crop, Alert
 from .weather_service import WeatherService
+from .weather_ingestion import WeatherIngestionService
+from .forecast_store import ForecastStore
+from .climate_normals import ClimateNormalsService
 from .prediction_service import YieldPredictionService
 from .utils import (
     export_crops_to_csv, export_weather_to_csv, 
-    calculate_farm_statistics, check_and_create_alerts,
+    calculate_farm_statistics,
     get_crop_recommendations
 )
 
@@ -70,7 +74,7 @@ def dashboard(request):
         first_farm = farms.first()
         if first_farm.latitude and first_farm.longitude:
             current_weather = WeatherService.get_weather_data(
-                first_farm.latitude, first_farm.longitude
+                first_farm.latitude, first_farm.longitude, farm=first_farm
             )
     
     # Crops by stage
@@ -138,10 +142,18 @@ def farm_detail(request, farm_id):
     # Get crop recommendations
     recommendations = get_crop_recommendations(farm, weather_records)
     
+    # Stored daily forecast, refreshed by the update_weather command
+    forecast = ForecastStore.get_forecast(farm, source='daily')[:7]
+    
+    # Climate classified from the farm's own 12-month weather history
+    climate_normals = ClimateNormalsService.for_farm(farm)
+    
     context = {
         'farm': farm,
+        'climate_normals': climate_normals,
         'crops': crops,
         'weather_records': weather_records,
+        'forecast': forecast,
         'alerts': alerts,
         'stats': stats,
         'recommendations': recommendations,
@@ -170,14 +182,7 @@ def farm_create(request):
                 farm.save()
                 
                 # Create initial weather record
-                WeatherRecord.objects.create(
-                    farm=farm,
-                    temperature=weather_data['temperature'],
-                    humidity=weather_data['humidity'],
-                    rainfall=weather_data['rainfall'],
-                    wind_speed=weather_data['wind_speed'],
-                    description=weather_data['description']
-                )
+                WeatherIngestionService.record_observation(farm, weather_data)
                 messages.success(request, f'Farm created with weather data! Current temp: {weather_data["temperature"]}°C')
             else:
                 messages.success(request, 'Farm created! Click "Update Weather" to fetch weather data.')
@@ -211,34 +216,25 @@ def crop_create(request, farm_id):
 
 @login_required
 def crop_detail(request, crop_id):
-    """Crop detail view with predictions"""
-    crop = get_object_or_404(Crop, id=crop_id, farm__farmer=request.user.farmer)
+    """
+    Crop detail view with predictions
     
-    # Update crop stage
-    new_stage = YieldPredictionService.update_crop_stage(crop)
-    if new_stage != crop.current_stage:
-        crop.current_stage = new_stage
-        crop.save()
+    Read-only: stages and predictions are brought up to date in the
+    background by refresh_predictions whenever their inputs change.
+    """
+    crop = get_object_or_404(Crop, id=crop_id, farm__farmer=request.user.farmer)
     
     # Get weather records for the farm
     weather_records = crop.farm.weather_records.filter(
         date__gte=crop.planting_date
     )
     
-    # Get or create yield prediction
-    latest_prediction = crop.predictions.first()
-    if not latest_prediction or (timezone.now().date() - latest_prediction.prediction_date).days > 7:
-        # Generate new prediction
-        prediction_data = YieldPredictionService.predict_yield(crop, weather_records)
-        latest_prediction = YieldPrediction.objects.create(
-            crop=crop,
-            predicted_yield=prediction_data['predicted_yield'],
-            confidence_score=prediction_data['confidence_score']
-        )
+    latest_prediction = crop.predictions.order_by('-prediction_date', '-id').first()
     
     context = {
         'crop': crop,
         'latest_prediction': latest_prediction,
+        'prediction_pending': crop.prediction_dirty,
         'weather_records': weather_records[:10],
         'days_since_planting': crop.days_since_planting(),
     }
@@ -259,17 +255,10 @@ def weather_update(request, farm_id):
             farm.save()
     
     if farm.latitude and farm.longitude:
-        weather_data = WeatherService.get_weather_data(farm.latitude, farm.longitude)
+        weather_data = WeatherService.get_weather_data(farm.latitude, farm.longitude, farm=farm)
         
-        if weather_data:
-            weather_record = WeatherRecord.objects.create(
-                farm=farm,
-                temperature=weather_data['temperature'],
-                humidity=weather_data['humidity'],
-                rainfall=weather_data['rainfall'],
-                wind_speed=weather_data['wind_speed'],
-                description=weather_data['description']
-            )
+        if weather_data and not weather_data.get('stale'):
+            WeatherIngestionService.record_observation(farm, weather_data)
             
             farm.last_weather_update = timezone.now()
             farm.save(update_fields=['last_weather_update'])
@@ -294,7 +283,7 @@ def weather_update(request, farm_id):
             
             messages.success(request, f'Weather updated! Temp: {weather_data["temperature"]}°C, Humidity: {weather_data["humidity"]}%')
         else:
-            messages.error(request, 'Failed to fetch weather data. Using demo data.')
+            messages.error(request, 'Weather service unavailable. Showing the last known conditions.')
     else:
         messages.warning(request, f'Could not find coordinates for {farm.location}. Please update farm location.')
     
@@ -348,26 +337,17 @@ def export_weather(request, farm_id):
 def batch_update_weather(request):
     """Update weather for all farms"""
     farmer = request.user.farmer
-    farms = farmer.farms.exclude(latitude__isnull=True, longitude__isnull=True)
+    farms = farmer.farms.exclude(latitude__isnull=True).exclude(longitude__isnull=True)
     
-    updated_count = 0
-    for farm in farms:
-        weather_data = WeatherService.get_weather_data(farm.latitude, farm.longitude)
-        if weather_data:
-            WeatherRecord.objects.create(
-                farm=farm,
-                temperature=weather_data['temperature'],
-                humidity=weather_data['humidity'],
-                rainfall=weather_data['rainfall'],
-                wind_speed=weather_data['wind_speed'],
-                description=weather_data['description']
-            )
-            farm.last_weather_update = timezone.now()
-            farm.save(update_fields=['last_weather_update'])
-            
-            # Check and create alerts
-            check_and_create_alerts(farm)
-            updated_count += 1
+    observations = [
+        (farm, weather_data)
+        for farm, weather_data, latency, error in WeatherIngestionService.fetch_weather(farms)
+        if weather_data and not weather_data.get('stale')
+    ]
+    
+    # Store records, timestamps and alerts in bulk
+    result = WeatherIngestionService.persist_observations(observations)
+    updated_count = result['records']
     
     messages.success(request, f'Weather updated for {updated_count} farm(s)!')
     return redirect('dashboard')
@@ -409,6 +389,13 @@ def farm_statistics(request, farm_id):
     return render(request, 'monitor/farm_statistics.html', context)
 
 
+def _partial_results_message(incomplete):
+    """Warning shown when upstream calls missed the page deadline"""
+    parts = {'location': 'location details', 'search': 'the location search', 'weather': 'current weather'}
+    missing = ' and '.join(parts.get(call, call) for call in incomplete)
+    return f'Showing partial results: {missing} took too long to load. Please try again shortly.'
+
+
 @login_required
 def current_location_weather(request):
     """Get weather for user's current location - PUBLIC ACCESS"""
@@ -418,7 +405,7 @@ def current_location_weather(request):
         
         if latitude and longitude:
             from .location_service import LocationService
-            from .climate_classifier import ClimateClassifier
+            from .climate_grid import ClimateGrid
             
             result = LocationService.get_current_location_weather(
                 float(latitude),
@@ -427,11 +414,15 @@ def current_location_weather(request):
             
             if result:
                 # Add climate classification
-                climate_analysis = ClimateClassifier.analyze_location_climate(
-                    float(latitude),
-                    float(longitude),
-                    result['weather']
-                )
+                climate_analysis = None
+                if result['weather']:
+                    climate_analysis = ClimateGrid.analyze_location_climate(
+                        float(latitude),
+                        float(longitude),
+                        result['weather']
+                    )
+                if result['incomplete']:
+                    messages.warning(request, _partial_results_message(result['incomplete']))
                 
                 context = {
                     'location': result['location'],
@@ -453,17 +444,21 @@ def search_location_weather(request):
         
         if location_name:
             from .location_service import LocationService
-            from .climate_classifier import ClimateClassifier
+            from .climate_grid import ClimateGrid
             
             result = LocationService.search_location_weather(location_name)
             
             if result:
                 # Add climate classification
-                climate_analysis = ClimateClassifier.analyze_location_climate(
-                    result['location']['latitude'],
-                    result['location']['longitude'],
-                    result['weather']
-                )
+                climate_analysis = None
+                if result['weather']:
+                    climate_analysis = ClimateGrid.analyze_location_climate(
+                        result['location']['latitude'],
+                        result['location']['longitude'],
+                        result['weather']
+                    )
+                if result['incomplete']:
+                    messages.warning(request, _partial_results_message(result['incomplete']))
                 
                 context = {
                     'location': result['location'],
@@ -480,6 +475,49 @@ def search_location_weather(request):
 
 
 
+def location_autocomplete(request):
+    """JSON place-name completions from the offline gazetteer - PUBLIC ACCESS"""
+    from .gazetteer import get_gazetteer
+    from .location_service import LocationService
+    
+    query = request.GET.get('q', '')
+    try:
+        limit = min(max(int(request.GET.get('limit', 8)), 1), 25)
+    except ValueError:
+        limit = 8
+    
+    results = []
+    for place in get_gazetteer().complete(query, limit):
+        location = LocationService.place_to_location(place)
+        results.append({
+            'name': place.name,
+            'label': location['display_name'],
+            'county': place.county,
+            'type': place.kind,
+            'latitude': place.latitude,
+            'longitude': place.longitude,
+        })
+    
+    return JsonResponse({'query': query, 'results': results})
+
+
+@staff_member_required
+def service_metrics(request):
+    """Cache and upstream service metrics for this process - STAFF ONLY"""
+    from .api_quota import ApiQuota
+    from .circuit_breaker import breaker_statuses
+    from .metrics import metrics
+    from .weather_cache import WeatherCache
+    
+    return JsonResponse({
+        'weather_cache': WeatherCache.stats(),
+        'circuit_breakers': breaker_statuses(),
+        'api_quota': ApiQuota.status(),
+        'metrics': metrics.snapshot(),
+    })
+
+
+
 @login_required
 def soil_measurement_create(request, farm_id):
     """Create new soil measurement"""
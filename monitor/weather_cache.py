@@ -0,0 +1,233 @@
+"""
+Shared weather response cache keyed by quantized coordinates
+"""
+import copy
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+from django.conf import settings
+from .metrics import metrics
+
+
+class LocMemBackend:
+    """Per-process LRU store"""
+
+    def __init__(self, max_entries=1024, **kwargs):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            self._data.move_to_end(key)
+            return copy.deepcopy(entry)
+
+    def set(self, key, entry, timeout):
+        with self._lock:
+            self._data[key] = copy.deepcopy(entry)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FileBackend:
+    """Pickle files in a shared directory, evicting least recently used files"""
+
+    def __init__(self, location, max_entries=1024, **kwargs):
+        self.location = str(location)
+        self.max_entries = max_entries
+        os.makedirs(self.location, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.location, hashlib.sha1(key.encode()).hexdigest() + '.cache')
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)  # Touch so eviction sees it as recently used
+            return entry
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, entry, timeout):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def _evict(self):
+        try:
+            files = [
+                os.path.join(self.location, name)
+                for name in os.listdir(self.location) if name.endswith('.cache')
+            ]
+            if len(files) <= self.max_entries:
+                return
+            files.sort(key=lambda p: os.path.getmtime(p))
+            for path in files[:len(files) - self.max_entries]:
+                os.remove(path)
+        except OSError:
+            pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for name in os.listdir(self.location):
+            if name.endswith('.cache'):
+                try:
+                    os.remove(os.path.join(self.location, name))
+                except OSError:
+                    pass
+
+
+class DjangoCacheBackend:
+    """Delegate storage to one of the configured Django CACHES aliases"""
+
+    def __init__(self, location='default', **kwargs):
+        from django.core.cache import caches
+        self._cache = caches[location or 'default']
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, entry, timeout):
+        self._cache.set(key, entry, timeout)
+
+    def delete(self, key):
+        self._cache.delete(key)
+
+    def clear(self):
+        self._cache.clear()
+
+
+class WeatherCache:
+    """TTL-bounded cache for weather API responses shared by nearby coordinates"""
+
+    BACKENDS = {
+        'locmem': LocMemBackend,
+        'file': FileBackend,
+        'django': DjangoCacheBackend,
+    }
+
+    DEFAULT_TTL = {
+        'current': 600,
+        'forecast': 3600,
+        'extended': 1800,
+    }
+
+    def __init__(self, backend='locmem', location=None, grid_degrees=0.01, max_entries=1024, ttl=None,
+                 stale_ttl=21600):
+        backend_class = self.BACKENDS.get(backend)
+        if backend_class is None:
+            raise ValueError(f"Unknown weather cache backend '{backend}'")
+        self.backend = backend_class(location=location, max_entries=max_entries)
+        self.grid = Decimal(str(grid_degrees))
+        self.ttl = dict(self.DEFAULT_TTL, **(ttl or {}))
+        # Expired entries are kept this much longer as a fallback while the API is down
+        self.stale_ttl = stale_ttl
+
+    def quantize(self, latitude, longitude):
+        """Snap coordinates to the nearest point of the cache grid"""
+        def snap(value):
+            cells = (Decimal(str(value)) / self.grid).quantize(Decimal('1'), rounding=ROUND_HALF_UP)
+            return (cells * self.grid).normalize() + 0  # + 0 folds -0 into 0
+        return snap(latitude), snap(longitude)
+
+    def make_key(self, endpoint, latitude, longitude):
+        lat, lon = self.quantize(latitude, longitude)
+        return f'weather:{endpoint}:{lat:f}:{lon:f}'
+
+    def get(self, endpoint, latitude, longitude, allow_stale=False):
+        """Return the cached response for this grid cell, or None on a miss"""
+        try:
+            entry = self.backend.get(self.make_key(endpoint, latitude, longitude))
+        except Exception as e:
+            print(f"Weather cache read error: {e}")
+            entry = None
+
+        if entry is not None and entry[0] > time.time():
+            metrics.increment('weather_cache_hits_total', endpoint=endpoint)
+            return entry[1]
+
+        if entry is not None and allow_stale:
+            metrics.increment('weather_cache_stale_hits_total', endpoint=endpoint)
+            return entry[1]
+
+        metrics.increment('weather_cache_misses_total', endpoint=endpoint)
+        return None
+
+    def set(self, endpoint, latitude, longitude, value):
+        """Store a successful API response for this grid cell"""
+        ttl = self.ttl.get(endpoint, 600)
+        try:
+            self.backend.set(
+                self.make_key(endpoint, latitude, longitude),
+                (time.time() + ttl, value),
+                ttl + self.stale_ttl
+            )
+        except Exception as e:
+            print(f"Weather cache write error: {e}")
+
+    def clear(self):
+        self.backend.clear()
+
+    @staticmethod
+    def stats():
+        """Hit/miss counters per endpoint from the metrics registry"""
+        counters = metrics.snapshot()['counters']
+        stats = {}
+        for endpoint in WeatherCache.DEFAULT_TTL:
+            hits = counters.get(f'weather_cache_hits_total{{endpoint={endpoint}}}', 0)
+            misses = counters.get(f'weather_cache_misses_total{{endpoint={endpoint}}}', 0)
+            total = hits + misses
+            stats[endpoint] = {
+                'hits': int(hits),
+                'misses': int(misses),
+                'hit_ratio': round(hits / total, 3) if total else 0,
+            }
+        return stats
+
+
+_weather_cache = None
+_weather_cache_lock = threading.Lock()
+
+
+def get_weather_cache():
+    """Return the process-wide cache built from the WEATHER_CACHE setting"""
+    global _weather_cache
+    if _weather_cache is None:
+        with _weather_cache_lock:
+            if _weather_cache is None:
+                config = getattr(settings, 'WEATHER_CACHE', {})
+                _weather_cache = WeatherCache(
+                    backend=config.get('BACKEND', 'locmem'),
+                    location=config.get('LOCATION'),
+                    grid_degrees=config.get('GRID_DEGREES', 0.01),
+                    max_entries=config.get('MAX_ENTRIES', 1024),
+                    ttl=config.get('TTL'),
+                    stale_ttl=config.get('STALE_TTL', 21600),
+                )
+    return _weather_cache
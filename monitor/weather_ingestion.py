@@ -0,0 +1,262 @@
+"""
+Concurrent weather ingestion for batch refreshes
+"""
+import time
+from collections import defaultdict
+from datetime import datetime, timezone as dt_timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils import timezone
+from .api_quota import ApiQuota
+from .metrics import metrics
+from .spatial import SpatialService
+from .weather_service import WeatherService
+
+
+class WeatherIngestionService:
+    """Fetch weather for many farms concurrently, leaving database writes to the caller"""
+
+    DEFAULT_WORKERS = 8
+    DEFAULT_CHUNK_SIZE = 500
+    DEFAULT_SLOT_MINUTES = 60
+    DEFAULT_CLUSTER_PRECISION = 5  # geohash cells of roughly 5 x 5 km
+
+    # Columns refreshed when an observation for the same slot is stored again
+    UPSERT_FIELDS = ['date', 'cluster', 'temperature', 'humidity', 'rainfall', 'wind_speed', 'description']
+
+    @staticmethod
+    def get_max_workers(requested=None):
+        """Resolve the worker pool size from the argument or WEATHER_FETCH_WORKERS setting"""
+        workers = requested or getattr(settings, 'WEATHER_FETCH_WORKERS', WeatherIngestionService.DEFAULT_WORKERS)
+        return max(1, int(workers))
+
+    @staticmethod
+    def observation_slot(when=None, slot_minutes=None):
+        """
+        Floor a timestamp to the start of its observation slot
+
+        Refreshes that land in the same slot (WEATHER_OBSERVATION_SLOT_MINUTES,
+        hourly by default) share one WeatherRecord per farm and source.
+        """
+        when = when or timezone.now()
+        slot_minutes = slot_minutes or getattr(
+            settings, 'WEATHER_OBSERVATION_SLOT_MINUTES', WeatherIngestionService.DEFAULT_SLOT_MINUTES
+        )
+        slot_seconds = max(1, int(slot_minutes)) * 60
+        floored = int(when.timestamp()) // slot_seconds * slot_seconds
+        return datetime.fromtimestamp(floored, tz=dt_timezone.utc)
+
+    @staticmethod
+    def cluster_key(farm, precision=None):
+        """Geohash cell (WEATHER_CLUSTER_PRECISION characters) that shares one fetch, or None without coordinates"""
+        precision = precision or getattr(
+            settings, 'WEATHER_CLUSTER_PRECISION', WeatherIngestionService.DEFAULT_CLUSTER_PRECISION
+        )
+        if not farm.geohash and (farm.latitude is None or farm.longitude is None):
+            return None
+        geohash = farm.geohash or SpatialService.geohash(farm.latitude, farm.longitude)
+        return geohash[:precision]
+
+    @staticmethod
+    def cluster_farms(farms, precision=None):
+        """Group farms by cluster cell, keeping their order within each group; farms without coordinates are left out"""
+        clusters = defaultdict(list)
+        for farm in farms:
+            key = WeatherIngestionService.cluster_key(farm, precision)
+            if key is not None:
+                clusters[key].append(farm)
+        return dict(clusters)
+
+    @staticmethod
+    def build_record(farm, weather_data, when=None):
+        """Unsaved WeatherRecord for an observation, keyed by its slot and source"""
+        from .models import WeatherRecord
+
+        when = when or timezone.now()
+        return WeatherRecord(
+            farm=farm,
+            date=timezone.localdate(when),
+            observed_at=WeatherIngestionService.observation_slot(when),
+            source=weather_data.get('source', 'openweathermap'),
+            cluster=WeatherIngestionService.cluster_key(farm),
+            temperature=weather_data['temperature'],
+            humidity=weather_data['humidity'],
+            rainfall=weather_data['rainfall'],
+            wind_speed=weather_data['wind_speed'],
+            description=weather_data['description']
+        )
+
+    @staticmethod
+    def record_observation(farm, weather_data, when=None):
+        """
+        Upsert a single observation and refresh its daily rollup
+
+        Repeated refreshes within one slot overwrite the existing record instead
+        of appending another row for the same day.
+
+        Returns:
+            (weather_record, created)
+        """
+        from .weather_rollups import WeatherRollupService
+
+        record = WeatherIngestionService.build_record(farm, weather_data, when)
+        with transaction.atomic():
+            weather_record, created = type(record).objects.update_or_create(
+                farm=farm,
+                source=record.source,
+                observed_at=record.observed_at,
+                defaults={field: getattr(record, field) for field in WeatherIngestionService.UPSERT_FIELDS}
+            )
+            WeatherRollupService.record_observations([weather_record])
+        return weather_record, created
+
+    @staticmethod
+    def _timed_fetch(latitude, longitude, farm):
+        """Fetch weather for one point and measure how long it took"""
+        started = time.perf_counter()
+        try:
+            weather_data = WeatherService.get_weather_data(latitude, longitude, farm=farm)
+            error = None
+        except Exception as e:
+            weather_data = None
+            error = e
+        return weather_data, time.perf_counter() - started, error
+
+    @staticmethod
+    def _pooled_fetch(latitude, longitude, farm):
+        """Worker-thread wrapper that releases any DB connection opened by the fallback path"""
+        try:
+            return WeatherIngestionService._timed_fetch(latitude, longitude, farm)
+        finally:
+            connections.close_all()
+
+    @staticmethod
+    def _fan_out(members, weather_data, latency, error):
+        """Give every farm in a cluster its own copy of the cluster's observation"""
+        metrics.increment('weather_fetch_deduplicated_total', len(members) - 1)
+        for farm in members:
+            yield farm, dict(weather_data) if weather_data else weather_data, latency, error
+
+    @staticmethod
+    def fetch_weather(farms, max_workers=None):
+        """
+        Fetch current weather for each farm using a bounded thread pool
+
+        Farms are grouped by cluster cell and each cluster is fetched once, at
+        the centre of its cell, so upstream calls scale with occupied cells
+        rather than farms. The cluster's first farm supplies the fallback
+        record if the API is down.
+
+        Only the fetches (network calls and read-only fallbacks) run in worker
+        threads. Results are yielded on the calling thread as they complete, so
+        the caller stays the single DB writer.
+
+        Farms without coordinates are not fetched; they are yielded first with
+        a ValueError so the caller reports them alongside other failures.
+
+        Yields:
+            (farm, weather_data, latency_seconds, error) tuples, one per farm
+        """
+        clusters = WeatherIngestionService.cluster_farms(farms)
+        clustered = {farm.id for members in clusters.values() for farm in members}
+        for farm in farms:
+            if farm.id not in clustered:
+                yield farm, None, 0.0, ValueError('missing coordinates')
+        workers = WeatherIngestionService.get_max_workers(max_workers)
+
+        if workers == 1:
+            for key, members in clusters.items():
+                latitude, longitude = SpatialService.cell_center(key)
+                result = WeatherIngestionService._timed_fetch(latitude, longitude, members[0])
+                yield from WeatherIngestionService._fan_out(members, *result)
+            return
+
+        # Worker threads do not inherit context variables, so carry the API quota priority over
+        fetch = ApiQuota.bind_priority(WeatherIngestionService._pooled_fetch)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='weather-fetch') as executor:
+            futures = {
+                executor.submit(fetch, *SpatialService.cell_center(key), members[0]): members
+                for key, members in clusters.items()
+            }
+            for future in as_completed(futures):
+                yield from WeatherIngestionService._fan_out(futures[future], *future.result())
+
+    @staticmethod
+    def persist_observations(observations, chunk_size=None):
+        """
+        Store fetched observations with a fixed number of queries per chunk
+
+        Each chunk is written in one transaction: WeatherRecords with one
+        upsert on (farm, source, observed_at), their daily rollups with another,
+        last_weather_update with bulk_update, and new alerts with a single
+        existence check plus bulk_create.
+
+        Args:
+            observations: list of (farm, weather_data) pairs
+            chunk_size: farms per transaction
+
+        Returns:
+            dict with the number of records stored and the list of new alerts
+        """
+        from .models import Crop, Farm, WeatherRecord
+        from .utils import build_farm_alerts, create_missing_alerts
+        from .weather_rollups import WeatherRollupService
+
+        chunk_size = chunk_size or WeatherIngestionService.DEFAULT_CHUNK_SIZE
+        result = {'records': 0, 'alerts': []}
+
+        for start in range(0, len(observations), chunk_size):
+            chunk = observations[start:start + chunk_size]
+            farm_ids = [farm.id for farm, _ in chunk]
+            now = timezone.now()
+
+            with transaction.atomic():
+                records = WeatherRecord.objects.bulk_create(
+                    [
+                        WeatherIngestionService.build_record(farm, weather_data, now)
+                        for farm, weather_data in chunk
+                    ],
+                    update_conflicts=True,
+                    unique_fields=['farm', 'source', 'observed_at'],
+                    update_fields=WeatherIngestionService.UPSERT_FIELDS,
+                )
+                WeatherRollupService.record_observations(records)
+
+                farms = [farm for farm, _ in chunk]
+                for farm in farms:
+                    farm.last_weather_update = now
+                Farm.objects.bulk_update(farms, ['last_weather_update'])
+
+                crops_by_farm = defaultdict(list)
+                for crop in Crop.objects.filter(farm_id__in=farm_ids, is_active=True):
+                    crops_by_farm[crop.farm_id].append(crop)
+
+                candidates = []
+                for farm, record in zip(farms, records):
+                    candidates.extend(build_farm_alerts(farm, record, crops_by_farm[farm.id]))
+                result['alerts'].extend(create_missing_alerts(candidates))
+
+            result['records'] += len(records)
+
+        return result
+
+    @staticmethod
+    def summarize_latencies(latencies, elapsed):
+        """Summarize per-farm fetch latencies (seconds) and overall throughput"""
+        if not latencies:
+            return {'count': 0, 'p50': 0, 'p95': 0, 'max': 0, 'throughput': 0}
+
+        ordered = sorted(latencies)
+
+        def percentile(p):
+            index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+            return ordered[index]
+
+        return {
+            'count': len(ordered),
+            'p50': percentile(50),
+            'p95': percentile(95),
+            'max': ordered[-1],
+            'throughput': len(ordered) / elapsed if elapsed > 0 else 0,
+        }
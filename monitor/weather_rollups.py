@@ -0,0 +1,215 @@
+"""
+Daily weather rollups so long analytics windows stay cheap as history grows
+"""
+import math
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q, Sum, Variance
+from django.utils import timezone
+from .climate_normals import ClimateNormalsService
+from .crop_weather_stats import CropWeatherStatsService
+from .prediction_service import YieldPredictionService
+
+
+class WeatherRollupService:
+    """Maintain and read WeatherDailySummary rows"""
+
+    UPDATE_FIELDS = [
+        'temperature_min', 'temperature_max', 'temperature_mean', 'temperature_variance',
+        'humidity_mean', 'rainfall_total', 'accumulated_rainfall', 'observation_count', 'updated_at',
+    ]
+
+    # Sources whose rainfall is the rain of the hour before the reading (OpenWeatherMap's
+    # rain.1h); demo rows always store 0 and legacy rows have no known accumulation period
+    ACCUMULATING_SOURCES = ['openweathermap']
+    HOURS_PER_DAY = 24
+
+    @staticmethod
+    def accumulated_rainfall(hourly_readings, hourly_total):
+        """
+        The day's rainfall when its hourly accumulations cover every hour, else None
+
+        A day with gaps in its hourly readings says nothing about the rain that
+        fell in the missing hours, so it gets no accumulated total. Readings are
+        only hourly with 60-minute observation slots.
+        """
+        from .weather_ingestion import WeatherIngestionService
+
+        slot_minutes = getattr(
+            settings, 'WEATHER_OBSERVATION_SLOT_MINUTES', WeatherIngestionService.DEFAULT_SLOT_MINUTES
+        )
+        if slot_minutes != 60 or hourly_readings < WeatherRollupService.HOURS_PER_DAY:
+            return None
+        return hourly_total or 0
+
+    @staticmethod
+    def record_observations(records):
+        """Refresh the summaries touched by newly stored WeatherRecords"""
+        from .models import WeatherRecord
+
+        date_field = WeatherRecord._meta.get_field('date')
+        # Unsaved defaults are datetimes; to_python() gives the stored local date
+        farm_days = {(record.farm_id, date_field.to_python(record.date)) for record in records}
+        return WeatherRollupService.refresh_days(farm_days)
+
+    @staticmethod
+    def refresh_days(farm_days):
+        """
+        Recompute the summaries for a set of (farm_id, date) pairs
+
+        Uses one grouped aggregate over the affected days and one upsert, so the
+        cost depends on the batch size rather than on the length of history.
+        """
+        from .models import WeatherDailySummary, WeatherRecord
+
+        farm_days = set(farm_days)
+        if not farm_days:
+            return 0
+
+        farm_ids = {farm_id for farm_id, _ in farm_days}
+        days = {day for _, day in farm_days}
+        with transaction.atomic():
+            # The running crop statistics are updated with the difference between
+            # old_days and the new summaries, so a concurrent refresh of the same
+            # farm must not change the summaries in between. Crop statistics are
+            # locked first because a day without a summary yet has no row to lock.
+            CropWeatherStatsService.lock_farms(farm_ids)
+            old_days = {
+                (row[0], row[1]): CropWeatherStatsService.day_state(*row[2:])
+                for row in WeatherDailySummary.objects.select_for_update().filter(
+                    farm_id__in=farm_ids, date__in=days
+                ).values_list(
+                    'farm_id', 'date', 'observation_count', 'temperature_mean', 'temperature_variance',
+                    'humidity_mean', 'rainfall_total'
+                ).order_by('farm_id', 'date')
+                if (row[0], row[1]) in farm_days
+            }
+
+            rows = (
+                WeatherRecord.objects
+                .filter(farm_id__in=farm_ids, date__in=days)
+                .values('farm_id', 'date')
+                .annotate(
+                    temperature_min=Min('temperature'),
+                    temperature_max=Max('temperature'),
+                    temperature_mean=Avg('temperature'),
+                    temperature_variance=Variance('temperature'),
+                    humidity_mean=Avg('humidity'),
+                    rainfall_total=Sum('rainfall'),
+                    observation_count=Count('id'),
+                    hourly_readings=Count('id', filter=Q(source__in=WeatherRollupService.ACCUMULATING_SOURCES)),
+                    hourly_rainfall=Sum('rainfall', filter=Q(source__in=WeatherRollupService.ACCUMULATING_SOURCES)),
+                )
+                .order_by()
+            )
+
+            now = timezone.now()
+            summaries = []
+            for row in rows:
+                key = (row['farm_id'], row['date'])
+                if key not in farm_days:
+                    continue
+                summaries.append(WeatherDailySummary(
+                    farm_id=row['farm_id'],
+                    date=row['date'],
+                    temperature_min=row['temperature_min'],
+                    temperature_max=row['temperature_max'],
+                    temperature_mean=float(row['temperature_mean']),
+                    temperature_variance=float(row['temperature_variance'] or 0),
+                    humidity_mean=float(row['humidity_mean']),
+                    rainfall_total=row['rainfall_total'] or 0,
+                    accumulated_rainfall=WeatherRollupService.accumulated_rainfall(
+                        row['hourly_readings'], row['hourly_rainfall']
+                    ),
+                    observation_count=row['observation_count'],
+                    updated_at=now,
+                ))
+
+            WeatherDailySummary.objects.bulk_create(
+                summaries,
+                update_conflicts=True,
+                unique_fields=['farm', 'date'],
+                update_fields=WeatherRollupService.UPDATE_FIELDS,
+            )
+
+            # Days whose records were all removed no longer have a summary
+            emptied = farm_days - {(s.farm_id, s.date) for s in summaries}
+            for farm_id, day in emptied:
+                WeatherDailySummary.objects.filter(farm_id=farm_id, date=day).delete()
+
+            CropWeatherStatsService.apply_day_changes(old_days, {
+                (s.farm_id, s.date): CropWeatherStatsService.day_state(
+                    s.observation_count, s.temperature_mean, s.temperature_variance, s.humidity_mean, s.rainfall_total
+                )
+                for s in summaries
+            })
+        ClimateNormalsService.refresh_farms(farm_ids)
+        YieldPredictionService.mark_weather_changed(farm_days)
+        return len(summaries)
+
+    @staticmethod
+    def backfill(farm_ids=None, since=None):
+        """Rebuild summaries from existing WeatherRecords; returns the number of rows written"""
+        from .models import WeatherRecord
+
+        records = WeatherRecord.objects.all()
+        if farm_ids:
+            records = records.filter(farm_id__in=farm_ids)
+        if since:
+            records = records.filter(date__gte=since)
+
+        farm_days = set(records.values_list('farm_id', 'date').distinct().order_by())
+        written = 0
+        days = sorted(farm_days)
+        for start in range(0, len(days), 1000):
+            written += WeatherRollupService.refresh_days(days[start:start + 1000])
+        return written
+
+    @staticmethod
+    def daily_rows(farm, since, until=None):
+        """Summaries for a farm from `since` (inclusive), oldest first"""
+        from .models import WeatherDailySummary
+
+        summaries = WeatherDailySummary.objects.filter(farm=farm, date__gte=since)
+        if until is not None:
+            summaries = summaries.filter(date__lte=until)
+        return summaries.order_by('date')
+
+    @staticmethod
+    def window_stats(farm, since, until=None):
+        """
+        Combine daily summaries into statistics over every observation in the window
+
+        Means are weighted by observation count and the temperature standard
+        deviation is the sample std of all underlying readings, matching what a
+        scan of the raw WeatherRecords would give. Returns None if there is no data.
+        """
+        rows = list(
+            WeatherRollupService.daily_rows(farm, since, until).values_list(
+                'observation_count', 'temperature_mean', 'temperature_variance',
+                'temperature_min', 'temperature_max', 'humidity_mean', 'rainfall_total'
+            )
+        )
+        return WeatherRollupService.combine(rows)
+
+    @staticmethod
+    def combine(rows):
+        """Merge (count, mean, variance, min, max, humidity_mean, rainfall) daily tuples"""
+        count = sum(row[0] for row in rows)
+        if not count:
+            return None
+
+        temp_mean = sum(row[0] * row[1] for row in rows) / count
+        # Parallel variance: within-day spread plus spread of the daily means
+        m2 = sum(row[0] * row[2] + row[0] * (row[1] - temp_mean) ** 2 for row in rows)
+
+        return {
+            'count': count,
+            'days': len(rows),
+            'avg_temperature': temp_mean,
+            'temperature_std': math.sqrt(m2 / (count - 1)) if count > 1 else None,
+            'min_temperature': float(min(row[3] for row in rows)),
+            'max_temperature': float(max(row[4] for row in rows)),
+            'avg_humidity': sum(row[0] * row[5] for row in rows) / count,
+            'total_rainfall': float(sum(row[6] for row in rows)),
+        }
@@ -1,6 +1,9 @@
-import requests
 from django.conf import settings
 from decimal import Decimal
+from .api_quota import ApiQuota
+from .circuit_breaker import get_breaker
+from .http_client import get_http_client
+from .weather_cache import get_weather_cache
 
 
 class WeatherService:
@@ -11,8 +14,13 @@ class WeatherService:
     FORECAST_URL = "https://api.openweathermap.org/data/2.5/forecast"
     
     @staticmethod
-    def get_weather_data(latitude, longitude):
-        """Fetch current weather data using FREE One Call API 2.5"""
+    def get_weather_data(latitude, longitude, farm=None):
+        """
+        Fetch current weather data using FREE One Call API 2.5
+        
+        Pass the farm when there is one, so its last stored record can be
+        served while the API is unavailable.
+        """
         if not settings.OPENWEATHER_API_KEY or settings.OPENWEATHER_API_KEY == 'PUT_YOUR_FREE_API_KEY_HERE':
             # Return location-appropriate demo data based on coordinates
             lat = float(latitude)
@@ -39,26 +47,30 @@ class WeatherService:
                 'rainfall': Decimal('0'),
                 'pressure': Decimal('1013'),
                 'feels_like': Decimal(str(temp - 1)),
-                'uv_index': Decimal('3.0')
+                'uv_index': Decimal('3.0'),
+                'source': 'demo'
             }
         
-        try:
-            # Use FREE One Call API 2.5 (includes current, hourly, daily forecasts!)
-            params = {
-                'lat': latitude,
-                'lon': longitude,
-                'appid': settings.OPENWEATHER_API_KEY,
-                'units': 'metric',
-                'exclude': 'minutely,hourly,daily,alerts'  # Only get current weather for now
-            }
-            
-            response = requests.get(WeatherService.ONE_CALL_URL, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
+        cache = get_weather_cache()
+        cached = cache.get('current', latitude, longitude)
+        if cached is not None:
+            return cached
+        
+        # Use FREE One Call API 2.5 (includes current, hourly, daily forecasts!)
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'appid': settings.OPENWEATHER_API_KEY,
+            'units': 'metric',
+            'exclude': 'minutely,hourly,daily,alerts'  # Only get current weather for now
+        }
+        
+        data = WeatherService._call_api('onecall', WeatherService.ONE_CALL_URL, params)
+        if data is not None:
+            try:
                 current = data['current']
                 
-                return {
+                weather_data = {
                     'temperature': Decimal(str(current['temp'])),
                     'humidity': Decimal(str(current['humidity'])),
                     'wind_speed': Decimal(str(current['wind_speed'])),
@@ -68,30 +80,83 @@ class WeatherService:
                     'feels_like': Decimal(str(current.get('feels_like', current['temp']))),
                     'uv_index': Decimal(str(current.get('uvi', 0)))
                 }
-            else:
-                # Fallback to basic weather API if One Call fails
-                return WeatherService._get_basic_weather(latitude, longitude)
-                
+                cache.set('current', latitude, longitude, weather_data)
+                return weather_data
+            except (KeyError, IndexError, TypeError) as e:
+                print(f"One Call API error: {e}, trying basic API...")
+        
+        # Fallback to basic weather API if One Call fails
+        weather_data = WeatherService._get_basic_weather(latitude, longitude)
+        if weather_data is not None:
+            return weather_data
+        
+        return WeatherService._get_fallback_weather(latitude, longitude, farm)
+    
+    @staticmethod
+    def _call_api(endpoint, url, params):
+        """
+        GET an OpenWeatherMap endpoint through its circuit breaker
+        
+        Returns the decoded JSON body, or None when the breaker is open, the
+        shared API quota is exhausted, or the call failed. Timeouts, connection errors and non-200 responses count
+        as failures, so a struggling endpoint is skipped instead of waited on.
+        """
+        breaker = get_breaker(f'openweathermap.{endpoint}')
+        if not breaker.allow_request():
+            return None
+        
+        if not ApiQuota.acquire('openweathermap'):
+            breaker.cancel_request()
+            print(f"OpenWeatherMap {endpoint} skipped: API quota exhausted")
+            return None
+        
+        config = getattr(settings, 'CIRCUIT_BREAKER', {})
+        try:
+            response = get_http_client().get(
+                url,
+                'openweathermap',
+                params=params,
+                timeout=config.get('TIMEOUT'),
+                retries=config.get('RETRIES', 1),
+                # Every retry is another upstream request and must take its own token
+                acquire=lambda: ApiQuota.acquire('openweathermap')
+            )
         except Exception as e:
-            print(f"One Call API error: {e}, trying basic API...")
-            return WeatherService._get_basic_weather(latitude, longitude)
+            breaker.record_failure()
+            print(f"OpenWeatherMap {endpoint} error: {e}")
+            return None
+        
+        if response.status_code != 200:
+            breaker.record_failure()
+            print(f"OpenWeatherMap {endpoint} returned HTTP {response.status_code}")
+            return None
+        
+        try:
+            data = response.json()
+        except ValueError as e:
+            breaker.record_failure()
+            print(f"OpenWeatherMap {endpoint} returned invalid JSON: {e}")
+            return None
+        
+        breaker.record_success()
+        return data
     
     @staticmethod
     def _get_basic_weather(latitude, longitude):
-        """Fallback to basic weather API"""
+        """Fallback to basic weather API, returns None if it is unavailable too"""
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'appid': settings.OPENWEATHER_API_KEY,
+            'units': 'metric'
+        }
+        
+        data = WeatherService._call_api('weather', WeatherService.BASE_URL, params)
+        if data is None:
+            return None
+        
         try:
-            params = {
-                'lat': latitude,
-                'lon': longitude,
-                'appid': settings.OPENWEATHER_API_KEY,
-                'units': 'metric'
-            }
-            
-            response = requests.get(WeatherService.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            return {
+            weather_data = {
                 'temperature': Decimal(str(data['main']['temp'])),
                 'humidity': Decimal(str(data['main']['humidity'])),
                 'wind_speed': Decimal(str(data['wind']['speed'])),
@@ -101,20 +166,53 @@ class WeatherService:
                 'feels_like': Decimal(str(data['main'].get('feels_like', data['main']['temp']))),
                 'uv_index': Decimal('0')
             }
-            
-        except Exception as e:
+        except (KeyError, IndexError, TypeError) as e:
             print(f"Error fetching weather data: {e}")
-            # Return demo data if all APIs fail
-            return {
-                'temperature': Decimal('22.0'),
-                'humidity': Decimal('65.0'),
-                'wind_speed': Decimal('3.8'),
-                'description': 'Weather data unavailable',
-                'rainfall': Decimal('0'),
-                'pressure': Decimal('1013'),
-                'feels_like': Decimal('22.0'),
-                'uv_index': Decimal('0')
-            }
+            return None
+        
+        get_weather_cache().set('current', latitude, longitude, weather_data)
+        return weather_data
+    
+    @staticmethod
+    def _get_fallback_weather(latitude, longitude, farm=None):
+        """
+        Best available data when OpenWeatherMap cannot be reached, without touching the network
+        
+        Tries an expired cache entry, then the farm's last stored WeatherRecord,
+        then placeholder values. The result is marked 'stale' so callers do not
+        store it as a new observation.
+        """
+        stale = get_weather_cache().get('current', latitude, longitude, allow_stale=True)
+        if stale is not None:
+            return dict(stale, stale=True)
+        
+        if farm is not None:
+            record = farm.weather_records.order_by('-date', '-created_at').first()
+            if record:
+                return {
+                    'temperature': record.temperature,
+                    'humidity': record.humidity,
+                    'wind_speed': record.wind_speed or Decimal('0'),
+                    'description': f'{record.description} (last update {record.date})',
+                    'rainfall': record.rainfall,
+                    'pressure': Decimal('1013'),
+                    'feels_like': record.temperature,
+                    'uv_index': Decimal('0'),
+                    'stale': True
+                }
+        
+        # Return demo data if all APIs fail
+        return {
+            'temperature': Decimal('22.0'),
+            'humidity': Decimal('65.0'),
+            'wind_speed': Decimal('3.8'),
+            'description': 'Weather data unavailable',
+            'rainfall': Decimal('0'),
+            'pressure': Decimal('1013'),
+            'feels_like': Decimal('22.0'),
+            'uv_index': Decimal('0'),
+            'stale': True
+        }
     
     @staticmethod
     def get_weather_by_city(city_name):
@@ -128,60 +226,68 @@ class WeatherService:
                 'description': f'Partly cloudy in {city_name} (demo data)',
                 'rainfall': Decimal('0'),
                 'latitude': -1.2921,  # Nairobi coordinates
-                'longitude': 36.8219
+                'longitude': 36.8219,
+                'source': 'demo'
             }
         
-        try:
-            # Use FREE Current Weather API
-            params = {
-                'q': city_name,
-                'appid': settings.OPENWEATHER_API_KEY,
-                'units': 'metric'
-            }
-            
-            response = requests.get(WeatherService.BASE_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            return {
-                'temperature': Decimal(str(data['main']['temp'])),
-                'humidity': Decimal(str(data['main']['humidity'])),
-                'wind_speed': Decimal(str(data['wind']['speed'])),
-                'description': data['weather'][0]['description'],
-                'rainfall': Decimal(str(data.get('rain', {}).get('1h', 0))),
-                'latitude': data['coord']['lat'],
-                'longitude': data['coord']['lon']
-            }
-        except Exception as e:
-            print(f"Error fetching weather data: {e}")
-            # Return demo data if API fails
-            return {
-                'temperature': Decimal('24.0'),
-                'humidity': Decimal('70.0'),
-                'wind_speed': Decimal('4.5'),
-                'description': f'Partly cloudy in {city_name} (demo data)',
-                'rainfall': Decimal('0'),
-                'latitude': -1.2921,
-                'longitude': 36.8219
-            }
+        # Use FREE Current Weather API
+        params = {
+            'q': city_name,
+            'appid': settings.OPENWEATHER_API_KEY,
+            'units': 'metric'
+        }
+        
+        data = WeatherService._call_api('weather', WeatherService.BASE_URL, params)
+        if data is not None:
+            try:
+                return {
+                    'temperature': Decimal(str(data['main']['temp'])),
+                    'humidity': Decimal(str(data['main']['humidity'])),
+                    'wind_speed': Decimal(str(data['wind']['speed'])),
+                    'description': data['weather'][0]['description'],
+                    'rainfall': Decimal(str(data.get('rain', {}).get('1h', 0))),
+                    'latitude': data['coord']['lat'],
+                    'longitude': data['coord']['lon']
+                }
+            except (KeyError, IndexError, TypeError) as e:
+                print(f"Error fetching weather data: {e}")
+        
+        # Return demo data if API fails
+        return {
+            'temperature': Decimal('24.0'),
+            'humidity': Decimal('70.0'),
+            'wind_speed': Decimal('4.5'),
+            'description': f'Partly cloudy in {city_name} (demo data)',
+            'rainfall': Decimal('0'),
+            'latitude': -1.2921,
+            'longitude': 36.8219,
+            'source': 'demo'
+        }
+    
     @staticmethod
     def get_5day_forecast(latitude, longitude):
         """Get 5-day weather forecast using FREE OpenWeatherMap API"""
         if not settings.OPENWEATHER_API_KEY or settings.OPENWEATHER_API_KEY == 'PUT_YOUR_API_KEY_HERE':
             return None
         
+        cache = get_weather_cache()
+        cached = cache.get('forecast', latitude, longitude)
+        if cached is not None:
+            return cached
+        
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'appid': settings.OPENWEATHER_API_KEY,
+            'units': 'metric'
+        }
+        
+        data = WeatherService._call_api('forecast', WeatherService.FORECAST_URL, params)
+        if data is None:
+            # Serve an expired forecast rather than nothing while the API is down
+            return cache.get('forecast', latitude, longitude, allow_stale=True)
+        
         try:
-            params = {
-                'lat': latitude,
-                'lon': longitude,
-                'appid': settings.OPENWEATHER_API_KEY,
-                'units': 'metric'
-            }
-            
-            response = requests.get(WeatherService.FORECAST_URL, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
             # Process forecast data (returns 40 entries, 3-hour intervals for 5 days)
             forecast_list = []
             for item in data['list'][:40]:  # 5 days * 8 entries per day
@@ -193,6 +299,7 @@ class WeatherService:
                     'rainfall': Decimal(str(item.get('rain', {}).get('3h', 0)))
                 })
             
+            cache.set('forecast', latitude, longitude, forecast_list)
             return forecast_list
             
         except Exception as e:
@@ -205,35 +312,39 @@ class WeatherService:
         if not settings.OPENWEATHER_API_KEY or settings.OPENWEATHER_API_KEY == 'PUT_YOUR_FREE_API_KEY_HERE':
             return None
         
+        cache = get_weather_cache()
+        cached = cache.get('extended', latitude, longitude)
+        if cached is not None:
+            return cached
+        
+        # Use FREE One Call API 2.5 - includes current, hourly (48h), daily (7d)!
+        params = {
+            'lat': latitude,
+            'lon': longitude,
+            'appid': settings.OPENWEATHER_API_KEY,
+            'units': 'metric'
+        }
+        
+        data = WeatherService._call_api('onecall', WeatherService.ONE_CALL_URL, params)
+        if data is None:
+            return cache.get('extended', latitude, longitude, allow_stale=True)
+        
         try:
-            # Use FREE One Call API 2.5 - includes current, hourly (48h), daily (7d)!
-            params = {
-                'lat': latitude,
-                'lon': longitude,
-                'appid': settings.OPENWEATHER_API_KEY,
-                'units': 'metric'
+            extended = {
+                'current': {
+                    'temperature': Decimal(str(data['current']['temp'])),
+                    'feels_like': Decimal(str(data['current']['feels_like'])),
+                    'humidity': Decimal(str(data['current']['humidity'])),
+                    'wind_speed': Decimal(str(data['current']['wind_speed'])),
+                    'description': data['current']['weather'][0]['description'],
+                    'uv_index': Decimal(str(data['current'].get('uvi', 0))),
+                    'pressure': Decimal(str(data['current'].get('pressure', 1013)))
+                },
+                'hourly': data.get('hourly', [])[:24],  # Next 24 hours
+                'daily': data.get('daily', [])[:7],     # Next 7 days
             }
-            
-            response = requests.get(WeatherService.ONE_CALL_URL, params=params, timeout=10)
-            
-            if response.status_code == 200:
-                data = response.json()
-                
-                return {
-                    'current': {
-                        'temperature': Decimal(str(data['current']['temp'])),
-                        'feels_like': Decimal(str(data['current']['feels_like'])),
-                        'humidity': Decimal(str(data['current']['humidity'])),
-                        'wind_speed': Decimal(str(data['current']['wind_speed'])),
-                        'description': data['current']['weather'][0]['description'],
-                        'uv_index': Decimal(str(data['current'].get('uvi', 0))),
-                        'pressure': Decimal(str(data['current'].get('pressure', 1013)))
-                    },
-                    'hourly': data.get('hourly', [])[:24],  # Next 24 hours
-                    'daily': data.get('daily', [])[:7],     # Next 7 days
-                }
-            else:
-                return None
+            cache.set('extended', latitude, longitude, extended)
+            return extended
                 
         except Exception as e:
             print(f"Error fetching extended weather data: {e}")
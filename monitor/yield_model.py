@@ -0,0 +1,251 @@
+"""
+Trained yield models: features, a versioned on-disk registry and batch inference
+"""
+import json
+import os
+import threading
+from django.conf import settings
+
+
+class YieldModel:
+    """
+    Linear model of yield per acre, refining the heuristic predictor
+
+    Features are the heuristic's own yield per acre and factors, the raw
+    weather statistics and one-hot crop type and growth stage. train_yield_model
+    fits a ridge regression with scikit-learn and folds the standardisation
+    into a single float64 weight vector, so serving is one matrix-vector
+    product in NumPy and never imports scikit-learn.
+
+    Every trained version is a directory in the registry holding the weights
+    and a JSON description; the ACTIVE file names the version workers load,
+    and get_yield_model() reloads when it changes.
+    Weights are opened as a read-only memory map so worker processes share
+    the same pages.
+    """
+
+    WEIGHTS_FILE = 'weights.npy'
+    METADATA_FILE = 'model.json'
+    ACTIVE_FILE = 'ACTIVE'
+    FORMAT_VERSION = 1
+
+    NUMERIC_FEATURES = [
+        'heuristic_yield_per_acre', 'temperature_factor', 'rainfall_factor', 'humidity_factor',
+        'stage_bonus', 'avg_temperature', 'temperature_std', 'avg_humidity', 'total_rainfall',
+        'log_observations',
+    ]
+
+    def __init__(self, weights, crop_types, stages, version=None, metadata=None):
+        self.weights = weights
+        self.crop_types = list(crop_types)
+        self.stages = list(stages)
+        self.version = version
+        self.metadata = metadata or {}
+
+    @property
+    def feature_names(self):
+        return (
+            self.NUMERIC_FEATURES
+            + [f'crop_type={crop_type}' for crop_type in self.crop_types]
+            + [f'stage={stage}' for stage in self.stages]
+        )
+
+    @staticmethod
+    def default_path():
+        config = getattr(settings, 'YIELD_MODELS', {})
+        return str(config.get('PATH', os.path.join(settings.BASE_DIR, 'yield_models')))
+
+    def features(self, crop_types, stages, stats, heuristic):
+        """
+        Design matrix, one row per crop
+
+        Args:
+            crop_types, stages: sequences aligned with the stats arrays
+            stats: YieldPredictionService.batch_weather_stats arrays
+            heuristic: YieldPredictionService.predict_arrays result for the same crops
+        """
+        import numpy as np
+
+        numeric = np.column_stack([
+            heuristic['yield_per_acre'],
+            heuristic['temperature'],
+            heuristic['rainfall'],
+            heuristic['humidity'],
+            heuristic['stage_bonus'],
+            stats['avg_temperature'],
+            stats['temperature_std'],
+            stats['avg_humidity'],
+            stats['total_rainfall'],
+            np.log1p(stats['count']),
+        ])
+        crop_index = {crop_type: i for i, crop_type in enumerate(self.crop_types)}
+        stage_index = {stage: i for i, stage in enumerate(self.stages)}
+        rows = np.arange(len(crop_types))
+        crop_columns = np.zeros((len(crop_types), len(self.crop_types)))
+        crop_columns[rows, [crop_index.get(crop_type, 0) for crop_type in crop_types]] = [
+            crop_type in crop_index for crop_type in crop_types
+        ]
+        stage_columns = np.zeros((len(stages), len(self.stages)))
+        stage_columns[rows, [stage_index.get(stage, 0) for stage in stages]] = [
+            stage in stage_index for stage in stages
+        ]
+        # Crops without weather have NaN statistics; the model does not serve them
+        return np.nan_to_num(np.hstack([numeric, crop_columns, stage_columns]))
+
+    def predict_per_acre(self, features):
+        import numpy as np
+
+        return np.maximum(features @ self.weights[1:] + self.weights[0], 0.0)
+
+    def predict(self, crop_types, stages, areas, stats, heuristic):
+        """
+        Batch inference aligned with the inputs
+
+        Returns:
+            (predicted_yield, confidence_score, modelled) arrays. modelled is
+            False for crops without weather or of a crop type the model was
+            not trained on; their values are the heuristic's.
+        """
+        import numpy as np
+
+        known = set(self.crop_types)
+        modelled = heuristic['has_weather'] & np.array([crop_type in known for crop_type in crop_types], dtype=bool)
+        predicted = heuristic['predicted_yield'].copy()
+        confidence = heuristic['confidence_score'].copy()
+        if not modelled.any():
+            return predicted, confidence, modelled
+
+        features = self.features(crop_types, stages, stats, heuristic)
+        predicted[modelled] = self.predict_per_acre(features[modelled]) * np.asarray(areas, dtype=float)[modelled]
+
+        # Same shape as the heuristic's confidence, with held-out accuracy in place of factor quality
+        errors = self.metadata.get('holdout_mape_by_crop_type', {})
+        default_error = self.metadata.get('metrics', {}).get('model_mape', 100.0)
+        accuracy = 100 - np.minimum(100, [errors.get(crop_type, default_error) for crop_type in crop_types])
+        data_quality = np.minimum(100, (stats['count'] / 30) * 100)
+        model_confidence = np.maximum(30, np.minimum(95, data_quality * 0.6 + accuracy * 0.4))
+        confidence[modelled] = model_confidence[modelled]
+        return predicted, confidence, modelled
+
+    @classmethod
+    def fit(cls, crop_types, stages, stats, heuristic, yield_per_acre, alpha=1.0):
+        """Fit a ridge regression of yield per acre; scikit-learn is only needed here"""
+        import numpy as np
+        from sklearn.linear_model import Ridge
+        from sklearn.preprocessing import StandardScaler
+        from .models import Crop
+
+        model = cls(None, sorted(set(crop_types)), [stage for stage, _ in Crop.GROWTH_STAGES])
+        features = model.features(crop_types, stages, stats, heuristic)
+        scaler = StandardScaler().fit(features)
+        ridge = Ridge(alpha=alpha).fit(scaler.transform(features), yield_per_acre)
+        coefficients = ridge.coef_ / scaler.scale_
+        model.weights = np.concatenate([[ridge.intercept_ - coefficients @ scaler.mean_], coefficients])
+        return model
+
+    def save(self, version, path=None):
+        """Write this model to the registry as `version` (does not activate it)"""
+        import numpy as np
+
+        directory = os.path.join(path or self.default_path(), version)
+        os.makedirs(directory, exist_ok=False)
+        np.save(os.path.join(directory, self.WEIGHTS_FILE), np.asarray(self.weights, dtype=np.float64))
+        with open(os.path.join(directory, self.METADATA_FILE), 'w', encoding='utf-8') as f:
+            json.dump(dict(
+                self.metadata,
+                version=version,
+                format=self.FORMAT_VERSION,
+                crop_types=self.crop_types,
+                stages=self.stages,
+                features=self.feature_names,
+            ), f, indent=2)
+        self.version = version
+
+    @classmethod
+    def load(cls, version=None, path=None):
+        """Load a version from the registry (default: the active one)"""
+        import numpy as np
+
+        path = path or cls.default_path()
+        version = version or cls.active_version(path)
+        if version is None:
+            raise FileNotFoundError(f'No active yield model in {path}')
+        directory = os.path.join(path, version)
+        with open(os.path.join(directory, cls.METADATA_FILE), encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get('format') != cls.FORMAT_VERSION:
+            raise ValueError(f"yield model format {metadata.get('format')} is not {cls.FORMAT_VERSION}")
+        weights = np.asarray(np.load(os.path.join(directory, cls.WEIGHTS_FILE), mmap_mode='r'))
+        model = cls(weights, metadata['crop_types'], metadata['stages'], version, metadata)
+        if len(model.feature_names) + 1 != len(weights):
+            raise ValueError(f'yield model {version} has {len(weights)} weights for {len(model.feature_names)} features')
+        return model
+
+    @classmethod
+    def versions(cls, path=None):
+        """Metadata of every version in the registry, oldest first"""
+        path = path or cls.default_path()
+        if not os.path.isdir(path):
+            return []
+        found = []
+        for name in sorted(os.listdir(path)):
+            metadata_path = os.path.join(path, name, cls.METADATA_FILE)
+            if os.path.isfile(metadata_path):
+                with open(metadata_path, encoding='utf-8') as f:
+                    found.append(json.load(f))
+        return found
+
+    @classmethod
+    def active_version(cls, path=None):
+        try:
+            with open(os.path.join(path or cls.default_path(), cls.ACTIVE_FILE), encoding='utf-8') as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def activate(cls, version, path=None):
+        """Point ACTIVE at version; running processes pick it up on their next prediction"""
+        path = path or cls.default_path()
+        cls.load(version, path)
+        active_path = os.path.join(path, cls.ACTIVE_FILE)
+        with open(active_path + '.tmp', 'w', encoding='utf-8') as f:
+            f.write(version + '\n')
+        os.replace(active_path + '.tmp', active_path)
+
+
+_yield_model = None
+_yield_model_active = False  # mtime of the ACTIVE file the model was loaded for
+_yield_model_lock = threading.Lock()
+
+
+def _active_file_mtime():
+    try:
+        return os.stat(os.path.join(YieldModel.default_path(), YieldModel.ACTIVE_FILE)).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def get_yield_model():
+    """
+    Return the process-wide active yield model, or None to use the heuristic
+
+    The ACTIVE file is checked on every call (one stat), so long-lived
+    processes such as the weather scheduler switch to a newly activated
+    version before they next predict.
+    """
+    global _yield_model, _yield_model_active
+    active = _active_file_mtime()
+    if active != _yield_model_active:
+        with _yield_model_lock:
+            if active != _yield_model_active:
+                try:
+                    _yield_model = YieldModel.load() if active is not None else None
+                except FileNotFoundError:
+                    # Nothing trained yet; the heuristic serves every crop
+                    _yield_model = None
+                except Exception as e:
+                    # Keep serving the previous model rather than a half-written one
+                    print(f"Yield model load error: {e}")
+                _yield_model_active = active
+    return _yield_model